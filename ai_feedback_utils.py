@@ -1,7 +1,17 @@
 import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 import numpy as np
 from dotenv import load_dotenv
 
+import profiling
+from pose_utils import PoseSequence
+from scoring_utils import (JOINT_ANGLES, KPT_CONF_THRESHOLD, align_sequences, joint_angles,
+                           joint_velocity, normalized_group_pose)
+
 # Load key từ file .env nếu có
 load_dotenv()
 
@@ -10,102 +20,287 @@ load_dotenv()
 # ===========================================================
 OPENAI_KEY = os.getenv("OPENAI_API_KEY")
 GEMINI_KEY = os.getenv("GOOGLE_API_KEY")
+# Địa chỉ API thay thế (vd stub server cục bộ: python feedback_stub_server.py)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+OPENAI_MODEL = "gpt-4o-mini"
+GEMINI_MODEL = "gemini-1.5-flash"
+
+# Trang chỉ chờ phản hồi AI tối đa FEEDBACK_TIMEOUT giây rồi dùng rule-based; lời gọi vẫn chạy
+# nền (tối đa REMOTE_TIMEOUT giây) và kết quả được lưu cache cho lần xem sau.
+FEEDBACK_TIMEOUT = float(os.getenv("DANCE_FEEDBACK_TIMEOUT", "8"))
+REMOTE_TIMEOUT = float(os.getenv("DANCE_FEEDBACK_REMOTE_TIMEOUT", "30"))
+FEEDBACK_CACHE_DIR = os.getenv("DANCE_FEEDBACK_DIR", ".cache/feedback")
+PROMPT_VERSION = 2           # đổi prompt → tăng để không dùng lại phản hồi cũ
+
+FEEDBACK_WINDOW_SECONDS = 2.0   # độ dài cửa sổ thời gian (theo video mẫu) khi tìm đoạn sai nhiều nhất
+FEEDBACK_TOP_K = 3              # số đoạn / khớp sai nhiều nhất đưa vào phản hồi
+FEEDBACK_MIN_ERROR_DEG = 10.0   # đoạn lệch ít hơn mức này không cần nhắc
+DEFAULT_FPS = 30.0              # chuỗi dạng mảng (không có thời gian) coi như 30 fps
+
+# Client chỉ được khởi tạo (và SDK chỉ được import) khi cần sinh phản hồi lần đầu
+_clients = {}
+_clients_lock = threading.Lock()
 
-openai_client = None
-genai_model = None
 
-if OPENAI_KEY:
+def _init_openai():
     try:
         from openai import OpenAI
-        openai_client = OpenAI(api_key=OPENAI_KEY)
+        client = OpenAI(api_key=OPENAI_KEY, base_url=OPENAI_BASE_URL, timeout=REMOTE_TIMEOUT, max_retries=1)
         print("✅ OpenAI client initialized.")
+        return client
     except Exception as e:
         print(f"⚠️ Không thể khởi tạo OpenAI client: {e}")
+        return None
+
 
-elif GEMINI_KEY:
+def _init_gemini():
     try:
         import google.generativeai as genai
-        genai.configure(api_key=GEMINI_KEY)
-        genai_model = genai.GenerativeModel("gemini-1.5-flash")
+        if GEMINI_BASE_URL:
+            genai.configure(api_key=GEMINI_KEY, transport="rest", client_options={"api_endpoint": GEMINI_BASE_URL})
+        else:
+            genai.configure(api_key=GEMINI_KEY)
+        model = genai.GenerativeModel(GEMINI_MODEL)
         print("✅ Gemini model initialized.")
+        return model
     except Exception as e:
         print(f"⚠️ Không thể khởi tạo Gemini client: {e}")
-else:
-    print("💡 Không có API key. Sử dụng chế độ offline (rule-based).")
+        return None
+
+
+def _get_client(name):
+    """Client đã khởi tạo (None nếu không có key / lỗi). Ưu tiên OpenAI như trước."""
+    with _clients_lock:
+        if not _clients:
+            _clients["openai"] = _init_openai() if OPENAI_KEY else None
+            _clients["gemini"] = _init_gemini() if GEMINI_KEY and not OPENAI_KEY else None
+            if not OPENAI_KEY and not GEMINI_KEY:
+                print("💡 Không có API key. Sử dụng chế độ offline (rule-based).")
+        return _clients[name]
 
 
 # ===========================================================
-# 2️⃣ Hàm phụ trợ: nội suy khớp độ dài giữa 2 chuỗi pose
+# 2️⃣ Đặc trưng phản hồi theo thời gian (trên chuỗi đã căn chỉnh)
 # ===========================================================
-def _resample_sequence(seq, target_len):
-    """Nội suy tuyến tính để khớp độ dài 2 chuỗi pose"""
-    if len(seq) == target_len:
-        return seq
-    if len(seq) == 0:
-        return np.zeros((target_len, seq.shape[1]))  # tránh lỗi
-    idx_old = np.linspace(0, 1, len(seq))
-    idx_new = np.linspace(0, 1, target_len)
-    return np.array([np.interp(idx_new, idx_old, seq[:, i]) for i in range(seq.shape[1])]).T
+def _as_sequence(features):
+    """PoseSequence từ PoseSequence / mảng (F, 34) / (F, 17, 2|3) / một vector 34 giá trị."""
+    if isinstance(features, PoseSequence):
+        return features
+    x = np.asarray(features, dtype=np.float32)
+    x = x.reshape(-1, 17, x.shape[-1] // 17 if x.ndim < 3 else x.shape[-1])
+    if x.shape[-1] == 2:
+        x = np.concatenate([x, np.ones(x.shape[:-1] + (1,), np.float32)], axis=-1)
+    return PoseSequence(x[..., :3], timestamps=np.arange(len(x)) / DEFAULT_FPS)
+
+
+def _fmt_time(seconds):
+    return f"{int(seconds // 60)}:{int(seconds % 60):02d}"
+
+
+def feedback_metrics(standard, user, avg_score, window_seconds=FEEDBACK_WINDOW_SECONDS, top_k=FEEDBACK_TOP_K):
+    """
+    Tóm tắt sai lệch của người dùng so với mẫu để sinh phản hồi (dict ghi được ra JSON):
+      windows – top_k đoạn `window_seconds` giây (theo video mẫu) lệch góc khớp nhiều nhất, mỗi đoạn
+                kèm khớp lệch nhất, hướng sửa (duỗi / co) và độ sớm / muộn so với nhịp chung
+      joints  – top_k khớp lệch nhiều nhất cả bài
+      energy_ratio – tốc độ chuyển động trung bình của người dùng / của mẫu
+    Hai chuỗi được căn chỉnh bằng DTW (scoring_utils.align_sequences); mọi phép tính vector hóa
+    trên mảng (bước × khớp). Giá trị được làm tròn → các bài giống nhau cho cùng tóm tắt (dùng cache).
+    """
+    std_seq, usr_seq = _as_sequence(standard), _as_sequence(user)
+    std_pose, usr_pose = normalized_group_pose(std_seq), normalized_group_pose(usr_seq)
+    std_times = np.asarray(std_seq.timestamps, dtype=np.float64)
+    usr_times = np.asarray(usr_seq.timestamps, dtype=np.float64)
+    path = align_sequences(std_pose, usr_pose, std_times, usr_times)
+    i, j = path[:, 0], path[:, 1]
+
+    conf_ok = (std_pose[i, :, 2] >= KPT_CONF_THRESHOLD) & (usr_pose[j, :, 2] >= KPT_CONF_THRESHOLD)
+    angle_idx = np.array(list(JOINT_ANGLES.values()))
+    ok = conf_ok[:, angle_idx].all(axis=-1) & np.isfinite(std_pose[i, 0, 0])[:, None]        # (L, J)
+    diff = np.where(ok, joint_angles(usr_pose)[j] - joint_angles(std_pose)[i], 0.0)         # (L, J) có dấu
+    err = np.abs(diff)
+
+    # Gộp theo cửa sổ thời gian × khớp bằng bincount trên chỉ số phẳng (cửa sổ, khớp)
+    n_joints = len(JOINT_ANGLES)
+    win = np.floor(std_times[i] / window_seconds).astype(np.int64)
+    win -= win.min()
+    n_win = int(win.max()) + 1
+    flat = (win[:, None] * n_joints + np.arange(n_joints)).ravel()
+    counts = np.bincount(flat, weights=ok.ravel(), minlength=n_win * n_joints).reshape(n_win, n_joints)
+    sums = np.bincount(flat, weights=err.ravel(), minlength=n_win * n_joints).reshape(n_win, n_joints)
+    bias = np.bincount(flat, weights=diff.ravel(), minlength=n_win * n_joints).reshape(n_win, n_joints)
+    win_err = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+    win_bias = bias / np.maximum(counts, 1)
+    n_ok = counts.sum(axis=1)
+    window_mean = np.where(n_ok > 0, sums.sum(axis=1) / np.maximum(n_ok, 1), np.nan)
+
+    # Sớm / muộn trong từng cửa sổ so với độ lệch chung (dương = người dùng muộn hơn)
+    offset = usr_times[j] - std_times[i]
+    offset -= np.median(offset)
+    win_offset = np.bincount(win, weights=offset, minlength=n_win) / np.maximum(np.bincount(win, minlength=n_win), 1)
+
+    names = list(JOINT_ANGLES)
+    start = float(np.floor(std_times[i].min() / window_seconds) * window_seconds)
+    ranked = [w for w in np.argsort(-np.nan_to_num(window_mean, nan=-1))[:top_k]
+              if np.isfinite(window_mean[w]) and window_mean[w] >= FEEDBACK_MIN_ERROR_DEG]
+    windows = []
+    for w in sorted(ranked):
+        k = int(np.nanargmax(win_err[w]))
+        windows.append({
+            "start": round(start + w * window_seconds, 1),
+            "end": round(start + (w + 1) * window_seconds, 1),
+            "error_deg": int(round(window_mean[w])),
+            "joint": names[k],
+            "joint_error_deg": int(round(win_err[w, k])),
+            # Góc người dùng nhỏ hơn mẫu → cần duỗi / mở rộng hơn
+            "direction": "duỗi" if win_bias[w, k] < 0 else "co",
+            "timing_offset_s": round(float(win_offset[w]), 1),
+        })
+
+    total = ok.sum(axis=0)
+    joint_err = np.where(total > 0, err.sum(axis=0) / np.maximum(total, 1), np.nan)
+    joint_bias = diff.sum(axis=0) / np.maximum(total, 1)
+    joints = [{"joint": names[k], "error_deg": int(round(joint_err[k])),
+               "direction": "duỗi" if joint_bias[k] < 0 else "co"}
+              for k in np.argsort(-np.nan_to_num(joint_err, nan=-1))[:top_k] if np.isfinite(joint_err[k])]
+
+    std_speed = np.nanmean(np.linalg.norm(joint_velocity(std_pose, std_times), axis=-1))
+    usr_speed = np.nanmean(np.linalg.norm(joint_velocity(usr_pose, usr_times), axis=-1))
+    energy = usr_speed / std_speed if np.isfinite(std_speed) and std_speed > 1e-6 else np.nan
+    mean_err = np.nanmean(window_mean) if np.isfinite(window_mean).any() else np.nan
+
+    return {
+        "score": int(round(float(avg_score))),
+        "mean_error_deg": int(round(mean_err)) if np.isfinite(mean_err) else None,
+        "energy_ratio": round(float(energy), 1) if np.isfinite(energy) else None,
+        "windows": windows,
+        "joints": joints,
+    }
 
 
 # ===========================================================
 # 3️⃣ Hàm tạo phản hồi AI thực (OpenAI / Gemini)
 # ===========================================================
-def _generate_openai_feedback(mean_diff, motion_var, avg_score):
-    prompt = f"""
+def _build_prompt(metrics):
+    lines = [f"- Điểm trung bình: {metrics['score']}/100"]
+    if metrics["mean_error_deg"] is not None:
+        lines.append(f"- Độ lệch góc khớp trung bình: {metrics['mean_error_deg']}°")
+    if metrics["energy_ratio"] is not None:
+        lines.append(f"- Tốc độ / biên độ chuyển động so với mẫu: {metrics['energy_ratio']:.1f} lần")
+    for jt in metrics["joints"]:
+        lines.append(f"- Khớp lệch nhiều: {jt['joint']} ~{jt['error_deg']}° (cần {jt['direction']} hơn)")
+    for w in metrics["windows"]:
+        timing = (f", {'muộn' if w['timing_offset_s'] > 0 else 'sớm'} {abs(w['timing_offset_s']):.1f}s"
+                  if abs(w["timing_offset_s"]) >= 0.2 else "")
+        lines.append(f"- Đoạn {_fmt_time(w['start'])}–{_fmt_time(w['end'])}: {w['joint']} lệch "
+                     f"~{w['joint_error_deg']}° (cần {w['direction']} hơn){timing}")
+    data = "\n".join(lines)
+    return f"""
     Bạn là huấn luyện viên múa Việt Nam.
-    Hãy đánh giá bài múa dựa trên thông tin sau:
-    - Độ lệch tư thế trung bình: {mean_diff:.3f}
-    - Độ mượt chuyển động: {motion_var:.3f}
-    - Điểm trung bình: {avg_score:.1f}/100
+    Hãy đánh giá bài múa dựa trên thông tin sau (thời điểm theo video mẫu):
+{data}
 
-    Viết 3–4 gợi ý ngắn gọn, thân thiện bằng tiếng Việt:
+    Viết 3–5 gợi ý ngắn gọn, thân thiện bằng tiếng Việt:
     - Nhận xét tổng thể (giống hay khác mẫu)
-    - Gợi ý cải thiện động tác tay/chân
+    - Gợi ý sửa cụ thể cho từng đoạn lệch nhiều (nêu thời điểm)
     - Gợi ý về nhịp và cảm xúc
     - Câu động viên cuối
     """
+
+
+def _generate_openai_feedback(prompt):
+    response = _get_client("openai").chat.completions.create(
+        model=OPENAI_MODEL,
+        messages=[
+            {"role": "system", "content": "Bạn là huấn luyện viên múa Việt Nam, nói ngắn gọn, khích lệ."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.7,
+    )
+    return [response.choices[0].message.content]
+
+
+def _generate_gemini_feedback(prompt):
+    response = _get_client("gemini").generate_content(prompt, request_options={"timeout": REMOTE_TIMEOUT})
+    return [response.text]
+
+
+_PROVIDERS = {
+    "openai": (OPENAI_MODEL, _generate_openai_feedback),
+    "gemini": (GEMINI_MODEL, _generate_gemini_feedback),
+}
+
+
+# ===========================================================
+# 4️⃣ Cache phản hồi + gọi API không chặn trang
+# ===========================================================
+_executor = None
+_inflight = {}               # khóa cache → Future đang chạy (không gọi trùng khi rerun liên tục)
+_inflight_lock = threading.Lock()
+
+
+def feedback_cache_key(provider, metrics):
+    """Khóa = hash(nhà cung cấp + model + phiên bản prompt + tóm tắt chỉ số)."""
+    payload = {"provider": provider, "model": _PROVIDERS[provider][0], "prompt_version": PROMPT_VERSION,
+               "metrics": metrics}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+def _cache_path(key):
+    return os.path.join(FEEDBACK_CACHE_DIR, f"{key}.json")
+
+
+def load_cached_feedback(key):
     try:
-        response = openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "Bạn là huấn luyện viên múa Việt Nam, nói ngắn gọn, khích lệ."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-        )
-        return [response.choices[0].message.content]
-    except Exception as e:
-        print(f"⚠️ Lỗi khi gọi OpenAI API: {e}")
+        with open(_cache_path(key), encoding="utf-8") as f:
+            return json.load(f)["feedback"]
+    except (OSError, ValueError, KeyError):
         return None
 
 
-def _generate_gemini_feedback(mean_diff, motion_var, avg_score):
-    prompt = f"""
-    Bạn là huấn luyện viên múa Việt Nam.
-    Dưới đây là dữ liệu:
-    - Độ lệch tư thế: {mean_diff:.3f}
-    - Độ mượt chuyển động: {motion_var:.3f}
-    - Điểm trung bình: {avg_score:.1f}/100
-
-    Hãy viết nhận xét ngắn gọn, dễ hiểu, thân thiện bằng tiếng Việt:
-    - Nhận xét tổng thể
-    - Gợi ý cải thiện
-    - Câu động viên
-    """
+def _store_feedback(key, provider, feedback):
+    os.makedirs(FEEDBACK_CACHE_DIR, exist_ok=True)
+    path = _cache_path(key)
+    tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"provider": provider, "created": time.time(), "feedback": feedback}, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _call_remote(provider, prompt, key):
     try:
-        response = genai_model.generate_content(prompt)
-        return [response.text]
+        with profiling.stage(f"feedback_{provider}"):
+            feedback = _PROVIDERS[provider][1](prompt)
+        if feedback and feedback[0]:
+            _store_feedback(key, provider, feedback)
+            return feedback
     except Exception as e:
-        print(f"⚠️ Lỗi khi gọi Gemini API: {e}")
-        return None
+        print(f"⚠️ Lỗi khi gọi {provider} API: {e}")
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+    return None
+
+
+def submit_remote_feedback(provider, metrics):
+    """Gửi yêu cầu phản hồi chạy nền; trả về Future (dùng chung nếu cùng tóm tắt đang được gọi)."""
+    global _executor
+    key = feedback_cache_key(provider, metrics)
+    with _inflight_lock:
+        if key not in _inflight:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="feedback")
+            _inflight[key] = _executor.submit(_call_remote, provider, _build_prompt(metrics), key)
+        return _inflight[key]
 
 
 # ===========================================================
-# 4️⃣ Rule-based feedback (fallback)
+# 5️⃣ Rule-based feedback (fallback)
 # ===========================================================
-def _generate_rule_based_feedback(mean_diff, motion_var, avg_score):
+def _generate_rule_based_feedback(metrics):
     feedbacks = []
+    avg_score = metrics["score"]
 
     # Nhận xét tổng thể
     if avg_score > 90:
@@ -117,9 +312,20 @@ def _generate_rule_based_feedback(mean_diff, motion_var, avg_score):
     else:
         feedbacks.append("😅 Cần điều chỉnh lại nhịp và tư thế, hãy tập chậm hơn để kiểm soát động tác.")
 
+    # Các đoạn lệch nhiều nhất (theo thời gian video mẫu)
+    for w in metrics["windows"]:
+        text = (f"⏱️ {_fmt_time(w['start'])}–{_fmt_time(w['end'])}: {w['joint']} lệch khoảng "
+                f"{w['joint_error_deg']}°, hãy {w['direction']} {'thẳng' if w['direction'] == 'duỗi' else 'lại'} hơn")
+        if abs(w["timing_offset_s"]) >= 0.2:
+            text += f"; bạn đang {'chậm' if w['timing_offset_s'] > 0 else 'nhanh'} hơn nhạc ~{abs(w['timing_offset_s']):.1f}s"
+        feedbacks.append(text + ".")
+
     # Gợi ý chuyển động
-    if motion_var < 0.03:
-        feedbacks.append("Động tác hơi cứng, bạn nên di chuyển mềm mại hơn.")
+    energy = metrics["energy_ratio"]
+    if energy is not None and energy < 0.7:
+        feedbacks.append("Động tác hơi cứng và nhỏ, bạn nên di chuyển mềm mại, rộng hơn.")
+    elif energy is not None and energy > 1.4:
+        feedbacks.append("Động tác hơi vội, hãy giữ nhịp chậm rãi như bài mẫu.")
     else:
         feedbacks.append("Chuyển động tự nhiên và có cảm xúc, rất tốt!")
 
@@ -129,47 +335,56 @@ def _generate_rule_based_feedback(mean_diff, motion_var, avg_score):
 
 
 # ===========================================================
-# 5️⃣ Hàm chính: sinh feedback ổn định
+# 6️⃣ Hàm chính: sinh feedback ổn định
 # ===========================================================
-def generate_feedback(standard_features, user_features, avg_score):
+@profiling.timed("feedback")
+def generate_feedback(standard_features, user_features, avg_score, timeout=None, with_status=False):
     """
     Sinh phản hồi dựa trên dữ liệu pose.
-    - Tự động resample khi độ dài khác nhau.
-    - Fallback sang rule-based nếu không có API.
+    - Nhận PoseSequence (khuyến nghị) hoặc mảng pose (F, 34); hai chuỗi được căn chỉnh theo thời gian
+      và phản hồi chỉ ra đoạn / khớp lệch nhiều nhất (feedback_metrics).
+    - Tóm tắt giống nhau → dùng lại phản hồi AI đã lưu (.cache/feedback).
+    - Gọi API chạy nền, chờ tối đa `timeout` giây (mặc định FEEDBACK_TIMEOUT); quá hạn, lỗi hoặc
+      không có API → rule-based.
+    - with_status=True → trả về (phản hồi, final); final=False khi rule-based chỉ là tạm thời vì API
+      quá hạn (phản hồi AI sẽ có trong cache ở lần gọi sau) → người gọi không nên ghi nhớ kết quả này.
     """
-    try:
-        len_std, len_user = len(standard_features), len(user_features)
-        if len_std == 0 or len_user == 0:
-            return ["⚠️ Không đủ dữ liệu để tạo phản hồi. Hãy thử lại với video khác."]
+    feedback, final = _generate_feedback(standard_features, user_features, avg_score, timeout)
+    return (feedback, final) if with_status else feedback
+
 
-        # ⚖️ Resample để có cùng độ dài
-        target_len = min(len_std, len_user)
-        if len_std != len_user:
-            print(f"⏩ Chuẩn hóa độ dài: {len_std} → {target_len}, {len_user} → {target_len}")
-            standard_features = _resample_sequence(standard_features, target_len)
-            user_features = _resample_sequence(user_features, target_len)
+def _generate_feedback(standard_features, user_features, avg_score, timeout):
+    try:
+        if len(standard_features) == 0 or len(user_features) == 0:
+            return ["⚠️ Không đủ dữ liệu để tạo phản hồi. Hãy thử lại với video khác."], True
 
-        # 🧮 Tính độ lệch và độ mượt
-        mean_diff = float(np.mean(np.abs(standard_features - user_features)))
-        motion_var = float(np.var(user_features))
+        metrics = feedback_metrics(standard_features, user_features, avg_score)
+        timeout = FEEDBACK_TIMEOUT if timeout is None else timeout
 
         # Ưu tiên AI nếu có
-        if openai_client:
-            print("🤖 Dùng OpenAI GPT để sinh feedback...")
-            fb = _generate_openai_feedback(mean_diff, motion_var, avg_score)
-            if fb:
-                return fb
-
-        if genai_model:
-            print("✨ Dùng Gemini để sinh feedback...")
-            fb = _generate_gemini_feedback(mean_diff, motion_var, avg_score)
+        final = True
+        for provider in ("openai", "gemini"):
+            if not _get_client(provider):
+                continue
+            cached = load_cached_feedback(feedback_cache_key(provider, metrics))
+            if cached:
+                profiling.count("feedback_cache_hit")
+                return cached, True
+            print(f"🤖 Dùng {provider} để sinh feedback...")
+            try:
+                fb = submit_remote_feedback(provider, metrics).result(timeout=timeout)
+            except FutureTimeout:
+                print(f"⌛ {provider} chưa trả lời sau {timeout:.0f}s → dùng rule-based (kết quả sẽ được lưu cache).")
+                profiling.count("feedback_timeout")
+                final = False
+                break
             if fb:
-                return fb
+                return fb, True
 
         # Fallback
         print("🧠 Dùng mô phỏng AI nội bộ (rule-based).")
-        return _generate_rule_based_feedback(mean_diff, motion_var, avg_score)
+        return _generate_rule_based_feedback(metrics), final
 
     except Exception as e:
         print(f"⚠️ Lỗi khi tạo feedback: {e}")
-        return ["⚠️ Không thể tạo phản hồi do lỗi xử lý dữ liệu."]
+        return ["⚠️ Không thể tạo phản hồi do lỗi xử lý dữ liệu."], True
@@ -1,14 +1,17 @@
 import streamlit as st
 import os
-import numpy as np
-import matplotlib.pyplot as plt
-import gdown
+import json
 
 # Import các module nội bộ
 from tutorial_gallery import show_dance_gallery
-from pose_utils import extract_multi_person_keypoints, overlay_skeleton_with_scores
-from compare_utils_group_avg import compare_dance_group
+from pose_utils import extract_pose_sequence, MAX_PEOPLE, MAX_DETECTIONS
 from ai_feedback_utils import generate_feedback
+from job_utils import JobManager, FINISHED, DONE, CANCELLED, FAILED
+from upload_utils import ingest_upload, UploadRejected
+from media_assets import proxy_or_original
+from library_search import search_clip
+from reference_index import (STANDARD_VIDEO_IDS, standard_video_path, download_reference,
+                             find_reference, load_index)
 
 
 # =============================
@@ -22,20 +25,74 @@ st.caption("Xem bài múa mẫu, luyện tập và nhận phản hồi thông mi
 # =============================
 # 🎥 Google Drive Video Mẫu
 # =============================
-STANDARD_VIDEO_IDS = {
-    "Múa Xòe Tây Bắc": "1Zaj8tGnSgV1Ivtiuk-GImwYGIIu4lUdp",
-    "Múa Trống Cơm": "1K4hWlnZk9D_W2T3hQgMhZYcItpzdK8qW"
-}
-
-
+# (danh sách STANDARD_VIDEO_IDS nằm trong reference_index.py, dùng chung với lệnh dựng chỉ mục)
 @st.cache_resource
 def download_drive_video(drive_id, save_path):
     """Chỉ tải video 1 lần duy nhất."""
-    if os.path.exists(save_path):
-        return save_path
-    url = f"https://drive.google.com/uc?id={drive_id}"
-    gdown.download(url, save_path, quiet=False)
-    return save_path
+    return download_reference(drive_id, save_path)
+
+
+@st.cache_resource
+def get_reference_index():
+    """Nạp chỉ mục bài mẫu dựng sẵn (memory-mapped) một lần khi khởi động."""
+    return load_index()
+
+
+@st.cache_resource
+def get_job_manager():
+    """Một hàng đợi job nền cho cả server; tiến trình con nạp sẵn model khi được khởi động."""
+    return JobManager(preload=True)
+
+
+@st.fragment(run_every=1.0)
+def show_job_progress(job_id):
+    """Hiển thị tiến độ job nền; tự làm mới mỗi giây, xong thì chạy lại toàn trang."""
+    jobs = get_job_manager()
+    status = jobs.status(job_id)
+    if status is None or status["state"] in FINISHED:
+        st.rerun()
+
+    progress = status.get("progress") or {}
+    done, total = progress.get("done", 0), progress.get("total", 0)
+    stage = {"scoring": "Đang chấm điểm", "rendering": "Đang dựng video khung xương"}.get(
+        status.get("stage"), "Đang chờ xử lý")
+    text = f"⏳ {stage}... ({done}/{total})" if total else f"⏳ {stage}..."
+    st.progress(min(1.0, done / total) if total else 0.0, text=text)
+    if progress.get("running_score") is not None:
+        st.markdown(f"Điểm tạm thời: **{progress['running_score']:.1f}**")
+    if st.button("⛔ Hủy phân tích", key=f"cancel_{job_id}"):
+        jobs.cancel(job_id)
+
+
+def feedback_for_job(job_id, standard_path, user_path, avg_score, max_people=MAX_PEOPLE, section=None):
+    """
+    Phản hồi được ghi nhớ theo job (session_state) → không tính lại khi rerun.
+    Dùng cả chuỗi pose (đã có trong cache keypoints / chỉ mục) → phản hồi chỉ ra đoạn nào lệch.
+    Phản hồi rule-based tạm thời (API quá hạn) không được ghi nhớ: lần rerun sau lấy phản hồi AI từ cache đĩa.
+    """
+    memo = st.session_state.setdefault("feedback_memo", {})
+    key = (job_id, standard_path, user_path, avg_score, max_people, section)
+    if key in memo:
+        return memo[key]
+    reference = find_reference(standard_path)
+    seq_s = reference.sequence if reference else extract_pose_sequence(standard_path).filled()
+    if section is not None:
+        a, b = seq_s.timestamps.searchsorted(section)
+        seq_s = seq_s[a:b]
+    seq_u = extract_pose_sequence(user_path, max_people).filled()
+    if seq_s.n_people == 0 or seq_u.n_people == 0:
+        feedback, final = generate_feedback([], [], avg_score, with_status=True)
+    else:
+        feedback, final = generate_feedback(seq_s, seq_u, avg_score, with_status=True)
+    if final:
+        memo[key] = feedback
+    return feedback
+
+
+@st.cache_data(show_spinner=False)
+def identify_dance(user_path, max_people=MAX_PEOPLE):
+    """Bài mẫu + đoạn khớp nhất với video người dùng (library_search), ghi nhớ theo file."""
+    return search_clip(user_path, max_people)
 
 
 # =============================
@@ -62,7 +119,8 @@ with tab2:
 
     # Đường dẫn lưu cục bộ video mẫu
     os.makedirs("samples/standard", exist_ok=True)
-    standard_path = f"samples/standard/{dance_choice.replace(' ', '_')}.mp4"
+    standard_path = standard_video_path(dance_choice)
+    get_reference_index()
 
     # ✅ Tải video mẫu 1 lần duy nhất
     with st.spinner("⏳ Kiểm tra video mẫu..."):
@@ -77,62 +135,168 @@ with tab2:
     with col1:
         st.markdown("### 📹 Video mẫu")
         if standard_path and os.path.exists(standard_path):
-            st.video(standard_path)
+            # Bản proxy nhẹ (faststart) nếu đã dựng; chưa có → video gốc, proxy được dựng nền
+            st.video(proxy_or_original(standard_path))
+            if find_reference(standard_path) is None:
+                st.caption("ℹ️ Bài mẫu chưa có trong chỉ mục dựng sẵn (`python reference_index.py`).")
         else:
             st.warning("⚠️ Video mẫu chưa sẵn sàng.")
 
     with col2:
         uploaded_file = st.file_uploader("📤 Tải video của bạn", type=["mp4", "mov"])
+        max_people = int(st.number_input("👥 Số người tối đa được chấm điểm", min_value=1,
+                                         max_value=MAX_DETECTIONS, value=MAX_PEOPLE))
+        auto_match = st.checkbox("🔎 Tự nhận diện bài múa & đoạn tương ứng",
+                                 help="Tìm trong mọi bài mẫu / hướng dẫn đã có trong chỉ mục, "
+                                      "rồi chấm điểm với đúng đoạn khớp nhất")
 
         user_path = None
         if uploaded_file:
-            save_dir = f"samples/user_uploads/{dance_choice.replace(' ', '_')}/"
-            os.makedirs(save_dir, exist_ok=True)
-            user_path = os.path.join(save_dir, uploaded_file.name)
-            with open(user_path, "wb") as f:
-                f.write(uploaded_file.read())
-            st.success("✅ Video đã được tải lên!")
+            # Mỗi file tải lên chỉ nhận (chép theo khối + băm + kiểm tra) một lần, các lần rerun dùng lại
+            ingested = st.session_state.get("ingested_upload")
+            if not ingested or ingested[0] != uploaded_file.file_id:
+                # Nạp model ở tiến trình nền song song với lúc nhận file
+                get_job_manager().warm_up()
+                try:
+                    with st.spinner("📥 Đang nhận video..."):
+                        uploaded_file.seek(0)
+                        ingested = (uploaded_file.file_id, *ingest_upload(uploaded_file, uploaded_file.name))
+                    st.session_state["ingested_upload"] = ingested
+                except UploadRejected as e:
+                    ingested = None
+                    st.error(f"⚠️ {e}")
+
+            if ingested:
+                user_path, info = ingested[1], ingested[2]
+                st.success(f"✅ Video đã được tải lên! ({info['duration']:.0f} giây, "
+                           f"{info['width']}x{info['height']}, {info['fps']:.0f} fps)")
 
 
     # =============================
     # 🔍 Chạy phân tích nếu đủ dữ liệu
     # =============================
+    # Clip là một đoạn của bài mẫu bất kỳ → chấm với bài + đoạn tìm được thay cho bài đã chọn
+    section = None
+    if auto_match and user_path:
+        with st.spinner("🔎 Đang tìm bài múa tương ứng..."):
+            matches = identify_dance(user_path, max_people)["matches"]
+        best = matches[0] if matches else None
+        if best and best["video"] and os.path.exists(best["video"]):
+            standard_path, section = best["video"], (best["start_s"], best["end_s"])
+            st.info(f"🔎 Video của bạn khớp **{best['name']}**, đoạn {best['start_s']:.1f}s – {best['end_s']:.1f}s")
+        else:
+            st.warning("⚠️ Không tìm thấy bài mẫu phù hợp trong chỉ mục, chấm điểm với bài đã chọn.")
+
     if standard_path and user_path:
         st.markdown("---")
         st.subheader("🔍 Phân tích & So sánh chi tiết")
 
-        with st.spinner("🧮 Đang tính điểm tổng thể..."):
-            avg_score = compare_dance_group(standard_path, user_path)
+        # ⚙️ Phân tích chạy nền: rerun (đổi widget) chỉ đọc trạng thái/kết quả, không tính lại
+        jobs = get_job_manager()
+        job_args = {"max_people": max_people, **({"section": section} if section else {})}
+        job_id = jobs.job_id("compare", standard_path, user_path, **job_args)
+        status = jobs.status(job_id)
+
+        if status and status["state"] in (CANCELLED, FAILED):
+            if status["state"] == CANCELLED:
+                st.warning("⛔ Phân tích đã bị hủy.")
+            else:
+                st.error(f"⚠️ Phân tích thất bại: {status.get('error')}")
+            if not st.button("🔁 Chạy lại phân tích"):
+                st.stop()
+
+        if not status or status["state"] != DONE:
+            job_id = jobs.submit("compare", standard_path, user_path, **job_args)
+            show_job_progress(job_id)
+            st.stop()
+
+        result = jobs.result(job_id)
+        avg_score = result["score"]
+        report = result.get("report")
 
         st.success(f"🎯 Điểm trung bình toàn bài: **{avg_score:.1f}/100**")
+        if report:
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("📐 Góc khớp", f"{report['components']['angles']:.0f}")
+            c2.metric("🦾 Hướng tay chân", f"{report['components']['limbs']:.0f}")
+            c3.metric("💨 Tốc độ", f"{report['components']['velocity']:.0f}")
+            c4.metric("⏱️ Lệch nhịp", f"{report['timing']['offset_s']:+.2f} s",
+                      help=f"Tỉ lệ tốc độ so với mẫu: {report['timing']['tempo_ratio']:.2f}")
+
+            with st.expander("📊 Chi tiết theo khớp, chi và từng đoạn"):
+                st.markdown("**Điểm từng đoạn (theo thời gian video mẫu)**")
+                st.bar_chart({f"{seg['start']:.0f}s": seg["score"] for seg in report["segments"]})
+                colJ, colL = st.columns(2)
+                colJ.dataframe({"Khớp": list(report["joints"]),
+                                "Sai số (°)": [v["error_deg"] for v in report["joints"].values()],
+                                "Điểm": [v["score"] for v in report["joints"].values()]},
+                               hide_index=True)
+                colL.dataframe({"Chi": list(report["limbs"]),
+                                "Sai số (°)": [v["error_deg"] for v in report["limbs"].values()],
+                                "Điểm": [v["score"] for v in report["limbs"].values()]},
+                               hide_index=True)
+                sampling = report.get("sampling") or {}
+                if sampling.get("skipped_fraction"):
+                    st.caption(f"🎞️ Lấy mẫu thích ứng: suy luận {sampling['inferred']}/{sampling['candidates']} "
+                               f"frame, bỏ qua {sampling['skipped_fraction']:.0%} (được nội suy)")
+
+            dancers = report.get("dancers") or []
+            sync = report.get("synchrony") or {}
+            if len(dancers) > 1:
+                st.markdown("#### 👥 Điểm từng người & độ đồng bộ nhóm")
+                s1, s2, s3 = st.columns(3)
+                s1.metric("🤝 Hệ số đồng đều", f"{report['sync_factor']:.2f}")
+                if sync.get("dispersion") is not None:
+                    s2.metric("📏 Độ phân tán tư thế", f"{sync['dispersion']:.2f}",
+                              help=f"Nhóm mẫu: {sync.get('reference_dispersion') or 0:.2f} (chiều dài thân)")
+                if sync.get("mean_abs_lag_s") is not None:
+                    s3.metric("⏱️ Lệch pha trung bình", f"{sync['mean_abs_lag_s']:.2f} s")
+                st.dataframe({"Người": [f"P{d['person']}" for d in dancers],
+                              "Điểm": [d["score"] for d in dancers],
+                              "Lệch so với nhóm (s)": sync.get("person_lag_s") or [None] * len(dancers),
+                              "Có mặt (%)": [round(d["coverage"] * 100) for d in dancers]},
+                             hide_index=True)
+        elif result["segment_scores"]:
+            st.caption("Điểm từng đoạn: " + " · ".join(f"{s:.0f}" for s in result["segment_scores"]))
 
         st.markdown("### 🦴 Hiển thị khung xương (Pose Skeleton)")
         colA, colB = st.columns(2)
 
-        with st.spinner("🎥 Đang xử lý video khung xương..."):
-            standard_overlay = overlay_skeleton_with_scores(standard_path, "temp_standard_pose.mp4", scores=[avg_score])
-            user_overlay = overlay_skeleton_with_scores(user_path, "temp_user_pose.mp4", scores=[avg_score])
-
         with colA:
             st.markdown("**📺 Video mẫu (Pose)**")
-            st.video(standard_overlay)
+            st.video(result["standard_overlay"])
 
         with colB:
             st.markdown("**🧍 Video của bạn (Pose + Điểm)**")
-            st.video(user_overlay)
+            st.video(result["user_overlay"])
+
+        # Dựng sẵn trong job (đoạn mẫu đã khớp | video người dùng); job cũ không có → bỏ qua
+        if result.get("side_by_side") and st.checkbox("🪞 Xem hai video cạnh nhau"):
+            st.video(result["side_by_side"])
 
         st.markdown("### 💬 Gợi ý cải thiện động tác")
         with st.spinner("🧠 Đang tạo phản hồi..."):
-            seq_s = extract_multi_person_keypoints(standard_path)
-            seq_u = extract_multi_person_keypoints(user_path)
-
-            feedback_list = generate_feedback(
-                np.mean(seq_s[0], axis=0) if seq_s else np.zeros(99),
-                np.mean(seq_u[0], axis=0) if seq_u else np.zeros(99),
-                avg_score
-            )
+            feedback_list = feedback_for_job(job_id, standard_path, user_path, avg_score, max_people, section)
 
         for fb in feedback_list:
             st.markdown(f"- {fb}")
 
+        profile = result.get("profile")
+        if profile and profile.get("stages"):
+            with st.expander("⏱️ Hiệu năng xử lý từng bước"):
+                stages = sorted(profile["stages"].items(), key=lambda kv: -kv[1]["seconds"])
+                st.dataframe({"Bước": [name for name, _ in stages],
+                              "Số lần": [r["calls"] for _, r in stages],
+                              "Frame": [r["frames"] for _, r in stages],
+                              "Tổng (s)": [r["seconds"] for _, r in stages],
+                              "Frame/s": [r["fps"] for _, r in stages],
+                              "p50 (ms)": [r["p50_ms"] for _, r in stages],
+                              "p95 (ms)": [r["p95_ms"] for _, r in stages],
+                              "RSS đỉnh (MB)": [r["peak_rss_mb"] for _, r in stages]},
+                             hide_index=True)
+                if profile.get("counters"):
+                    st.caption(" · ".join(f"{k}: {v}" for k, v in sorted(profile["counters"].items())))
+                st.download_button("⬇️ Tải số liệu (JSON)", json.dumps(profile, ensure_ascii=False, indent=1),
+                                   file_name="profile.json", mime="application/json")
+
         st.info("💡 Ứng dụng đang chạy hoàn toàn **Offline** — không cần API & không tốn phí.")
@@ -0,0 +1,287 @@
+"""
+Chấm điểm hàng loạt (không cần giao diện) cả lớp video luyện tập so với một bài mẫu.
+
+    python batch_grade.py samples/standard/Múa_Xòe_Tây_Bắc.mp4 bai_nop/ --out ket_qua/
+    python batch_grade.py mau.mp4 danh_sach.csv --workers 4 --max-people 10
+
+Đầu vào là một thư mục (tìm video đệ quy) hoặc file danh sách:
+    .csv  – cột `path` (hoặc `video`), tùy chọn cột `name` (tên học viên)
+    khác  – mỗi dòng một đường dẫn video
+Đường dẫn tương đối trong danh sách tính từ thư mục chứa file danh sách.
+
+Kết quả trong --out:
+    reports/<sha>.json   báo cáo chi tiết từng video (xem scoring_utils.score_sequences)
+    leaderboard.csv      bảng xếp hạng
+    leaderboard.json     bảng xếp hạng + danh sách video lỗi
+    profile.json         thời gian từng bước pipeline cộng dồn trên mọi tiến trình của lượt chạy
+Chạy lại cùng lệnh → video đã có báo cáo (cùng bài mẫu, cùng tham số) được bỏ qua.
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import profiling
+from compare_utils_group_avg import compare_dance_report
+from pose_utils import (file_sha256, resolve_inference_settings, cache_settings, init_worker,
+                        MAX_PEOPLE, DEFAULT_WORKERS, DEFAULT_TORCH_THREADS)
+from reference_index import find_reference, build_index
+from upload_utils import ALLOWED_EXTENSIONS, probe_video, validate_video
+
+# ================================
+# ⚙️ Cấu hình
+# ================================
+OUTPUT_DIR = os.environ.get("DANCE_GRADE_DIR", "grading")
+SEGMENT_SECONDS = 2.0
+LEADERBOARD_FIELDS = ["rank", "name", "video", "score", "pose_score", "sync_factor", "angles", "limbs",
+                      "velocity", "timing_offset_s", "dancers", "frames", "seconds"]
+
+
+# ================================
+# 📋 Danh sách bài nộp
+# ================================
+def find_videos(directory):
+    """Mọi video (theo đuôi file) trong thư mục, tìm đệ quy, sắp theo đường dẫn."""
+    videos = []
+    for root, _, files in os.walk(directory):
+        videos += [os.path.join(root, f) for f in files
+                   if f.lower().endswith(ALLOWED_EXTENSIONS) and not f.startswith(".")]
+    return sorted(videos)
+
+
+def read_manifest(path):
+    """Danh sách (tên, đường dẫn video) từ file .csv (cột path/video, name) hoặc file mỗi dòng một video."""
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            rows = [(row.get("name"), row.get("path") or row.get("video")) for row in csv.DictReader(f)]
+        else:
+            rows = [(None, line.strip()) for line in f if line.strip() and not line.startswith("#")]
+    return [(name or os.path.splitext(os.path.basename(p))[0], os.path.join(base, p))
+            for name, p in rows if p]
+
+
+def submissions(source):
+    """(tên, đường dẫn) của các bài nộp từ thư mục hoặc file danh sách."""
+    if os.path.isdir(source):
+        return [(os.path.splitext(os.path.relpath(p, source))[0], p) for p in find_videos(source)]
+    return read_manifest(source)
+
+
+# ================================
+# 🧮 Chấm một video (chạy trong tiến trình con)
+# ================================
+def grade_params(max_people, segment_seconds, settings=None):
+    """Tham số quyết định kết quả chấm → báo cáo cũ chỉ được dùng lại khi khớp."""
+    return {"max_people": max_people, "segment_seconds": segment_seconds,
+            "inference": cache_settings(resolve_inference_settings(settings))}
+
+
+def grade_video(reference_path, video_path, max_people=MAX_PEOPLE, segment_seconds=SEGMENT_SECONDS,
+                profile=False):
+    """
+    Báo cáo chấm điểm một video + số frame và thời gian xử lý. Không có người → report None.
+    Video không đọc được → UploadRejected (được ghi vào danh sách lỗi, không dừng cả lớp).
+    profile=True (trong tiến trình con) → kèm số liệu từng bước của riêng video này.
+    """
+    if profile:
+        profiling.reset()
+    start = time.perf_counter()
+    info = validate_video(probe_video(video_path), max_seconds=None)
+    report = compare_dance_report(reference_path, video_path, segment_seconds=segment_seconds,
+                                  max_people=max_people)
+    result = {
+        "report": report,
+        "frames": info["frames"],
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    if profile:
+        result["profile"] = profiling.snapshot(samples=True)
+    return result
+
+
+def _report_path(out_dir, sha):
+    return os.path.join(out_dir, "reports", f"{sha[:16]}.json")
+
+
+def _write_json(path, data):
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def load_report(out_dir, sha, reference_sha, params):
+    """Báo cáo đã chấm trước đó nếu cùng bài mẫu và tham số, ngược lại None."""
+    try:
+        with open(_report_path(out_dir, sha), encoding="utf-8") as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if record.get("reference_sha") != reference_sha or record.get("params") != params:
+        return None
+    return record
+
+
+# ================================
+# 🏆 Bảng xếp hạng
+# ================================
+def leaderboard_rows(records):
+    """Các dòng bảng xếp hạng (điểm giảm dần); video không có người được xếp cuối."""
+    rows = []
+    for r in records:
+        report = r.get("report") or {}
+        components = report.get("components") or {}
+        rows.append({
+            "name": r["name"], "video": r["video"], "score": report.get("score"),
+            "pose_score": report.get("pose_score"), "sync_factor": report.get("sync_factor"),
+            "angles": components.get("angles"), "limbs": components.get("limbs"),
+            "velocity": components.get("velocity"),
+            "timing_offset_s": (report.get("timing") or {}).get("offset_s"),
+            "dancers": len(report.get("dancers") or []), "frames": r.get("frames"), "seconds": r.get("seconds"),
+        })
+    rows.sort(key=lambda row: (row["score"] is None, -(row["score"] or 0.0), row["name"]))
+    for rank, row in enumerate(rows, 1):
+        row["rank"] = rank
+    return rows
+
+
+def write_leaderboard(out_dir, reference_path, records, failed):
+    rows = leaderboard_rows(records)
+    tmp = os.path.join(out_dir, f"leaderboard.csv.tmp-{os.getpid()}")
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=LEADERBOARD_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp, os.path.join(out_dir, "leaderboard.csv"))
+    _write_json(os.path.join(out_dir, "leaderboard.json"), {
+        "reference": reference_path, "generated": time.time(), "entries": rows, "failed": failed,
+    })
+    return rows
+
+
+# ================================
+# 🏭 Chấm cả lớp
+# ================================
+def grade_batch(reference_path, items, out_dir=OUTPUT_DIR, workers=None, torch_threads=None,
+                max_people=MAX_PEOPLE, segment_seconds=SEGMENT_SECONDS, force=False, log=print):
+    """
+    Chấm mọi (tên, video) trong `items` so với `reference_path`.
+    - Bài mẫu được phân tích một lần (chỉ mục dựng sẵn, memory-map) và dùng chung cho mọi tiến trình.
+    - Video chấm song song trong một pool tiến trình (spawn, mỗi tiến trình nạp model một lần).
+    - Mỗi báo cáo được ghi ngay khi xong → bị ngắt giữa chừng thì chạy lại sẽ tiếp tục.
+    Trả về dict: rows (bảng xếp hạng), failed, graded, skipped, elapsed, frames.
+    """
+    os.makedirs(os.path.join(out_dir, "reports"), exist_ok=True)
+
+    # Phía mẫu: phân tích một lần vào chỉ mục, các tiến trình con chỉ đọc lại
+    if find_reference(reference_path) is None:
+        build_index([reference_path])
+    reference_sha = file_sha256(reference_path)
+    params = grade_params(max_people, segment_seconds)
+
+    records, failed, todo = [], [], []
+    for name, video in items:
+        if not os.path.exists(video):
+            failed.append({"name": name, "video": video, "error": "Không tìm thấy file"})
+            continue
+        sha = file_sha256(video)
+        record = None if force else load_report(out_dir, sha, reference_sha, params)
+        if record is not None:
+            records.append(dict(record, name=name, video=video))
+        else:
+            todo.append((name, video, sha))
+    skipped = len(records)
+    log(f"📋 {len(items)} bài nộp: {skipped} đã chấm trước đó, {len(todo)} cần chấm, {len(failed)} thiếu file")
+
+    n_cpu = os.cpu_count() or 1
+    workers = max(1, min(workers or DEFAULT_WORKERS or n_cpu, len(todo) or 1))
+    torch_threads = torch_threads or DEFAULT_TORCH_THREADS or max(1, n_cpu // workers)
+
+    def finish(name, video, sha, result=None, error=None):
+        if error is not None:
+            failed.append({"name": name, "video": video, "error": error})
+            log(f"  ❌ {name}: {error}")
+            return
+        profiling.merge(result.pop("profile", {}))
+        record = dict(result, name=name, video=video, video_sha=sha, reference_sha=reference_sha, params=params)
+        _write_json(_report_path(out_dir, sha), record)
+        records.append(record)
+        score = (result["report"] or {}).get("score")
+        log(f"  ✅ [{len(records) - skipped}/{len(todo)}] {name}: "
+            f"{'không thấy người' if score is None else f'{score:.1f}'} ({result['seconds']:.1f} s)")
+
+    start = time.perf_counter()
+    profiling.reset()
+    try:
+        if workers <= 1:
+            init_worker(torch_threads)
+            for name, video, sha in todo:
+                try:
+                    finish(name, video, sha, grade_video(reference_path, video, max_people, segment_seconds))
+                except Exception as e:
+                    finish(name, video, sha, error=f"{type(e).__name__}: {e}")
+        else:
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                     initializer=init_worker, initargs=(torch_threads,)) as pool:
+                futures = {pool.submit(grade_video, reference_path, video, max_people, segment_seconds, True):
+                           (name, video, sha) for name, video, sha in todo}
+                try:
+                    for future in as_completed(futures):
+                        try:
+                            finish(*futures[future], future.result())
+                        except Exception as e:
+                            finish(*futures[future], error=f"{type(e).__name__}: {e}")
+                except KeyboardInterrupt:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    raise
+    finally:
+        # Kể cả khi bị ngắt: bảng xếp hạng phản ánh mọi báo cáo đã ghi
+        elapsed = time.perf_counter() - start
+        rows = write_leaderboard(out_dir, reference_path, records, failed)
+        profiling.export_json(os.path.join(out_dir, "profile.json"))
+
+    graded = records[skipped:]
+    return {
+        "rows": rows, "failed": failed, "graded": len(graded), "skipped": skipped,
+        "elapsed": elapsed, "frames": sum(r.get("frames") or 0 for r in graded),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("reference", help="Video bài múa mẫu")
+    parser.add_argument("source", help="Thư mục video hoặc file danh sách (.csv / .txt)")
+    parser.add_argument("--out", default=OUTPUT_DIR, help="Thư mục kết quả")
+    parser.add_argument("--workers", type=int, help="Số tiến trình chấm song song (mặc định: số lõi CPU)")
+    parser.add_argument("--torch-threads", type=int, help="Số luồng torch mỗi tiến trình")
+    parser.add_argument("--max-people", type=int, default=MAX_PEOPLE)
+    parser.add_argument("--segment-seconds", type=float, default=SEGMENT_SECONDS)
+    parser.add_argument("--force", action="store_true", help="Chấm lại cả video đã có báo cáo")
+    parser.add_argument("--top", type=int, default=10, help="Số dòng bảng xếp hạng in ra")
+    args = parser.parse_args()
+
+    items = submissions(args.source)
+    result = grade_batch(args.reference, items, args.out, args.workers, args.torch_threads,
+                         args.max_people, args.segment_seconds, args.force)
+
+    print(f"\n🏆 Bảng xếp hạng ({args.out}/leaderboard.csv):")
+    for row in result["rows"][:args.top]:
+        score = "-" if row["score"] is None else f"{row['score']:.1f}"
+        print(f"  {row['rank']:>3}. {row['name']:<30} {score:>6}")
+    if result["failed"]:
+        print(f"⚠️ {len(result['failed'])} video lỗi (xem leaderboard.json)")
+
+    elapsed = result["elapsed"]
+    if result["graded"] and elapsed > 0:
+        print(f"\n{profiling.format_table(profiling.snapshot())}")
+        print(f"\n⏱️ Đã chấm {result['graded']} video trong {elapsed:.1f} s: "
+              f"{result['graded'] * 60 / elapsed:.1f} video/phút, {result['frames'] / elapsed:.1f} frame/s")
+
+
+if __name__ == "__main__":
+    main()
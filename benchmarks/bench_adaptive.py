@@ -0,0 +1,97 @@
+"""
+Đo lấy mẫu thích ứng theo chuyển động (motion_budget): tốc độ và sai số so với phân tích đủ frame.
+
+    python benchmarks/bench_adaptive.py path/to/video.mp4 --budgets 1 2 4 8
+    python benchmarks/bench_adaptive.py --target-fps 15 --max-gap 4 --backend onnx
+
+Không truyền video → dùng video tổng hợp của bench_chunked_decode.
+Mỗi cấu hình phân tích lại từ đầu (không dùng cache). Với mỗi ngưỡng in ra:
+  tỉ lệ frame suy luận, thời gian + tăng tốc so với đủ frame,
+  sai số keypoints (trung bình / p95, % chiều dài thân) trên các frame bị bỏ qua rồi nội suy,
+  điểm khi chấm chuỗi đủ frame với chuỗi lấy mẫu thích ứng (100 = giống hệt).
+Model giả (--backend fake) sinh pose theo checksum ảnh chứ không theo chuyển động thật → chỉ dùng
+để kiểm tra thời gian, sai số không có ý nghĩa.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import model_registry  # noqa: E402
+from pose_utils import (L_HIP, R_HIP, L_SHOULDER, R_SHOULDER, MAX_PEOPLE,  # noqa: E402
+                        extract_pose_sequence)
+from pose_utils_mock import FakePoseModel  # noqa: E402
+from scoring_utils import score_pose_sequences  # noqa: E402
+from bench_chunked_decode import make_synthetic_video  # noqa: E402
+
+
+def timed_sequence(video, max_people, settings):
+    start = time.perf_counter()
+    seq = extract_pose_sequence(video, max_people, use_cache=False, settings=settings)
+    return seq, time.perf_counter() - start
+
+
+def keypoint_error(full, approx, skipped_only=True):
+    """
+    Sai số keypoints (chia chiều dài thân) của `approx` so với `full` trên các frame chung,
+    ghép người giữa hai chuỗi theo khoảng cách trung bình nhỏ nhất (ID theo dõi có thể khác nhau).
+    """
+    full_idx = np.asarray(full.meta["frame_indices"])
+    rows = np.searchsorted(approx.meta["frame_indices"], full_idx)
+    ok = rows < approx.n_frames
+    ok[ok] = np.asarray(approx.meta["frame_indices"])[rows[ok]] == full_idx[ok]
+    if skipped_only:
+        ok &= ~np.isin(full_idx, approx.meta.get("source_frame_indices", []))
+    a, b = full.data[ok], approx.data[rows[ok]]
+    if not len(a) or not full.n_people or not approx.n_people:
+        return np.zeros(0)
+
+    dist = np.linalg.norm(a[:, :, None, :, :2] - b[:, None, :, :, :2], axis=-1)   # (F, Pa, Pb, 17)
+    cost = np.nan_to_num(np.nanmean(dist, axis=(0, 3)), nan=1e9)
+    pa, pb = linear_sum_assignment(cost)
+
+    xy = a[..., :2]
+    torso = np.linalg.norm((xy[..., L_SHOULDER, :] + xy[..., R_SHOULDER, :]) / 2
+                           - (xy[..., L_HIP, :] + xy[..., R_HIP, :]) / 2, axis=-1)    # (F, Pa)
+    err = dist[:, pa, pb] / np.where(torso[:, pa] > 1e-6, torso[:, pa], np.nan)[..., None]
+    return err[np.isfinite(err)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video", nargs="?", help="Video cần đo (mặc định: video tổng hợp)")
+    parser.add_argument("--budgets", type=float, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--max-gap", type=int, default=6)
+    parser.add_argument("--target-fps", type=float, default=None)
+    parser.add_argument("--backend", default="torch", help="torch (mặc định), onnx, ..., fake")
+    parser.add_argument("--max-people", type=int, default=MAX_PEOPLE)
+    parser.add_argument("--seconds", type=int, default=20, help="Độ dài video tổng hợp")
+    args = parser.parse_args()
+
+    video = args.video or make_synthetic_video(os.path.join(tempfile.mkdtemp(), "bench.mp4"), args.seconds)
+    if args.backend == "fake":
+        model_registry.register_model("pose-fake", lambda: FakePoseModel(n_people=args.max_people))
+    base = {"backend": args.backend, "target_fps": args.target_fps}
+    extract_pose_sequence(video, args.max_people, use_cache=False, settings=base)   # nạp model, không tính giờ
+
+    full, t_full = timed_sequence(video, args.max_people, base)
+    print(f"{'budget':>8}{'inferred':>10}{'time s':>9}{'speedup':>9}{'err %':>8}{'p95 %':>8}{'score':>8}")
+    print(f"{'full':>8}{1:>10.0%}{t_full:>9.2f}{1:>9.2f}{'-':>8}{'-':>8}{'-':>8}")
+    for budget in args.budgets:
+        settings = dict(base, motion_budget=budget, max_gap=args.max_gap)
+        seq, dt = timed_sequence(video, args.max_people, settings)
+        sampling = seq.meta["sampling"]
+        err = keypoint_error(full, seq) * 100
+        score = score_pose_sequences(full.filled(), seq.filled())["score"] if seq.n_people else 0.0
+        mean, p95 = (f"{err.mean():>8.1f}", f"{np.percentile(err, 95):>8.1f}") if len(err) else (f"{'-':>8}",) * 2
+        print(f"{budget:>8g}{1 - sampling['skipped_fraction']:>10.0%}{dt:>9.2f}{t_full / dt:>9.2f}"
+              f"{mean}{p95}{score:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+So sánh tốc độ suy luận pose giữa các backend CPU (và độ khớp với PyTorch).
+
+    python benchmarks/bench_backends.py path/to/video.mp4 --backends torch onnx onnx-int8 openvino
+    python benchmarks/bench_backends.py --batch 1 8 --frames 128 --imgsz 480
+
+Không truyền video → dùng video tổng hợp của bench_chunked_decode.
+Model của backend chưa được xuất sẽ được xuất trước khi đo (không tính vào thời gian).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import model_registry  # noqa: E402
+from pose_utils import infer_batch, pose_model_name  # noqa: E402
+from inference_backends import BACKENDS, compare_poses  # noqa: E402
+from bench_chunked_decode import make_synthetic_video  # noqa: E402
+
+
+def read_frames(video_path, n_frames):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < n_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def run_backend(frames, backend, batch_size, imgsz):
+    """(kết quả, số giây) khi suy luận toàn bộ frames theo lô."""
+    poses = []
+    start = time.perf_counter()
+    for i in range(0, len(frames), batch_size):
+        poses += infer_batch(frames[i:i + batch_size], imgsz, backend)
+    return poses, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video", nargs="?", help="Video cần đo (mặc định: video tổng hợp)")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--frames", type=int, default=96)
+    parser.add_argument("--imgsz", type=int, default=640)
+    args = parser.parse_args()
+
+    video = args.video or make_synthetic_video(os.path.join(tempfile.mkdtemp(), "bench.mp4"), seconds=5)
+    frames = read_frames(video, args.frames)
+    reference = {}
+
+    print(f"{'backend':<15}{'batch':>6}{'load (s)':>10}{'frames/s':>10}{'ms/frame':>10}"
+          f"{'recall':>8}{'kpt err':>9}")
+    for backend in args.backends:
+        try:
+            start = time.perf_counter()
+            model_registry.warm_up(pose_model_name(backend), args.imgsz)
+            load = time.perf_counter() - start
+        except Exception as e:
+            print(f"{backend:<15} bỏ qua: {e}")
+            continue
+
+        for batch_size in args.batch:
+            poses, dt = run_backend(frames, backend, batch_size, args.imgsz)
+            if backend == "torch":
+                reference[batch_size] = poses
+            parity = compare_poses(reference[batch_size], poses) if batch_size in reference else None
+            recall = f"{parity['recall']:>8.3f}{parity['kpt_error']:>9.4f}" if parity else f"{'-':>8}{'-':>9}"
+            print(f"{backend:<15}{batch_size:>6}{load:>10.2f}{len(frames) / dt:>10.1f}"
+                  f"{dt * 1000 / len(frames):>10.1f}{recall}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Đo khả năng mở rộng của analyze_video_chunked theo số tiến trình.
+
+    python benchmarks/bench_chunked_decode.py path/to/video.mp4 --workers 1 2 4 8
+
+Không truyền video → tự tạo video tổng hợp (hình người que chuyển động) để đo.
+Mỗi cấu hình chạy không dùng cache và được so khớp với kết quả tuần tự.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pose_utils  # noqa: E402
+
+
+def make_synthetic_video(path, seconds=20, fps=30, size=(640, 360), people=3, phase=0.0):
+    """
+    Video tổng hợp (tất định) có `people` hình người que di chuyển (đủ để YOLO phát hiện một phần).
+    phase lệch nhịp chuyển động (vd tạo "video mẫu" và "video người dùng" khác nhau đôi chút).
+    """
+    w, h = size
+    k = h / 360  # kích thước người que theo chiều cao khung hình
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    for f in range(int(seconds * fps)):
+        frame = np.full((h, w, 3), 235, np.uint8)
+        for p in range(people):
+            cx = int(w * (p + 1) / (people + 1) + 30 * k * np.sin(f / 15 + p + phase))
+            cy = h // 2
+            cv2.circle(frame, (cx, cy - int(80 * k)), int(18 * k), (40, 40, 40), -1)
+            cv2.line(frame, (cx, cy - int(60 * k)), (cx, cy + int(30 * k)), (40, 40, 40), 8)
+            swing = int(40 * k * np.sin(f / 8 + p + phase))
+            arm_y = cy - int(40 * k)
+            cv2.line(frame, (cx, arm_y), (cx - int(45 * k), arm_y + swing), (40, 40, 40), 6)
+            cv2.line(frame, (cx, arm_y), (cx + int(45 * k), arm_y - swing), (40, 40, 40), 6)
+            cv2.line(frame, (cx, cy + int(30 * k)), (cx - int(25 * k), cy + int(100 * k)), (40, 40, 40), 7)
+            cv2.line(frame, (cx, cy + int(30 * k)), (cx + int(25 * k), cy + int(100 * k)), (40, 40, 40), 7)
+        out.write(frame)
+    out.release()
+    return path
+
+
+def same_analysis(a, b):
+    return all(np.array_equal(np.nan_to_num(a[k]), np.nan_to_num(b[k])) for k in ("keypoints", "counts", "frame_indices"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video", nargs="?", help="Video cần đo (mặc định: video tổng hợp)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seconds", type=int, default=20, help="Độ dài video tổng hợp")
+    parser.add_argument("--target-fps", type=float, default=None)
+    args = parser.parse_args()
+
+    video = args.video or make_synthetic_video(os.path.join(tempfile.mkdtemp(), "bench.mp4"), args.seconds)
+    settings = {"target_fps": args.target_fps}
+
+    t0 = time.perf_counter()
+    baseline = pose_utils.analyze_video(video, use_cache=False, settings=settings)
+    base_time = time.perf_counter() - t0
+    n = baseline["n_frames"]
+    print(f"{'mode':<14}{'time (s)':>10}{'frames/s':>10}{'speedup':>9}  match")
+    print(f"{'sequential':<14}{base_time:>10.2f}{n / base_time:>10.1f}{1.0:>9.2f}  -")
+
+    for w in args.workers:
+        t0 = time.perf_counter()
+        result = pose_utils.analyze_video_chunked(video, workers=w, use_cache=False, settings=settings)
+        dt = time.perf_counter() - t0
+        print(f"{f'chunked x{w}':<14}{dt:>10.2f}{n / dt:>10.1f}{base_time / dt:>9.2f}  {same_analysis(baseline, result)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Đo toàn bộ pipeline phân tích theo từng bước trên video tổng hợp (tất định, tạo tại chỗ).
+
+    python benchmarks/bench_pipeline.py                                   # model giả, bộ cấu hình mặc định
+    python benchmarks/bench_pipeline.py --seconds 10 60 --sizes 640x360 1920x1080 --people 3 20
+    python benchmarks/bench_pipeline.py --backend torch --json ket_qua.json
+    python benchmarks/bench_pipeline.py --baseline ket_qua.json          # báo lỗi nếu chậm hơn lần trước
+
+Mỗi cấu hình (độ dài × độ phân giải × số người) chạy trong một tiến trình mới (RSS đỉnh không
+bị cấu hình trước ảnh hưởng), không dùng cache keypoints:
+    decode → (preprocess) → inference → postprocess → tracking → group_pose → alignment → scoring
+    → overlay_decode / overlay_draw / overlay_encode → feedback
+Mặc định dùng model giả (pose_utils_mock.FakePoseModel) → đo phần còn lại của pipeline mà không cần
+YOLO; `--backend torch|onnx|...` để đo cả suy luận thật.
+Số liệu mỗi bước: frame/s, độ trễ p50/p95/p99 mỗi lần gọi, RSS đỉnh của tiến trình khi bước kết thúc.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_chunked_decode import make_synthetic_video  # noqa: E402
+
+VIDEO_DIR = os.path.join(tempfile.gettempdir(), "dance-bench-videos")
+REGRESSION_TOLERANCE = 0.2   # chậm hơn baseline quá 20% (frame/s hoặc p95) → báo hồi quy
+
+
+def synthetic_video(seconds, size, people, phase=0.0, fps=30):
+    """Video tổng hợp theo cấu hình (tạo một lần, dùng lại giữa các lần đo)."""
+    os.makedirs(VIDEO_DIR, exist_ok=True)
+    path = os.path.join(VIDEO_DIR, f"{seconds:g}s_{size[0]}x{size[1]}_{people}p_{phase:g}.mp4")
+    if not os.path.exists(path):
+        make_synthetic_video(path, seconds, fps, size, people, phase)
+    return path
+
+
+def run_config(seconds, size, people, backend, max_people, imgsz):
+    """Chạy một cấu hình trong tiến trình hiện tại, trả về snapshot của profiling."""
+    import profiling
+    import model_registry
+    import pose_utils
+    from pose_utils import extract_pose_sequence, overlay_skeleton_with_scores
+    from pose_utils_mock import FakePoseModel
+    from render_utils import fit_scale
+    from scoring_utils import score_pose_sequences
+    from ai_feedback_utils import generate_feedback
+
+    pose_utils.CACHE_DIR = tempfile.mkdtemp(prefix="dance-bench-cache-")   # luôn đo từ đầu, không dùng cache cũ
+    if backend == "fake":
+        model_registry.register_model("pose-fake", lambda: FakePoseModel(n_people=people))
+    settings = {"backend": backend, "imgsz": imgsz}
+    reference = synthetic_video(seconds, size, people, phase=0.5)
+    video = synthetic_video(seconds, size, people)
+
+    # Phía mẫu được phân tích trước (ngoài phần đo), giống chỉ mục bài mẫu dựng sẵn
+    std_seq = extract_pose_sequence(reference, max_people, settings=settings).filled()
+    profiling.reset()
+
+    usr_seq = extract_pose_sequence(video, max_people, settings=settings)
+    report = score_pose_sequences(std_seq, usr_seq.filled(), presence=usr_seq.valid)
+    overlay = os.path.join(tempfile.mkdtemp(prefix="dance-bench-out-"), "overlay.mp4")
+    overlay_skeleton_with_scores(video, overlay, scores=[d["score"] for d in report["dancers"]],
+                                 settings=settings, scale=fit_scale(video, 480), out_fps=15,
+                                 max_people=max_people)
+    generate_feedback(std_seq, usr_seq.filled(), report["score"])
+    return profiling.snapshot()
+
+
+def config_name(seconds, size, people):
+    return f"{seconds:g}s {size[0]}x{size[1]} {people}p"
+
+
+def find_regressions(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Các bước chậm hơn baseline: frame/s giảm hoặc p95 tăng quá `tolerance`."""
+    problems = []
+    for name, snap in results.items():
+        for stage, row in snap["stages"].items():
+            old = baseline.get(name, {}).get("stages", {}).get(stage)
+            if not old:
+                continue
+            if old.get("fps") and row.get("fps") and row["fps"] < old["fps"] * (1 - tolerance):
+                problems.append(f"{name} / {stage}: {old['fps']:.1f} → {row['fps']:.1f} frame/s")
+            if old.get("p95_ms") and row.get("p95_ms") and row["p95_ms"] > old["p95_ms"] * (1 + tolerance) \
+                    and row["p95_ms"] - old["p95_ms"] > 0.5:
+                problems.append(f"{name} / {stage}: p95 {old['p95_ms']:.2f} → {row['p95_ms']:.2f} ms")
+    return problems
+
+
+def parse_size(text):
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, nargs="+", default=[10, 30])
+    parser.add_argument("--sizes", type=parse_size, nargs="+", default=[(640, 360), (1280, 720)])
+    parser.add_argument("--people", type=int, nargs="+", default=[3, 10])
+    parser.add_argument("--backend", default="fake", help="fake (mặc định, không suy luận), torch, onnx, ...")
+    parser.add_argument("--max-people", type=int, help="Mặc định: bằng số người trong video")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--json", help="Ghi kết quả ra file JSON")
+    parser.add_argument("--baseline", help="File JSON của lần đo trước để so sánh")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    args = parser.parse_args()
+
+    import profiling
+
+    results = {}
+    ctx = multiprocessing.get_context("spawn")
+    for seconds in args.seconds:
+        for size in args.sizes:
+            for people in args.people:
+                name = config_name(seconds, size, people)
+                print(f"\n🎬 {name} (backend {args.backend})")
+                with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                    snap = pool.submit(run_config, seconds, size, people, args.backend,
+                                       args.max_people or people, args.imgsz).result()
+                results[name] = snap
+                print(profiling.format_table(snap))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=1)
+        print(f"\n💾 Đã ghi {args.json}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            problems = find_regressions(results, json.load(f), args.tolerance)
+        if problems:
+            print("\n⚠️ Hồi quy hiệu năng:")
+            for p in problems:
+                print(f"  - {p}")
+            sys.exit(1)
+        print("\n✅ Không có bước nào chậm hơn baseline quá "
+              f"{args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
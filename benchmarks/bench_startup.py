@@ -0,0 +1,104 @@
+"""
+Đo thời gian khởi động: import từng module của app (tiến trình Python mới mỗi lần)
+và thời gian nạp / chạy thử model.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 5 --model
+
+Mỗi module được import trong một tiến trình sạch với `-X importtime`; bảng kết quả cho biết
+thời gian import (trung vị) và module đó có kéo theo torch / ultralytics hay không.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Các module app.py import khi khởi động (tab Học Múa chỉ cần tutorial_gallery)
+APP_MODULES = [
+    "tutorial_gallery",
+    "pose_utils",
+    "render_utils",
+    "compare_utils_group_avg",
+    "job_utils",
+    "upload_utils",
+    "reference_index",
+    "ai_feedback_utils",
+    "media_assets",
+]
+HEAVY_MODULES = ("torch", "ultralytics")
+
+_PROBE = (
+    "import sys, time; t = time.perf_counter(); import {module}; "
+    "print(time.perf_counter() - t); print('heavy:' + ','.join(m for m in {heavy!r} if m in sys.modules))"
+)
+
+
+def import_cost(module, repeat=3):
+    """(giây trung vị, các module nặng bị import theo) khi import `module` trong tiến trình mới."""
+    times, heavy = [], ""
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                             cwd=ROOT, capture_output=True, text=True)
+        if out.returncode != 0:
+            return None, out.stderr.strip().splitlines()[-1] if out.stderr else "lỗi"
+        seconds, heavy = out.stdout.strip().splitlines()[-2:]
+        times.append(float(seconds))
+        heavy = heavy[len("heavy:"):]
+    return statistics.median(times), heavy
+
+
+def slowest_imports(module, top=10):
+    """Các import tốn thời gian nhất (tích lũy, µs) theo `python -X importtime`."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                         cwd=ROOT, capture_output=True, text=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def model_cost():
+    """Thời gian nạp model + chạy thử (cold) trong tiến trình hiện tại."""
+    import model_registry
+
+    start = time.perf_counter()
+    loaded, first = model_registry.warm_up()
+    return loaded, first, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="Số lần đo mỗi module (lấy trung vị)")
+    parser.add_argument("--modules", nargs="*", default=APP_MODULES)
+    parser.add_argument("--detail", help="In các import chậm nhất của một module")
+    parser.add_argument("--model", action="store_true", help="Đo thêm thời gian nạp + chạy thử model")
+    args = parser.parse_args()
+
+    print(f"{'module':<26} {'import (ms)':>12}  kéo theo")
+    for module in args.modules:
+        seconds, heavy = import_cost(module, args.repeat)
+        if seconds is None:
+            print(f"{module:<26} {'lỗi':>12}  {heavy}")
+        else:
+            print(f"{module:<26} {seconds * 1000:>12.1f}  {heavy or '-'}")
+
+    if args.detail:
+        print(f"\n⏱️ Import chậm nhất của {args.detail}:")
+        for us, name in slowest_imports(args.detail):
+            print(f"  {us / 1000:>8.1f} ms  {name}")
+
+    if args.model:
+        loaded, first, total = model_cost()
+        print(f"\n🧠 Nạp model: {loaded * 1000:.0f} ms, chạy thử: {first * 1000:.0f} ms, tổng {total * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,51 +1,141 @@
 import numpy as np
-from scipy.spatial.distance import cosine
-from scipy.spatial.distance import cdist
 
-from pose_utils import extract_multi_person_keypoints, average_group_pose
+from pose_utils import extract_pose_sequence, analyze_videos_parallel, iter_video_poses, MAX_PEOPLE
+from tracking_utils import PoseTracker
+from dtw_utils import dtw_auto
+from reference_index import find_reference, MAX_PEOPLE as REFERENCE_PEOPLE
+from scoring_utils import score_pose_sequences, sync_factor, StreamingScorer
 
-def dynamic_time_warping(seqA, seqB):
-    """DTW khoảng cách giữa hai chuỗi pose"""
-    lenA, lenB = len(seqA), len(seqB)
-    cost = np.full((lenA + 1, lenB + 1), np.inf)
-    cost[0, 0] = 0
+def dynamic_time_warping(seqA, seqB, band=None):
+    """DTW khoảng cách giữa hai chuỗi pose (vector hóa, tự chuyển FastDTW khi chuỗi dài)"""
+    return dtw_auto(seqA, seqB, band=band).normalized
 
-    for i in range(1, lenA + 1):
-        for j in range(1, lenB + 1):
-            dist = np.linalg.norm(seqA[i - 1] - seqB[j - 1])
-            cost[i, j] = dist + min(cost[i - 1, j], cost[i, j - 1], cost[i - 1, j - 1])
 
-    return cost[lenA, lenB] / (lenA + lenB)
+def compare_dance_report(std_video, usr_video, workers=None, torch_threads=None, segment_seconds=2.0,
+                         max_people=MAX_PEOPLE, section=None):
+    """
+    Báo cáo chấm điểm nhóm chi tiết (xem scoring_utils.score_sequences):
+    điểm tổng, điểm thành phần, sai số từng khớp / chi, điểm từng đoạn, lệch nhịp,
+    điểm từng người ("dancers"), độ đồng bộ giữa các người ("synchrony") và số frame
+    video người dùng được suy luận / bỏ qua khi lấy mẫu thích ứng ("sampling").
+    Pose được chuẩn hóa từng người trước khi lấy trung bình nhóm.
+    max_people: số người dùng được theo dõi + chấm (nhóm mẫu giữ REFERENCE_PEOPLE như chỉ mục).
+    workers > 1 → phân tích song song hai video trong các tiến trình riêng.
+    section: (start_s, end_s) – chỉ chấm với đoạn này của video mẫu (vd kết quả library_search).
+    """
+    # Video mẫu đã có trong chỉ mục dựng sẵn → không phân tích lại phía mẫu
+    reference = find_reference(std_video)
+    if workers and workers > 1 and reference is None:
+        analyze_videos_parallel([std_video, usr_video], workers=workers, torch_threads=torch_threads)
 
-
-def compare_dance_group(std_video, usr_video):
-    """Chấm điểm nhóm dựa trên trung bình toàn bộ người múa"""
-    std_people = extract_multi_person_keypoints(std_video)
-    usr_people = extract_multi_person_keypoints(usr_video)
+    std_people = (reference.sequence if reference
+                  else extract_pose_sequence(std_video, REFERENCE_PEOPLE).filled())
+    std_normalized = reference.normalized if reference else None
+    if section is not None:
+        a, b = np.searchsorted(std_people.timestamps, section)
+        std_people = std_people[a:b]
+        std_normalized = std_normalized[a:b] if std_normalized is not None else None
+    usr_tracked = extract_pose_sequence(usr_video, max_people)
+    usr_people = usr_tracked.filled()
 
     # Nếu không có keypoints
-    if not std_people or not usr_people:
-        return 0.0
+    if std_people.n_people == 0 or std_people.n_frames == 0 or usr_people.n_people == 0:
+        return None
+
+    report = score_pose_sequences(std_people, usr_people, segment_seconds,
+                                  std_normalized=std_normalized,
+                                  presence=usr_tracked.valid,
+                                  # Mức căn chỉnh dựng sẵn chỉ khớp khi chấm cả bài mẫu
+                                  std_levels=reference.levels if reference and section is None else None)
+
+    # Độ đồng bộ nhóm: nhóm người dùng phân tán (lệch tư thế nhau) hơn nhóm mẫu → trừ điểm
+    factor = sync_factor(report["synchrony"]["dispersion"], report["synchrony"]["reference_dispersion"])
+
+    report["pose_score"] = report["score"]
+    report["sync_factor"] = round(float(factor), 3)
+    report["score"] = round(report["pose_score"] * factor, 1)
+    report["sampling"] = usr_tracked.meta["sampling"]
+    if section is not None:
+        report["section"] = [round(float(section[0]), 2), round(float(section[1]), 2)]
+    return report
+
+
+def compare_dance_group(std_video, usr_video, workers=None, torch_threads=None, max_people=MAX_PEOPLE):
+    """Chấm điểm nhóm (0–100), xem compare_dance_report để có báo cáo chi tiết."""
+    report = compare_dance_report(std_video, usr_video, workers, torch_threads, max_people=max_people)
+    return report["score"] if report else 0.0
+
 
-    seq_standard = average_group_pose(std_people)
-    seq_user = average_group_pose(usr_people)
+def stream_compare_dance(std_video, usr_video, segment_seconds=2.0, max_people=MAX_PEOPLE, settings=None,
+                         section=None):
+    """
+    Chấm điểm dần trong lúc video người dùng đang được giải mã.
+    - Chuỗi mẫu (pose nhóm chuẩn hóa) lấy từ chỉ mục / cache, chuỗi người dùng đi qua từng frame.
+    - Căn chỉnh bằng DTW trực tuyến, chấm bằng scoring_utils.StreamingScorer: cùng đặc trưng
+      (chuẩn hóa từng người) và cùng thang điểm với điểm tư thế của compare_dance_report.
+    Sinh ra dict sau mỗi frame được phân tích:
+      frame, time, progress (0–1), frames_done / total_frames
+      ref_time – vị trí tương ứng trong video mẫu
+      running_score – điểm tới thời điểm hiện tại
+      segment_scores – điểm các đoạn `segment_seconds` giây đã hoàn tất
+    Bộ nhớ chỉ phụ thuộc độ dài video mẫu, không phụ thuộc video người dùng.
+    section: (start_s, end_s) – chỉ căn chỉnh với đoạn này của video mẫu (như compare_dance_report).
+    """
+    reference = find_reference(std_video, settings=settings)
+    std_seq = (reference.sequence if reference
+               else extract_pose_sequence(std_video, REFERENCE_PEOPLE, settings=settings).filled())
+    if std_seq.n_people == 0:
+        return
+    std_normalized = reference.normalized if reference else None
+    if section is not None:
+        a, b = np.searchsorted(std_seq.timestamps, section)
+        std_seq = std_seq[a:b]
+        std_normalized = std_normalized[a:b] if std_normalized is not None else None
+        if std_seq.n_frames == 0:
+            return
+    scorer = StreamingScorer(std_seq, std_normalized)
+    tracker = PoseTracker()
 
-    # Đồng bộ độ dài
-    min_len = min(len(seq_standard), len(seq_user))
-    seq_standard, seq_user = seq_standard[:min_len], seq_user[:min_len]
+    segment_scores, seg_errors, seg_index = [], [], 0
+    n_done, last = 0, None
+    for frame_idx, t, pose, info in iter_video_poses(usr_video, settings=settings):
+        # Tiến độ theo vị trí frame trên lưới stride (lấy mẫu thích ứng chỉ sinh frame được suy luận)
+        n_done = frame_idx // max(1, int(info["stride"])) + 1
+        if len(pose.keypoints) == 0:
+            continue
 
-    # So sánh tương đồng
-    try:
-        diff = np.mean([cosine(a, b) for a, b in zip(seq_standard, seq_user)])
-    except:
-        diff = dynamic_time_warping(seq_standard, seq_user) / 100
+        # Giữ đúng những người được theo dõi lâu nhất (ID nhỏ = xuất hiện sớm nhất)
+        ids = tracker.update(pose.keypoints, pose.boxes)
+        chosen = np.argsort(ids)[:max_people]
+        step = scorer.update(pose.keypoints[chosen], t)
+        if step is None:
+            continue
+        last = step
 
-    base_score = max(0, 100 - diff * 100)
+        # Chuyển sang đoạn mới → chốt điểm đoạn cũ
+        if segment_seconds and int(t // segment_seconds) > seg_index:
+            if seg_errors:
+                segment_scores.append(scorer.window_score(seg_errors))
+            seg_errors, seg_index = [], int(t // segment_seconds)
+        seg_errors.append(step["errors"])
 
-    # Tính độ đồng bộ nhóm (phương sai)
-    var_std = np.mean([np.var(p) for p in std_people])
-    var_usr = np.mean([np.var(p) for p in usr_people])
-    sync_factor = max(0.8, 1 - abs(var_std - var_usr) * 5)
+        yield {
+            "frame": frame_idx,
+            "time": t,
+            "progress": min(1.0, n_done / info["total_frames"]) if info["total_frames"] else 0.0,
+            "frames_done": n_done,
+            "total_frames": max(n_done, info["total_frames"]),
+            "ref_time": step["ref_time"],
+            "running_score": step["running_score"],
+            "segment_scores": list(segment_scores),
+        }
 
-    final_score = round(base_score * sync_factor, 1)
-    return final_score
+    if seg_errors:
+        segment_scores.append(scorer.window_score(seg_errors))
+        yield {
+            "frame": frame_idx, "time": t, "progress": 1.0,
+            "frames_done": n_done, "total_frames": n_done,
+            "ref_time": last["ref_time"],
+            "running_score": last["running_score"],
+            "segment_scores": list(segment_scores),
+        }
@@ -0,0 +1,362 @@
+import numpy as np
+from collections import namedtuple
+from scipy.spatial.distance import cdist
+from scipy.ndimage import minimum_filter1d, maximum_filter1d
+
+# Kết quả DTW: tổng chi phí, đường căn chỉnh [(i, j), ...] và chi phí chuẩn hóa theo độ dài
+DTWResult = namedtuple("DTWResult", ["distance", "path", "normalized"])
+
+# Quá số ô này thì dtw_auto chuyển sang FastDTW (đa phân giải) để tiết kiệm bộ nhớ
+FULL_DTW_MAX_CELLS = 4_000_000
+
+
+# ================================
+# 📏 Ma trận khoảng cách (1 lần gọi vector hóa)
+# ================================
+def pairwise_distances(seqA, seqB):
+    """Khoảng cách Euclid giữa mọi cặp frame (lenA, lenB), float32."""
+    A = np.asarray(seqA, dtype=np.float64).reshape(len(seqA), -1)
+    B = np.asarray(seqB, dtype=np.float64).reshape(len(seqB), -1)
+    return cdist(A, B).astype(np.float32)
+
+
+# ================================
+# 🧱 Ràng buộc cửa sổ: mỗi hàng i có cột cho phép [lo[i], hi[i]]
+# ================================
+def full_window(n, m):
+    return np.zeros(n, dtype=np.int64), np.full(n, m - 1, dtype=np.int64)
+
+
+def sakoe_chiba_window(n, m, radius):
+    """Dải Sakoe-Chiba bán kính `radius` quanh đường chéo (đã co giãn theo n, m)."""
+    centre = np.arange(n) * (m - 1) / max(n - 1, 1)
+    lo = np.clip(np.floor(centre - radius), 0, m - 1).astype(np.int64)
+    hi = np.clip(np.ceil(centre + radius), 0, m - 1).astype(np.int64)
+    return lo, hi
+
+
+def itakura_window(n, m, max_slope=2.0):
+    """Hình bình hành Itakura: độ dốc đường căn chỉnh nằm trong [1/s, s]."""
+    i = np.arange(n, dtype=np.float64)
+    s = float(max_slope)
+    lo = np.maximum(i / s, (m - 1) - s * (n - 1 - i))
+    hi = np.minimum(i * s, (m - 1) - (n - 1 - i) / s)
+    lo = np.clip(np.ceil(lo), 0, m - 1).astype(np.int64)
+    hi = np.clip(np.floor(hi), 0, m - 1).astype(np.int64)
+    # Độ dài quá lệch → nới để luôn có đường đi
+    hi = np.maximum(hi, lo)
+    return lo, hi
+
+
+def _path_window(path, n, m, radius):
+    """Chiếu đường căn chỉnh ở độ phân giải thô lên lưới gấp đôi rồi nới `radius`."""
+    lo = np.full(n, m, dtype=np.int64)
+    hi = np.full(n, -1, dtype=np.int64)
+    for i, j in path:
+        for fi in (2 * i, 2 * i + 1):
+            if fi < n:
+                lo[fi] = min(lo[fi], 2 * j)
+                hi[fi] = max(hi[fi], 2 * j + 1)
+
+    # Hàng lẻ cuối khi n lẻ chưa được phủ → kế thừa hàng trước
+    for fi in range(n):
+        if hi[fi] < 0:
+            lo[fi], hi[fi] = lo[fi - 1], hi[fi - 1]
+
+    # Giữ cửa sổ đơn điệu (đường đi luôn liên thông) rồi nới theo cả hai chiều
+    lo = np.minimum.accumulate(lo[::-1])[::-1]
+    hi = np.maximum.accumulate(hi)
+    size = 2 * radius + 1
+    lo = minimum_filter1d(lo, size, mode="nearest") - radius
+    hi = maximum_filter1d(hi, size, mode="nearest") + radius
+    return np.clip(lo, 0, m - 1).astype(np.int64), np.clip(hi, 0, m - 1).astype(np.int64)
+
+
+# ================================
+# 🗂️ Chi phí tích lũy chỉ lưu trong cửa sổ
+# ================================
+class _WindowCost:
+    """
+    Chi phí tích lũy của các ô trong cửa sổ, bộ nhớ O(số ô cửa sổ) thay vì (n+1)×(m+1):
+    làn k (hàng i, hoặc cột j khi by_column) giữ các vị trí [start[k], end[k]] liên tiếp trong một mảng phẳng.
+    Ô ngoài cửa sổ = inf; ô biên (-1, -1) = 0 (điểm xuất phát).
+    """
+
+    def __init__(self, start, end, by_column=False):
+        self.start = np.asarray(start, dtype=np.int64)
+        self.end = np.asarray(end, dtype=np.int64)
+        self.by_column = by_column
+        sizes = np.maximum(self.end - self.start + 1, 0)
+        self.offset = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+        self.values = np.full(int(self.offset[-1]), np.inf, dtype=np.float32)
+
+    def take(self, lane, pos):
+        """Chi phí tại các ô (làn, vị trí) – mảng cùng độ dài, cho phép chỉ số -1 (biên)."""
+        out = np.full(len(lane), np.inf, dtype=np.float32)
+        out[(lane == -1) & (pos == -1)] = 0.0
+        ok = (lane >= 0) & (pos >= 0)
+        ok[ok] = (pos[ok] >= self.start[lane[ok]]) & (pos[ok] <= self.end[lane[ok]])
+        out[ok] = self.values[self.offset[lane[ok]] + pos[ok] - self.start[lane[ok]]]
+        return out
+
+    def lane(self, k, p0, p1):
+        """Chi phí các vị trí p0 .. p1 của làn k (k = -1: làn biên)."""
+        out = np.full(p1 - p0 + 1, np.inf, dtype=np.float32)
+        if k < 0:
+            if p0 == -1:
+                out[0] = 0.0
+            return out
+        a, b = max(p0, self.start[k]), min(p1, self.end[k])
+        if a <= b:
+            base = self.offset[k] - self.start[k]
+            out[a - p0:b - p0 + 1] = self.values[base + a:base + b + 1]
+        return out
+
+    def put(self, lane, pos, values):
+        self.values[self.offset[lane] + pos - self.start[lane]] = values
+
+    def get(self, i, j):
+        """Chi phí tích lũy của ô (i, j) (0-based, -1 = biên)."""
+        lane, pos = (j, i) if self.by_column else (i, j)
+        if lane < 0 or pos < 0:
+            return 0.0 if lane == pos == -1 else np.inf
+        if not self.start[lane] <= pos <= self.end[lane]:
+            return np.inf
+        return float(self.values[self.offset[lane] + pos - self.start[lane]])
+
+
+# ================================
+# 🌊 DTW theo đường chéo phụ (wavefront)
+# ================================
+def _accumulate(A, B, lo, hi):
+    """
+    Chi phí tích lũy (_WindowCost theo hàng). Các ô trên cùng một đường chéo phụ i + j = d
+    chỉ phụ thuộc hai đường chéo trước → cập nhật cả đường chéo bằng 1 phép NumPy.
+    Cửa sổ rộng → tính sẵn cả ma trận khoảng cách; cửa sổ hẹp → chỉ tính các ô trong cửa sổ.
+    """
+    n, m = len(A), len(B)
+    window_cells = int(np.sum(hi - lo + 1))
+    dist = pairwise_distances(A, B) if window_cells * 4 >= n * m else None
+
+    cost = _WindowCost(lo, hi)
+    for d in range(n + m - 1):
+        i = np.arange(max(0, d - m + 1), min(n - 1, d) + 1)
+        j = d - i
+        # Chỉ giữ các ô nằm trong cửa sổ cho phép
+        ok = (j >= lo[i]) & (j <= hi[i])
+        if not ok.any():
+            continue
+        i, j = i[ok], j[ok]
+        best = np.minimum(np.minimum(cost.take(i - 1, j), cost.take(i, j - 1)), cost.take(i - 1, j - 1))
+        if dist is not None:
+            step = dist[i, j]
+        else:
+            step = np.linalg.norm(A[i] - B[j], axis=1)
+        cost.put(i, j, step + best)
+    return cost
+
+
+def _accumulate_columns(A, B, lo, hi):
+    """
+    Như _accumulate nhưng đi theo từng cột (cửa sổ đơn điệu: lo, hi không giảm), lưu theo cột.
+    Trong một cột, c[i] = d[i] + min(a[i], c[i-1]) với a[i] = min(cột trước[i], cột trước[i-1])
+    có dạng đóng c = D + minimum.accumulate(a + d - D), D = cumsum(d) (như OnlineDTW)
+    → m bước NumPy thay vì n + m đường chéo.
+    """
+    n, m = len(A), len(B)
+    window_cells = int(np.sum(hi - lo + 1))
+    dist = pairwise_distances(A, B) if window_cells * 4 >= n * m else None
+
+    # Hàng cho phép của cột j: [first[j], last[j]]
+    first = np.searchsorted(hi, np.arange(m), side="left")
+    last = np.searchsorted(lo, np.arange(m), side="right") - 1
+    cost = _WindowCost(first, last, by_column=True)
+
+    for j in range(m):
+        r0, r1 = first[j], last[j]
+        if r0 > r1:
+            continue
+        if dist is not None:
+            d = dist[r0:r1 + 1, j].astype(np.float64)
+        else:
+            d = np.linalg.norm(A[r0:r1 + 1] - B[j], axis=1)
+        prev = cost.lane(j - 1, r0 - 1, r1)                  # cột trước, hàng r0-1 .. r1
+        a = np.minimum(prev[1:], prev[:-1])
+        D = np.cumsum(d)
+        cost.values[cost.offset[j]:cost.offset[j + 1]] = D + np.minimum.accumulate(a + d - D)
+    return cost
+
+
+def _backtrack(cost, n, m):
+    """Truy vết đường căn chỉnh tối ưu từ (n-1, m-1) về (0, 0), chỉ đọc các ô trong cửa sổ."""
+    i, j = n - 1, m - 1
+    path = [(i, j)]
+    while i > 0 or j > 0:
+        steps = ((cost.get(i - 1, j - 1), i - 1, j - 1), (cost.get(i - 1, j), i - 1, j),
+                 (cost.get(i, j - 1), i, j - 1))
+        _, i, j = min(steps, key=lambda s: s[0])
+        path.append((i, j))
+    path.reverse()
+    return np.array(path, dtype=np.int64)
+
+
+def dtw(seqA, seqB, band=None, itakura=None, window=None, return_path=True):
+    """
+    DTW giữa hai chuỗi pose (lenA, D) và (lenB, D).
+    - band: bán kính dải Sakoe-Chiba (số frame), None = không giới hạn
+    - itakura: độ dốc tối đa của hình bình hành Itakura (vd 2.0)
+    - window: (lo, hi) cửa sổ tùy chỉnh theo từng hàng
+    Trả về DTWResult(distance, path, normalized = distance / (lenA + lenB)).
+    """
+    n, m = len(seqA), len(seqB)
+    if n == 0 or m == 0:
+        return DTWResult(np.inf, np.zeros((0, 2), dtype=np.int64), np.inf)
+
+    lo, hi = window if window is not None else full_window(n, m)
+    if band is not None:
+        b_lo, b_hi = sakoe_chiba_window(n, m, band)
+        lo, hi = np.maximum(lo, b_lo), np.minimum(hi, b_hi)
+    if itakura is not None:
+        i_lo, i_hi = itakura_window(n, m, itakura)
+        lo, hi = np.maximum(lo, i_lo), np.minimum(hi, i_hi)
+
+    A = np.asarray(seqA, dtype=np.float64).reshape(n, -1)
+    B = np.asarray(seqB, dtype=np.float64).reshape(m, -1)
+    monotone = np.all(np.diff(lo) >= 0) and np.all(np.diff(hi) >= 0)
+    cost = (_accumulate_columns if monotone else _accumulate)(A, B, lo, hi)
+    distance = cost.get(n - 1, m - 1)
+    path = _backtrack(cost, n, m) if return_path and np.isfinite(distance) else np.zeros((0, 2), dtype=np.int64)
+    return DTWResult(distance, path, distance / (n + m))
+
+
+# ================================
+# 🔭 FastDTW: thô → mịn
+# ================================
+def _coarsen(seq):
+    """Giảm một nửa độ phân giải thời gian bằng trung bình từng cặp frame."""
+    seq = np.asarray(seq, dtype=np.float64).reshape(len(seq), -1)
+    even = len(seq) - len(seq) % 2
+    coarse = (seq[0:even:2] + seq[1:even:2]) / 2
+    if len(seq) % 2:
+        coarse = np.vstack([coarse, seq[-1:]])
+    return coarse
+
+
+def coarse_levels(seq, min_size=12):
+    """Các mức thô dần [seq/2, seq/4, ...] (tới khi còn <= min_size frame) – tính sẵn cho chuỗi mẫu."""
+    levels = []
+    while len(seq) > min_size:
+        seq = _coarsen(seq)
+        levels.append(seq)
+    return levels
+
+
+def fast_dtw(seqA, seqB, radius=10, levels_a=None):
+    """
+    Xấp xỉ DTW đa phân giải (kiểu FastDTW): giải ở độ phân giải thô, chiếu đường
+    căn chỉnh lên độ phân giải mịn và chỉ tính trong cửa sổ quanh nó.
+    Chi phí O((lenA + lenB) * radius) thay vì O(lenA * lenB).
+    levels_a: các mức thô của seqA đã tính sẵn (xem coarse_levels) → khỏi tính lại.
+    """
+    n, m = len(seqA), len(seqB)
+    min_size = radius + 2
+    if n <= min_size or m <= min_size:
+        return dtw(seqA, seqB)
+
+    if levels_a:
+        coarse_a, rest = levels_a[0], levels_a[1:]
+    else:
+        coarse_a, rest = _coarsen(seqA), None
+    coarse = fast_dtw(coarse_a, _coarsen(seqB), radius, rest)
+    window = _path_window(coarse.path, n, m, radius)
+    return dtw(seqA, seqB, window=window)
+
+
+def dtw_auto(seqA, seqB, band=None, radius=10, levels_a=None):
+    """Chọn DTW đầy đủ khi ma trận nhỏ, FastDTW khi chuỗi dài."""
+    if band is None and len(seqA) * len(seqB) > FULL_DTW_MAX_CELLS:
+        return fast_dtw(seqA, seqB, radius, levels_a)
+    return dtw(seqA, seqB, band=band)
+
+
+# ================================
+# 🧩 Tiện ích đọc đường căn chỉnh
+# ================================
+def align_indices(path, n):
+    """Với mỗi frame i của chuỗi A, trả về frame tương ứng (trung bình) của chuỗi B."""
+    path = np.asarray(path)
+    sums = np.bincount(path[:, 0], weights=path[:, 1], minlength=n)
+    counts = np.bincount(path[:, 0], minlength=n)
+    return np.round(sums / np.maximum(counts, 1)).astype(np.int64)
+
+
+def path_segment_costs(seqA, seqB, path, n_segments):
+    """Khoảng cách trung bình dọc đường căn chỉnh cho từng đoạn thời gian của chuỗi A."""
+    path = np.asarray(path)
+    if len(path) == 0:
+        return np.zeros(n_segments)
+    A = np.asarray(seqA, dtype=np.float64).reshape(len(seqA), -1)
+    B = np.asarray(seqB, dtype=np.float64).reshape(len(seqB), -1)
+    d = np.linalg.norm(A[path[:, 0]] - B[path[:, 1]], axis=1)
+
+    seg = np.minimum(path[:, 0] * n_segments // len(A), n_segments - 1)
+    sums = np.bincount(seg, weights=d, minlength=n_segments)
+    counts = np.bincount(seg, minlength=n_segments)
+    return sums / np.maximum(counts, 1)
+
+
+# ================================
+# 📡 DTW trực tuyến (chấm điểm khi frame đang tới)
+# ================================
+def cosine_distances(reference, x):
+    """Khoảng cách cosine giữa một vector x và mọi dòng của reference (n,)."""
+    dots = reference @ x
+    norms = np.linalg.norm(reference, axis=1) * np.linalg.norm(x)
+    return 1.0 - dots / np.maximum(norms, 1e-12)
+
+
+class OnlineDTW:
+    """
+    DTW tăng dần giữa chuỗi tham chiếu cố định (n, D) và chuỗi người dùng đến từng frame.
+    Chỉ giữ cột chi phí cuối cùng (n,) → bộ nhớ O(n), không phụ thuộc độ dài video người dùng.
+    Cột mới được tính vector hóa nhờ:
+        c[i] = d[i] + min(a[i], c[i-1]),  a[i] = min(prev[i], prev[i-1])
+        ⇔ c = D + minimum.accumulate(a + d - D),  D = cumsum(d)
+    Căn chỉnh dạng open-end: vị trí tham chiếu hiện tại là ô có chi phí chuẩn hóa nhỏ nhất.
+    """
+
+    def __init__(self, reference, metric="cosine"):
+        self.reference = np.asarray(reference, dtype=np.float64).reshape(len(reference), -1)
+        self.metric = metric
+        self.column = None
+        self.n_seen = 0
+
+    def _local_cost(self, x):
+        if self.metric == "cosine":
+            return cosine_distances(self.reference, x)
+        return np.linalg.norm(self.reference - x, axis=1)
+
+    def update(self, x):
+        """
+        Thêm một frame người dùng. Trả về (ref_index, cost, local_cost):
+          ref_index – frame tham chiếu đang khớp
+          cost – chi phí tích lũy chuẩn hóa theo độ dài đường đi (≈ chi phí trung bình mỗi bước)
+          local_cost – chi phí của riêng frame này tại ref_index
+        """
+        x = np.asarray(x, dtype=np.float64).ravel()
+        d = self._local_cost(x)
+        if self.column is None:
+            col = np.cumsum(d)
+        else:
+            prev = self.column
+            a = np.minimum(prev, np.concatenate([[np.inf], prev[:-1]]))
+            D = np.cumsum(d)
+            col = D + np.minimum.accumulate(a + d - D)
+        self.column = col
+        j = self.n_seen
+        self.n_seen += 1
+
+        i = np.arange(len(col))
+        norm_cost = col / (np.maximum(i, j) + 1)
+        best = int(np.argmin(norm_cost))
+        return best, float(norm_cost[best]), float(d[best])
@@ -0,0 +1,95 @@
+"""
+Server giả lập API OpenAI / Gemini cho phản hồi AI (kiểm thử, chạy offline, đo timeout).
+
+    python feedback_stub_server.py --port 8765 [--delay 12] [--fail]
+    OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:8765/v1 streamlit run app.py
+    GOOGLE_API_KEY=stub GEMINI_BASE_URL=http://127.0.0.1:8765 streamlit run app.py
+
+Hỗ trợ:
+  POST /v1/chat/completions                    (định dạng OpenAI)
+  POST /v1beta/models/<model>:generateContent  (định dạng Gemini REST)
+Trả lời là danh sách các dòng "- ..." của prompt (tất định) → dễ kiểm tra cache: cùng prompt,
+server chỉ nhận một yêu cầu. --delay giây chờ trước khi trả lời (kiểm tra fallback khi quá hạn),
+--fail trả lỗi 500.
+"""
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def stub_reply(prompt):
+    """Phản hồi tất định dựng từ các dòng dữ liệu trong prompt."""
+    facts = [line.strip()[2:] for line in prompt.splitlines() if line.strip().startswith("- ")]
+    return "\n".join(f"• (stub) {fact}" for fact in facts) or "• (stub) Không có dữ liệu."
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, fmt, *args):  # yên lặng khi chạy trong kiểm thử
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        data = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        with server.lock:
+            server.requests.append({"path": self.path, "body": data})
+        if server.delay:
+            server.release.wait(server.delay)
+        if server.fail:
+            return self._send(500, {"error": {"message": "stub failure"}})
+
+        if self.path.rstrip("/").endswith("/chat/completions"):
+            prompt = "\n".join(m.get("content", "") for m in data.get("messages", []))
+            return self._send(200, {
+                "id": "stub", "object": "chat.completion", "created": 0, "model": data.get("model", "stub"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": stub_reply(prompt)}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+        if ":generateContent" in self.path:
+            prompt = "\n".join(p.get("text", "") for c in data.get("contents", []) for p in c.get("parts", []))
+            return self._send(200, {"candidates": [{
+                "content": {"role": "model", "parts": [{"text": stub_reply(prompt)}]},
+                "finishReason": "STOP", "index": 0}]})
+        self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+
+
+def start_stub_server(port=0, delay=0.0, fail=False):
+    """
+    Chạy server trong luồng nền; trả về server (server.url, server.requests, server.shutdown()).
+    server.release.set() → các yêu cầu đang chờ `delay` trả lời ngay.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    server.delay, server.fail = delay, fail
+    server.requests, server.lock, server.release = [], threading.Lock(), threading.Event()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="Giây chờ trước khi trả lời")
+    parser.add_argument("--fail", action="store_true", help="Luôn trả lỗi 500")
+    args = parser.parse_args()
+
+    server = start_stub_server(args.port, args.delay, args.fail)
+    print(f"🧪 Stub API tại {server.url} (OpenAI: {server.url}/v1, Gemini: {server.url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
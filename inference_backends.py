@@ -0,0 +1,368 @@
+"""
+Backend suy luận pose trên CPU: PyTorch (ultralytics), ONNX Runtime, OpenVINO (fp32 hoặc int8).
+
+    python inference_backends.py export --backend onnx
+    python inference_backends.py export --backend openvino-int8 --calib samples/standard/*.mp4
+    python inference_backends.py parity video.mp4 --backend onnx-int8
+
+Chọn backend cho toàn app: DANCE_BACKEND=torch | onnx | onnx-int8 | openvino | openvino-int8.
+Model được xuất một lần từ yolov8n-pose.pt vào EXPORT_DIR:
+  - onnx: ultralytics export (batch/kích thước động)
+  - *-int8: lượng tử hóa tĩnh dạng QDQ bằng onnxruntime, hiệu chỉnh trên frame video mẫu
+  - openvino: chuyển từ file ONNX tương ứng (openvino.convert_model)
+Tiền xử lý (letterbox) và hậu xử lý (NMS, giải mã keypoints) viết bằng NumPy
+→ ONNX Runtime / OpenVINO không cần torch lúc chạy.
+"""
+import argparse
+import glob
+import os
+import shutil
+
+import cv2
+import numpy as np
+
+import profiling
+from pose_utils import FramePose, MAX_DETECTIONS, infer_batch, DEFAULT_INFERENCE_SETTINGS
+from model_registry import MODEL_PATH, ensure_weights
+from tracking_utils import iou_matrix
+
+# ================================
+# ⚙️ Cấu hình
+# ================================
+EXPORT_DIR = os.environ.get("DANCE_EXPORT_DIR", ".cache/models")
+BACKENDS = ("torch", "onnx", "onnx-int8", "openvino", "openvino-int8")
+CONF_THRESHOLD = 0.25        # giống mặc định predict của ultralytics
+IOU_THRESHOLD = 0.7
+CALIBRATION_FRAMES = 64
+PAD_VALUE = 114
+# Số luồng suy luận của ONNX Runtime / OpenVINO (0 = mặc định của thư viện); tiến trình con đặt qua set_num_threads
+NUM_THREADS = int(os.environ.get("DANCE_INFERENCE_THREADS", "0"))
+
+
+def _model_stem():
+    return os.path.splitext(os.path.basename(MODEL_PATH))[0]
+
+
+def exported_path(backend):
+    """Đường dẫn file model đã xuất của backend (onnx: .onnx, openvino: .xml)."""
+    fmt, _, quant = backend.partition("-")
+    suffix = f"_{quant}" if quant else ""
+    ext = ".onnx" if fmt == "onnx" else ".xml"
+    return os.path.join(EXPORT_DIR, f"{_model_stem()}{suffix}{ext}")
+
+
+# ================================
+# 🖼️ Tiền xử lý NumPy: letterbox về imgsz × imgsz
+# ================================
+def letterbox(frame, imgsz=640):
+    """Thu nhỏ giữ tỉ lệ + đệm viền xám. Trả về (ảnh, tỉ lệ, (pad_x, pad_y))."""
+    h, w = frame.shape[:2]
+    r = min(imgsz / h, imgsz / w)
+    new_w, new_h = int(round(w * r)), int(round(h * r))
+    dw, dh = (imgsz - new_w) / 2, (imgsz - new_h) / 2
+    if (new_w, new_h) != (w, h):
+        frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, left = int(round(dh - 0.1)), int(round(dw - 0.1))
+    out = cv2.copyMakeBorder(frame, top, imgsz - new_h - top, left, imgsz - new_w - left,
+                             cv2.BORDER_CONSTANT, value=(PAD_VALUE,) * 3)
+    return out, r, (left, top)
+
+
+def preprocess(frames, imgsz=640):
+    """Lô frame BGR → tensor (B, 3, imgsz, imgsz) float32 RGB [0, 1] + thông tin quy đổi tọa độ."""
+    batch = np.empty((len(frames), 3, imgsz, imgsz), dtype=np.float32)
+    metas = []
+    for b, frame in enumerate(frames):
+        img, r, pad = letterbox(frame, imgsz)
+        batch[b] = img[..., ::-1].transpose(2, 0, 1) / np.float32(255.0)
+        metas.append((r, pad, frame.shape[1], frame.shape[0]))
+    return batch, metas
+
+
+# ================================
+# 🧮 Hậu xử lý NumPy: lọc độ tin cậy, NMS, giải mã keypoints
+# ================================
+def nms(boxes, scores, iou_threshold=IOU_THRESHOLD):
+    """Non-maximum suppression (một lớp). Trả về chỉ số box được giữ, theo điểm giảm dần."""
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while len(order):
+        i = order[0]
+        keep.append(i)
+        if len(order) == 1:
+            break
+        ious = iou_matrix(boxes[i:i + 1], boxes[order[1:]])[0]
+        order = order[1:][ious <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def decode_predictions(pred, metas, conf_threshold=CONF_THRESHOLD, iou_threshold=IOU_THRESHOLD,
+                       max_det=MAX_DETECTIONS):
+    """
+    Đầu ra YOLOv8-pose (B, 56, N): [cx, cy, w, h, conf, 17 × (x, y, visibility)] ở tọa độ ảnh letterbox
+    → danh sách FramePose ở tọa độ frame gốc.
+    """
+    poses = []
+    for p, (r, (pad_x, pad_y), w, h) in zip(np.asarray(pred, dtype=np.float32), metas):
+        p = p.T
+        p = p[p[:, 4] > conf_threshold]
+        if not len(p):
+            poses.append(FramePose(np.zeros((0, 17, 3), np.float32), np.zeros((0, 4), np.float32),
+                                   np.zeros((0,), np.float32)))
+            continue
+
+        xy, half = p[:, :2], p[:, 2:4] / 2
+        boxes = np.concatenate([xy - half, xy + half], axis=1)
+        keep = nms(boxes, p[:, 4], iou_threshold)[:max_det]
+
+        offset = np.array([pad_x, pad_y], dtype=np.float32)
+        boxes = (boxes[keep].reshape(-1, 2, 2) - offset) / r
+        boxes = np.clip(boxes, 0, [w, h]).reshape(-1, 4)
+        kpts = p[keep, 5:].reshape(-1, 17, 3).copy()
+        kpts[..., :2] = np.clip((kpts[..., :2] - offset) / r, 0, [w, h])
+        poses.append(FramePose(kpts.astype(np.float32), boxes.astype(np.float32), p[keep, 4].astype(np.float32)))
+    return poses
+
+
+# ================================
+# 🧩 Các backend
+# ================================
+class PoseBackend:
+    """Giao diện chung: infer(frames, imgsz) → danh sách FramePose (cùng thứ tự frame)."""
+
+    name = "base"
+
+    def _run(self, batch):
+        raise NotImplementedError
+
+    def infer(self, frames, imgsz=640):
+        if not frames:
+            return []
+        with profiling.stage("preprocess", len(frames)):
+            batch, metas = preprocess(frames, imgsz)
+        with profiling.stage("inference", len(frames)):
+            output = self._run(batch)
+        with profiling.stage("postprocess", len(frames)):
+            return decode_predictions(output, metas)
+
+    def __call__(self, frames, imgsz=640, verbose=False):
+        # Cùng cách gọi với model ultralytics (để model_registry.warm_up dùng chung)
+        return self.infer(list(frames), imgsz)
+
+
+class OnnxBackend(PoseBackend):
+    name = "onnx"
+
+    def __init__(self, path, threads=0):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("Cần cài onnxruntime để dùng backend ONNX: pip install onnxruntime") from e
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def _run(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenVinoBackend(PoseBackend):
+    name = "openvino"
+
+    def __init__(self, path, threads=0):
+        try:
+            import openvino as ov
+        except ImportError as e:
+            raise ImportError("Cần cài openvino để dùng backend OpenVINO: pip install openvino") from e
+        core = ov.Core()
+        config = {"PERFORMANCE_HINT": "THROUGHPUT"}
+        if threads:
+            config["INFERENCE_NUM_THREADS"] = threads
+        self.compiled = core.compile_model(core.read_model(path), "CPU", config)
+        self.output = self.compiled.output(0)
+
+    def _run(self, batch):
+        return self.compiled(batch)[self.output]
+
+
+# ================================
+# 📦 Xuất model
+# ================================
+def _calibration_frames(videos, n_frames=CALIBRATION_FRAMES):
+    """Lấy đều n_frames frame từ các video để hiệu chỉnh int8."""
+    frames = []
+    per_video = max(1, n_frames // max(len(videos), 1))
+    for path in videos:
+        cap = cv2.VideoCapture(path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        for idx in np.linspace(0, max(total - 1, 0), per_video).astype(int):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(idx))
+            ret, frame = cap.read()
+            if ret:
+                frames.append(frame)
+        cap.release()
+    return frames
+
+
+def _export_onnx(path, imgsz):
+    from ultralytics import YOLO
+
+    source = YOLO(ensure_weights(), task="pose")
+    exported = source.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+    shutil.move(exported, path)
+
+
+def _quantize_int8(src, dst, calib_videos, imgsz):
+    from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType,
+                                          quantize_static)
+
+    frames = _calibration_frames(calib_videos)
+    if not frames:
+        raise ValueError("Cần ít nhất một video hiệu chỉnh (--calib) để lượng tử hóa int8")
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self, name):
+            self.items = iter([{name: preprocess([f], imgsz)[0]} for f in frames])
+
+        def get_next(self):
+            return next(self.items, None)
+
+    import onnxruntime as ort
+
+    input_name = ort.InferenceSession(src, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    quantize_static(src, dst, FrameReader(input_name), quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8, per_channel=True)
+
+
+def _export_openvino(onnx_path, xml_path):
+    import openvino as ov
+
+    ov.save_model(ov.convert_model(onnx_path), xml_path)
+
+
+def export_model(backend, imgsz=640, calib_videos=None, force=False):
+    """Xuất (nếu chưa có) model cho backend; trả về đường dẫn file model."""
+    if backend not in BACKENDS or backend == "torch":
+        raise ValueError(f"Backend không hỗ trợ xuất: {backend}")
+    path = exported_path(backend)
+    if os.path.exists(path) and not force:
+        return path
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+
+    fmt, _, quant = backend.partition("-")
+    if fmt == "openvino":
+        src = export_model(f"onnx-{quant}" if quant else "onnx", imgsz, calib_videos, force)
+        _export_openvino(src, path)
+    elif quant:
+        fp32 = export_model("onnx", imgsz, force=force)
+        _quantize_int8(fp32, path, calib_videos or sorted(glob.glob("samples/standard/*.mp4")), imgsz)
+    else:
+        _export_onnx(path, imgsz)
+    return path
+
+
+def set_num_threads(threads):
+    """Giới hạn số luồng cho các backend nạp sau lời gọi này (vd trong tiến trình con của pool)."""
+    global NUM_THREADS
+    NUM_THREADS = int(threads or 0)
+
+
+def load_backend(backend):
+    """Tạo backend (xuất model nếu chưa có). Dùng qua model_registry.get_model("pose-<backend>")."""
+    path = export_model(backend)
+    if backend.startswith("openvino"):
+        return OpenVinoBackend(path, NUM_THREADS)
+    return OnnxBackend(path, NUM_THREADS)
+
+
+# ================================
+# ⚖️ Kiểm tra độ khớp với PyTorch
+# ================================
+def _sample_frames(video_path, n_frames):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < n_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def compare_poses(reference, candidate, iou_threshold=0.5):
+    """
+    So khớp phát hiện giữa hai lô FramePose (ghép Hungarian theo IoU box). Trả về dict:
+      recall / precision – tỉ lệ người được ghép với IoU >= iou_threshold
+      kpt_error – sai số keypoint trung bình (chia đường chéo box) trên các khớp tin cậy
+      conf_error – chênh lệch độ tin cậy phát hiện trung bình
+    """
+    from scipy.optimize import linear_sum_assignment
+
+    matched = n_ref = n_cand = 0
+    kpt_errors, conf_errors = [], []
+    for ref, cand in zip(reference, candidate):
+        n_ref += len(ref.boxes)
+        n_cand += len(cand.boxes)
+        if not len(ref.boxes) or not len(cand.boxes):
+            continue
+        iou = iou_matrix(ref.boxes, cand.boxes)
+        rows, cols = linear_sum_assignment(-iou)
+        ok = iou[rows, cols] >= iou_threshold
+        for r, c in zip(rows[ok], cols[ok]):
+            matched += 1
+            diag = np.hypot(*(ref.boxes[r, 2:] - ref.boxes[r, :2])) or 1.0
+            vis = ref.keypoints[r, :, 2] >= 0.5
+            if vis.any():
+                err = np.linalg.norm(ref.keypoints[r, vis, :2] - cand.keypoints[c, vis, :2], axis=1)
+                kpt_errors.append(float(err.mean() / diag))
+            conf_errors.append(abs(float(ref.scores[r]) - float(cand.scores[c])))
+    return {
+        "frames": len(reference),
+        "recall": matched / n_ref if n_ref else 1.0,
+        "precision": matched / n_cand if n_cand else 1.0,
+        "kpt_error": float(np.mean(kpt_errors)) if kpt_errors else 0.0,
+        "conf_error": float(np.mean(conf_errors)) if conf_errors else 0.0,
+    }
+
+
+def parity_check(video_path, backend, n_frames=64, imgsz=640, batch_size=8):
+    """So sánh kết quả backend với đường PyTorch trên n_frames frame đầu của video."""
+    from model_registry import get_model
+
+    frames = _sample_frames(video_path, n_frames)
+    reference, candidate = [], []
+    model = get_model(f"pose-{backend}")
+    for i in range(0, len(frames), batch_size):
+        batch = frames[i:i + batch_size]
+        reference += infer_batch(batch, imgsz, backend="torch")
+        candidate += model.infer(batch, imgsz)
+    return compare_poses(reference, candidate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_export = sub.add_parser("export", help="Xuất model cho backend")
+    p_export.add_argument("--backend", choices=BACKENDS[1:], default="onnx")
+    p_export.add_argument("--imgsz", type=int, default=DEFAULT_INFERENCE_SETTINGS["imgsz"])
+    p_export.add_argument("--calib", nargs="*", help="Video hiệu chỉnh int8 (mặc định samples/standard/*.mp4)")
+    p_export.add_argument("--force", action="store_true")
+    p_parity = sub.add_parser("parity", help="So sánh backend với PyTorch")
+    p_parity.add_argument("video")
+    p_parity.add_argument("--backend", choices=BACKENDS[1:], default="onnx")
+    p_parity.add_argument("--frames", type=int, default=64)
+    p_parity.add_argument("--imgsz", type=int, default=DEFAULT_INFERENCE_SETTINGS["imgsz"])
+    args = parser.parse_args()
+
+    if args.command == "export":
+        print(f"📦 {export_model(args.backend, args.imgsz, args.calib, args.force)}")
+    else:
+        for k, v in parity_check(args.video, args.backend, args.frames, args.imgsz).items():
+            print(f"  {k}: {v:.4f}" if isinstance(v, float) else f"  {k}: {v}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import profiling
+from pose_utils import file_sha256, resolve_inference_settings, CACHE_VERSION, init_worker, MAX_PEOPLE
+
+# ================================
+# ⚙️ Cấu hình hàng đợi công việc nền
+# ================================
+JOB_DIR = os.environ.get("DANCE_JOB_DIR", ".cache/jobs")
+JOB_WORKERS = int(os.environ.get("DANCE_JOB_WORKERS", "1"))
+MAX_JOBS = 200               # giữ tối đa bấy nhiêu job trên đĩa (xóa job cũ nhất)
+STALE_SECONDS = 120          # job "running" không cập nhật quá lâu → coi như tiến trình đã chết
+PROGRESS_INTERVAL = 0.5      # ghi tiến độ ra đĩa tối đa 2 lần/giây
+OVERLAY_FPS = 15             # video overlay của job: 15 fps, cao tối đa OVERLAY_HEIGHT px
+OVERLAY_HEIGHT = 480
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Job bị người dùng hủy giữa chừng."""
+
+
+# ================================
+# 💾 Kho job trên đĩa (dùng chung giữa các lần rerun, phiên và tiến trình)
+# ================================
+def _job_path(job_id, name=""):
+    return os.path.join(JOB_DIR, job_id, name)
+
+
+def _write_json(path, data):
+    tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def read_status(job_id):
+    try:
+        with open(_job_path(job_id, "status.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read_result(job_id):
+    try:
+        with open(_job_path(job_id, "result.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _update_status(job_id, **fields):
+    status = read_status(job_id) or {"job_id": job_id, "created": time.time()}
+    status.update(fields, updated=time.time())
+    _write_json(_job_path(job_id, "status.json"), status)
+    return status
+
+
+def job_key(kind, video_paths, params=None):
+    """ID job = hash(loại job + nội dung các video + tham số) → cùng đầu vào dùng chung kết quả."""
+    payload = {
+        "kind": kind,
+        "videos": [file_sha256(p) for p in video_paths],
+        "params": params or {},
+        "settings": resolve_inference_settings(),
+        "version": CACHE_VERSION,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def prune_jobs(max_jobs=MAX_JOBS):
+    """Xóa các job đã kết thúc cũ nhất khi số job vượt max_jobs."""
+    if not os.path.isdir(JOB_DIR):
+        return
+    finished = []
+    for job_id in os.listdir(JOB_DIR):
+        status = read_status(job_id)
+        if status and status.get("state") in FINISHED:
+            finished.append((status.get("updated", 0), job_id))
+    extra = len(os.listdir(JOB_DIR)) - max_jobs
+    for _, job_id in sorted(finished)[:max(0, extra)]:
+        shutil.rmtree(_job_path(job_id), ignore_errors=True)
+
+
+class ProgressReporter:
+    """Được truyền vào hàm job: báo tiến độ (frame đã xử lý / tổng) và kiểm tra lệnh hủy."""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self._last = 0.0
+
+    def cancelled(self):
+        return os.path.exists(_job_path(self.job_id, "cancel"))
+
+    def check_cancelled(self):
+        """Ném JobCancelled nếu người dùng đã yêu cầu hủy (gọi giữa các bước dài)."""
+        if self.cancelled():
+            raise JobCancelled()
+
+    def update(self, done, total, stage=None, **extra):
+        self.check_cancelled()
+        now = time.time()
+        if now - self._last < PROGRESS_INTERVAL and done < total:
+            return
+        self._last = now
+        progress = {"done": int(done), "total": int(total)}
+        progress.update(extra)
+        fields = {"progress": progress}
+        if stage:
+            fields["stage"] = stage
+        _update_status(self.job_id, **fields)
+
+    def output_path(self, name):
+        """Đường dẫn file kết quả riêng của job (không dùng chung file tạm giữa các phiên)."""
+        return _job_path(self.job_id, name)
+
+
+# ================================
+# 🧰 Các loại job
+# ================================
+def compare_job(reporter, standard_path, user_path, max_people=MAX_PEOPLE, section=None):
+    """
+    Chấm điểm + dựng overlay (mẫu, người dùng, hai video cạnh nhau) cho một cặp video
+    (chạy trong tiến trình nền).
+    section: (start_s, end_s) – chỉ chấm với đoạn này của video mẫu (kết quả library_search);
+    video song song cũng chỉ dựng đoạn này của video mẫu.
+    """
+    from compare_utils_group_avg import compare_dance_report, stream_compare_dance
+    from pose_utils import extract_pose_sequence
+    from render_utils import (fit_scale, render_overlay, render_side_by_side, output_frame_count,
+                              side_by_side_frame_count)
+    from reference_index import find_reference
+
+    # Đo riêng từng job (tiến trình con được dùng lại giữa các job)
+    profiling.reset()
+    segment_scores = []
+    for update in stream_compare_dance(standard_path, user_path, max_people=max_people, section=section):
+        reporter.update(update["frames_done"], update["total_frames"], stage="scoring",
+                        running_score=update["running_score"])
+        segment_scores = update["segment_scores"]
+
+    reporter.check_cancelled()
+    report = compare_dance_report(standard_path, user_path, max_people=max_people, section=section)
+    score = report["score"] if report else 0.0
+    # Nhãn điểm riêng cho từng người trên video (P1, P2, ... theo thứ tự theo dõi)
+    dancer_scores = [d["score"] for d in report["dancers"]] if report else [score]
+
+    reference = find_reference(standard_path)
+    # Bài mẫu có trong chỉ mục → dựng từ keypoints dựng sẵn, không cần cache/model
+    std_seq = reference.sequence if reference is not None else extract_pose_sequence(standard_path)
+    std_section = std_seq
+    if section is not None:
+        a, b = std_seq.timestamps.searchsorted(section)
+        std_section = std_seq[a:b]
+    usr_seq = extract_pose_sequence(user_path, max_people)
+
+    # Tiến độ dựng = tổng frame của cả ba video; lệnh hủy được kiểm tra ở mỗi frame
+    counts = [output_frame_count(standard_path, OVERLAY_FPS), output_frame_count(user_path, OVERLAY_FPS),
+              side_by_side_frame_count(standard_path, user_path, OVERLAY_FPS, section)]
+    total = sum(counts)
+
+    def rendering(offset):
+        return lambda done, _: reporter.update(offset + done, max(total, offset + done), stage="rendering")
+
+    reporter.update(0, total, stage="rendering")
+    standard_overlay = render_overlay(
+        standard_path, std_seq, reporter.output_path("standard_pose.mp4"),
+        scale=fit_scale(standard_path, OVERLAY_HEIGHT), out_fps=OVERLAY_FPS, progress=rendering(0))
+    reporter.check_cancelled()
+    user_overlay = render_overlay(
+        user_path, usr_seq, reporter.output_path("user_pose.mp4"), scores=dancer_scores,
+        scale=fit_scale(user_path, OVERLAY_HEIGHT), out_fps=OVERLAY_FPS, progress=rendering(counts[0]))
+    reporter.check_cancelled()
+    # Song song: đoạn mẫu đã khớp (section) | video người dùng
+    side_by_side = render_side_by_side(
+        standard_path, std_section, user_path, usr_seq, reporter.output_path("side_by_side.mp4"),
+        right_scores=dancer_scores, out_fps=OVERLAY_FPS, left_span=section,
+        progress=rendering(counts[0] + counts[1]))
+
+    return {
+        "score": score,
+        "report": report,
+        "segment_scores": segment_scores,
+        "standard_overlay": standard_overlay,
+        "user_overlay": user_overlay,
+        "side_by_side": side_by_side,
+        "profile": profiling.snapshot(),
+    }
+
+
+JOB_KINDS = {
+    "compare": compare_job,
+}
+
+
+def _run_job(job_id, kind, args, kwargs):
+    """Điểm vào trong tiến trình con: chạy job, ghi trạng thái + kết quả ra đĩa."""
+    _update_status(job_id, state=RUNNING, started=time.time(), pid=os.getpid())
+    reporter = ProgressReporter(job_id)
+    try:
+        result = JOB_KINDS[kind](reporter, *args, **kwargs)
+        _write_json(_job_path(job_id, "result.json"), result)
+        _update_status(job_id, state=DONE, finished=time.time())
+    except JobCancelled:
+        _update_status(job_id, state=CANCELLED, finished=time.time())
+    except Exception as e:
+        _update_status(job_id, state=FAILED, error=f"{type(e).__name__}: {e}", finished=time.time())
+    return job_id
+
+
+# ================================
+# 🏭 Bộ quản lý job
+# ================================
+class JobManager:
+    """
+    Hàng đợi job nền với pool tiến trình cục bộ:
+    - submit() trùng đầu vào → trả về job đã có (đang chạy hoặc đã xong), không tính lại.
+    - status()/result() đọc từ đĩa nên dùng được ở mọi lần rerun và mọi phiên.
+    - cancel() hủy job đang chờ hoặc yêu cầu job đang chạy dừng ở lần báo tiến độ kế tiếp.
+    """
+
+    def __init__(self, workers=None, preload=False):
+        os.makedirs(JOB_DIR, exist_ok=True)
+        prune_jobs()
+        ctx = multiprocessing.get_context("spawn")
+        self.workers = workers or JOB_WORKERS
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx,
+                                        initializer=init_worker, initargs=(0, preload))
+        self.futures = {}
+        self.lock = threading.Lock()
+        self._warmed = False
+
+    def warm_up(self):
+        """Khởi động sẵn các tiến trình con (nạp model nếu preload) trước khi có job đầu tiên."""
+        if not self._warmed:
+            self._warmed = True
+            for _ in range(self.workers):
+                self.pool.submit(os.getpid)
+
+    def _is_alive(self, job_id, status):
+        future = self.futures.get(job_id)
+        if future is not None:
+            return not future.done()
+        # Job do tiến trình/phiên khác tạo: còn sống nếu vẫn cập nhật gần đây
+        return time.time() - status.get("updated", 0) < STALE_SECONDS
+
+    def job_id(self, kind, *args, params=None, **kwargs):
+        """ID job tương ứng với đầu vào (không gửi job)."""
+        return job_key(kind, args, dict(params or {}, **kwargs))
+
+    def submit(self, kind, *args, params=None, **kwargs):
+        """Gửi job (args là đường dẫn video). Trả về job_id."""
+        job_id = self.job_id(kind, *args, params=params, **kwargs)
+        with self.lock:
+            status = read_status(job_id)
+            if status:
+                if status["state"] == DONE and read_result(job_id) is not None:
+                    return job_id
+                if status["state"] in (QUEUED, RUNNING) and self._is_alive(job_id, status):
+                    return job_id
+
+            # Job mới hoặc job cũ đã hỏng/bị hủy → chạy lại
+            shutil.rmtree(_job_path(job_id), ignore_errors=True)
+            os.makedirs(_job_path(job_id))
+            _update_status(job_id, kind=kind, state=QUEUED, progress={"done": 0, "total": 0})
+            self.futures[job_id] = self.pool.submit(_run_job, job_id, kind, args, kwargs)
+        return job_id
+
+    def status(self, job_id):
+        status = read_status(job_id)
+        if status is None:
+            return None
+        # Tiến trình con chết bất thường (vd hết bộ nhớ) → đánh dấu lỗi
+        future = self.futures.get(job_id)
+        if status["state"] not in FINISHED and future is not None and future.done() and future.exception():
+            status = _update_status(job_id, state=FAILED, error=str(future.exception()))
+        return status
+
+    def result(self, job_id):
+        return read_result(job_id)
+
+    def cancel(self, job_id):
+        future = self.futures.get(job_id)
+        if future is not None and future.cancel():
+            _update_status(job_id, state=CANCELLED, finished=time.time())
+            return
+        # Job đã bị dọn (prune_jobs) / ID cũ của phiên trước / đã xong → không còn gì để hủy
+        status = read_status(job_id)
+        if status is None or status.get("state") in FINISHED:
+            return
+        # Đang chạy → đặt cờ, job sẽ dừng ở lần báo tiến độ kế tiếp
+        try:
+            open(_job_path(job_id, "cancel"), "w").close()
+        except FileNotFoundError:
+            pass
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
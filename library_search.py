@@ -0,0 +1,276 @@
+"""
+Tìm bài múa mẫu + đoạn tương ứng với một clip của người dùng trong thư viện bài mẫu (reference_index).
+
+    python library_search.py clip.mp4 [--top 3] [--score]
+
+Mỗi bài mẫu được biểu diễn bằng pose nhóm đã chuẩn hóa (tâm hông, chia chiều dài thân) ở SEARCH_FPS
+(search.npy trong chỉ mục). Clip được so với mọi cửa sổ cùng độ dài (× các tỉ lệ tốc độ SEARCH_TEMPOS)
+bằng DTW dải Sakoe-Chiba; các bước loại sớm (kiểu UCR suite) giữ chi phí gần như không tăng theo
+số bài mẫu:
+  1. LB_PAA: envelope (min / max trong dải ±band) của clip và bài mẫu cùng lấy trung bình theo khối
+     SEARCH_BLOCK frame → cận dưới thô cho mọi vị trí bắt đầu; bài mẫu được xét theo cận dưới tăng dần
+     và dừng hẳn khi cận dưới ≥ kết quả tốt thứ `top_k`
+  2. LB_Keogh: khoảng cách từ từng frame cửa sổ bài mẫu tới envelope của clip
+  3. DTW dải hẹp cho ứng viên còn lại, theo cận dưới tăng dần, dừng khi cận dưới ≥ ngưỡng
+Các cận dưới không bao giờ vượt DTW thật → kết quả giống hệt tìm vét cạn.
+"""
+import argparse
+
+import numpy as np
+from scipy.ndimage import minimum_filter1d, maximum_filter1d
+
+import profiling
+from dtw_utils import dtw
+from pose_utils import extract_pose_sequence
+from reference_index import load_index, MAX_PEOPLE
+from scoring_utils import normalized_group_pose
+
+# ================================
+# ⚙️ Cấu hình tìm kiếm
+# ================================
+SEARCH_FPS = 5.0                     # tốc độ mẫu của đặc trưng tìm kiếm (frame / giây)
+SEARCH_BAND = 0.1                    # bán kính dải DTW = 10% độ dài clip (tối thiểu 2 frame)
+SEARCH_TEMPOS = (0.8, 1.0, 1.25)     # độ dài đoạn mẫu / độ dài clip được thử (người dùng nhanh / chậm hơn)
+SEARCH_BLOCK = 4                     # số frame mỗi khối của envelope thô (LB_PAA)
+SEARCH_TOP_K = 1                     # app chỉ cần bài khớp nhất (top_k lớn → loại sớm kém hơn)
+_CHUNK = 256                         # số cửa sổ tính LB_Keogh mỗi lượt (giới hạn bộ nhớ)
+
+
+# ================================
+# 📐 Đặc trưng tìm kiếm
+# ================================
+def search_features(seq, normalized=None, search_fps=SEARCH_FPS):
+    """
+    (features (F', 34) float32, times (F',)) – pose nhóm đã chuẩn hóa, trung bình từng khối frame
+    để còn ~search_fps frame / giây.
+    """
+    group = normalized_group_pose(seq, normalized)[..., :2].reshape(seq.n_frames, -1)
+    group = np.nan_to_num(group).astype(np.float32)
+    times = np.asarray(seq.timestamps, dtype=np.float64)
+    if len(times) < 2:
+        return group, times
+    fps = 1.0 / max(float(np.median(np.diff(times))), 1e-6)
+    factor = max(1, int(round(fps / search_fps)))
+    pad = (-len(group)) % factor
+    padded = np.concatenate([group, np.repeat(group[-1:], pad, axis=0)])
+    return padded.reshape(-1, factor, group.shape[1]).mean(axis=1), times[::factor]
+
+
+_features = {}   # đường dẫn mục chỉ mục → (features, times, trung bình trượt SEARCH_BLOCK frame)
+
+
+def _reference_features(entry):
+    """Đặc trưng + trung bình khối trượt của một bài mẫu (đọc từ chỉ mục, tính lại nếu chỉ mục cũ)."""
+    cached = _features.get(entry.path)
+    if cached is None:
+        if entry.search is not None and entry.stats.get("search_fps") == SEARCH_FPS:
+            feats, times = np.asarray(entry.search, dtype=np.float32), np.asarray(entry.search_times)
+        else:
+            feats, times = search_features(entry.sequence, entry.normalized)
+        cached = _features[entry.path] = (feats, times, _moving_mean(feats, SEARCH_BLOCK))
+    return cached
+
+
+def _moving_mean(x, block):
+    """Trung bình của x[t : t + block] cho mọi t (đã đệm frame cuối → đủ len(x) phần tử)."""
+    x = np.concatenate([x, np.repeat(x[-1:], block - 1, axis=0)]).astype(np.float64)
+    csum = np.concatenate([np.zeros((1, x.shape[1])), np.cumsum(x, axis=0)])
+    return ((csum[block:] - csum[:-block]) / block).astype(np.float32)
+
+
+def _resample(x, length):
+    """Nội suy tuyến tính chuỗi (F, D) về `length` frame."""
+    if len(x) == length:
+        return x
+    src = np.linspace(0, len(x) - 1, length)
+    lo = np.floor(src).astype(np.int64)
+    hi = np.minimum(lo + 1, len(x) - 1)
+    w = (src - lo)[:, None].astype(np.float32)
+    return x[lo] * (1 - w) + x[hi] * w
+
+
+def _box_distance(x, lower, upper):
+    """Khoảng cách Euclid (theo trục cuối) từ điểm x tới hộp [lower, upper]."""
+    gap = np.maximum(0.0, np.maximum(lower - x, x - upper))
+    return np.sqrt(np.sum(gap * gap, axis=-1))
+
+
+# ================================
+# 🔻 Cận dưới
+# ================================
+def query_envelope(query, radius):
+    """Envelope (L, U) của clip: min / max trong cửa sổ ±radius frame."""
+    size = 2 * radius + 1
+    return (minimum_filter1d(query, size, axis=0, mode="nearest"),
+            maximum_filter1d(query, size, axis=0, mode="nearest"))
+
+
+def lb_keogh(ref, starts, lower, upper):
+    """
+    LB_Keogh của các cửa sổ ref[s : s + len(lower)]: mỗi frame mẫu j chỉ khớp được các frame clip
+    trong dải ±radius → cách ít nhất tới envelope [L_j, U_j] (vector hóa theo từng lô cửa sổ).
+    """
+    w = len(lower)
+    out = np.empty(len(starts))
+    offsets = np.arange(w)
+    for a in range(0, len(starts), _CHUNK):
+        out[a:a + _CHUNK] = _box_distance(ref[starts[a:a + _CHUNK, None] + offsets], lower, upper).sum(axis=1)
+    return out
+
+
+def lb_paa(ref_mean, n_starts, lower, upper, block=SEARCH_BLOCK):
+    """
+    Cận dưới thô (LB_PAA) của LB_Keogh cho mọi vị trí bắt đầu: envelope và cửa sổ mẫu được lấy trung
+    bình theo khối `block` frame. Khoảng cách tới hộp là hàm lồi → block × khoảng cách của trung bình
+    không vượt tổng trên khối (bất đẳng thức Jensen); rẻ hơn LB_Keogh `block` lần.
+    ref_mean: _moving_mean(ref, block).
+    """
+    n_blocks = len(lower) // block
+    out = np.zeros(n_starts)
+    if n_blocks == 0:
+        return out
+    cut = n_blocks * block
+    low = lower[:cut].reshape(n_blocks, block, -1).mean(axis=1)
+    up = upper[:cut].reshape(n_blocks, block, -1).mean(axis=1)
+    offsets = np.arange(n_blocks) * block
+    chunk = _CHUNK * block
+    for a in range(0, n_starts, chunk):
+        starts = np.arange(a, min(a + chunk, n_starts))
+        out[a:a + len(starts)] = _box_distance(ref_mean[starts[:, None] + offsets], low, up).sum(axis=1)
+    return out * block
+
+
+# ================================
+# 🔎 Tìm kiếm trong thư viện
+# ================================
+@profiling.timed("library_search")
+def search_library(query, entries=None, top_k=SEARCH_TOP_K, tempos=SEARCH_TEMPOS, band=SEARCH_BAND):
+    """
+    Các bài mẫu (mỗi bài một kết quả tốt nhất) khớp nhất với clip `query` (đặc trưng search_features).
+    Trả về dict:
+      matches – list (tốt nhất trước) {name, sha256, video, start_s, end_s, start_frame, end_frame,
+                cost (khoảng cách pose trung bình mỗi frame clip), tempo}
+      stats   – số cửa sổ / bài mẫu bị loại ở từng bước cận dưới, số lần chạy DTW
+    """
+    entries = load_index() if entries is None else entries
+    query = np.asarray(query, dtype=np.float32)
+    stats = {"references": len(entries), "windows": 0, "pruned_coarse": 0, "pruned_keogh": 0,
+             "dtw": 0, "references_skipped": 0}
+    if len(query) < 2 or not entries:
+        return {"matches": [], "stats": stats}
+
+    # Bước 1: cận dưới thô cho mọi (bài mẫu, tốc độ) → xét theo thứ tự cận dưới tăng dần
+    plans = []
+    for sha, entry in entries.items():
+        feats, times, ref_mean = _reference_features(entry)
+        for tempo in tempos:
+            w = max(2, int(round(len(query) * tempo)))
+            if len(feats) < w:
+                continue
+            q = _resample(query, w)
+            radius = max(2, int(round(band * w)))
+            lower, upper = query_envelope(q, radius)
+            n_starts = len(feats) - w + 1
+            coarse = lb_paa(ref_mean, n_starts, lower, upper) / w
+            stats["windows"] += n_starts
+            plans.append((float(coarse.min()), sha, entry, tempo, q, (lower, upper), radius, coarse))
+    plans.sort(key=lambda p: p[0])
+
+    best = {}   # sha → kết quả tốt nhất của bài đó
+
+    def threshold(sha):
+        costs = sorted(m["cost"] for m in best.values())
+        kth = costs[top_k - 1] if len(costs) >= top_k else np.inf
+        return min(kth, best[sha]["cost"]) if sha in best else kth
+
+    for n_done, (lb, sha, entry, tempo, q, (lower, upper), radius, coarse) in enumerate(plans):
+        if lb >= threshold(None):
+            # Kế hoạch xếp theo cận dưới tăng dần → mọi kế hoạch còn lại đều không vào được top_k
+            rest = plans[n_done:]
+            stats["pruned_coarse"] += sum(len(p[7]) for p in rest)
+            stats["references_skipped"] = len({p[1] for p in rest} - set(best))
+            break
+        feats, times = _reference_features(entry)[:2]
+        w = len(q)
+
+        # Bước 2: LB_Keogh cho các vị trí bắt đầu chưa bị LB_PAA loại
+        starts = np.flatnonzero(coarse < threshold(sha))
+        stats["pruned_coarse"] += len(coarse) - len(starts)
+        keogh = lb_keogh(feats, starts, lower, upper) / w
+        order = np.argsort(keogh)
+
+        # Bước 3: DTW dải hẹp theo cận dưới tăng dần, dừng khi cận dưới ≥ ngưỡng hiện tại
+        computed = 0
+        for s, bound in zip(starts[order], keogh[order]):
+            if bound >= threshold(sha):
+                break
+            cost = dtw(q, feats[s:s + w], band=radius, return_path=False).distance / w
+            computed += 1
+            if cost < threshold(sha):
+                best[sha] = _match(entry, sha, times, int(s), w, cost, tempo)
+        stats["dtw"] += computed
+        stats["pruned_keogh"] += len(starts) - computed
+
+    matches = sorted(best.values(), key=lambda m: m["cost"])[:top_k]
+    for m in matches:
+        m["cost"] = round(m["cost"], 4)
+    return {"matches": matches, "stats": stats}
+
+
+def _match(entry, sha, times, start, length, cost, tempo):
+    step = 1.0 / SEARCH_FPS
+    start_s = float(times[start])
+    end_s = float(times[min(start + length, len(times)) - 1]) + step
+    ts = np.asarray(entry.sequence.timestamps)
+    return {
+        "name": entry.stats["name"],
+        "sha256": sha,
+        "video": entry.stats.get("video"),
+        "start_s": round(start_s, 2),
+        "end_s": round(end_s, 2),
+        "start_frame": int(np.searchsorted(ts, start_s)),
+        "end_frame": int(np.searchsorted(ts, end_s)),
+        "cost": float(cost),
+        "tempo": tempo,
+    }
+
+
+def search_clip(video_path, max_people=MAX_PEOPLE, top_k=SEARCH_TOP_K, settings=None):
+    """Phân tích clip người dùng rồi tìm bài mẫu + đoạn tương ứng (xem search_library)."""
+    seq = extract_pose_sequence(video_path, max_people, settings=settings).filled()
+    if seq.n_people == 0:
+        return {"matches": [], "stats": {}}
+    features, _ = search_features(seq)
+    return search_library(features, top_k=top_k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("clip", help="Video của người dùng")
+    parser.add_argument("--top", type=int, default=3)
+    parser.add_argument("--max-people", type=int, default=MAX_PEOPLE)
+    parser.add_argument("--score", action="store_true", help="Chấm điểm clip với đoạn khớp nhất")
+    args = parser.parse_args()
+
+    result = search_clip(args.clip, args.max_people, args.top)
+    if not result["matches"]:
+        print("⚠️ Không tìm thấy bài mẫu phù hợp (chỉ mục trống hoặc clip không có người).")
+        return
+    for k, m in enumerate(result["matches"], start=1):
+        print(f"{k}. {m['name']}: {m['start_s']:.1f}s – {m['end_s']:.1f}s "
+              f"(khoảng cách {m['cost']:.3f}, tốc độ mẫu/clip {m['tempo']:g})")
+    s = result["stats"]
+    print(f"🔎 {s['windows']} cửa sổ: loại {s['pruned_coarse']} bằng envelope thô, "
+          f"{s['pruned_keogh']} bằng LB_Keogh, {s['dtw']} lần DTW")
+
+    if args.score:
+        from compare_utils_group_avg import compare_dance_report
+        best = result["matches"][0]
+        report = compare_dance_report(best["video"], args.clip, max_people=args.max_people,
+                                      section=(best["start_s"], best["end_s"]))
+        print(f"🎯 Điểm so với đoạn {best['start_s']:.1f}s – {best['end_s']:.1f}s: "
+              f"{report['score'] if report else 0.0:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Chế độ luyện tập trực tiếp: camera / RTSP / file lặp lại → pose → chấm điểm theo từng nhịp.
+
+    python live_utils.py --standard samples/standard/Múa_Xòe_Tây_Bắc.mp4 --source 0 --show
+    python live_utils.py --standard mau.mp4 --source rtsp://192.168.1.10/stream
+    python live_utils.py --standard mau.mp4 --source tap_luyen.mp4      # file lặp lại thay camera
+
+--show cần OpenCV có GUI (pip install opencv-python); bản headless trong requirements.txt
+không mở được cửa sổ → tự chạy tiếp không hiển thị.
+"""
+import argparse
+import os
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from pose_utils import extract_pose_sequence, infer_batch, pose_model_name, MAX_PEOPLE
+from model_registry import warm_up
+from tracking_utils import PoseTracker
+from scoring_utils import StreamingScorer
+from render_utils import draw_pose_frame
+
+# ================================
+# 🎯 Mục tiêu hiệu năng mặc định
+# ================================
+TARGET_FPS = 15.0          # số frame được chấm mỗi giây
+MAX_LATENCY_MS = 250.0     # độ trễ chụp → có điểm (p95) chấp nhận được
+QUEUE_SIZE = 2             # hàng đợi nhỏ → luôn xử lý frame mới nhất, bỏ frame cũ khi quá tải
+IMGSZ_STEPS = (640, 480, 384, 320)  # giảm dần kích thước đầu vào khi không đạt độ trễ
+
+
+def open_source(source):
+    """Mở camera (số), URL RTSP/HTTP hoặc file video."""
+    if isinstance(source, int) or (isinstance(source, str) and source.isdigit()):
+        return cv2.VideoCapture(int(source)), False
+    is_file = os.path.exists(str(source))
+    return cv2.VideoCapture(source), is_file
+
+
+# ================================
+# 📷 Luồng đọc frame với hàng đợi giới hạn
+# ================================
+class FrameGrabber(threading.Thread):
+    """
+    Đọc frame liên tục vào hàng đợi kích thước cố định. Hàng đợi đầy → bỏ frame cũ nhất
+    (không bao giờ chặn nguồn phát). File video được phát lặp lại đúng tốc độ gốc để giả lập camera.
+    """
+
+    def __init__(self, source, queue_size=QUEUE_SIZE):
+        super().__init__(daemon=True)
+        self.cap, self.is_file = open_source(source)
+        if not self.cap.isOpened():
+            raise RuntimeError(f"Không mở được nguồn video: {source}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.stopped = threading.Event()
+        self.captured = 0
+        self.dropped = 0
+
+    def run(self):
+        next_t = time.perf_counter()
+        while not self.stopped.is_set():
+            ret, frame = self.cap.read()
+            if not ret:
+                if self.is_file:
+                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    continue
+                break
+
+            if self.is_file:
+                # Phát file theo thời gian thực
+                next_t += 1.0 / self.fps
+                time.sleep(max(0.0, next_t - time.perf_counter()))
+
+            self.captured += 1
+            item = (time.perf_counter(), frame)
+            try:
+                self.frames.put_nowait(item)
+            except queue.Full:
+                try:
+                    self.frames.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+                self.frames.put_nowait(item)
+        self.cap.release()
+
+    def stop(self):
+        self.stopped.set()
+
+
+# ================================
+# 🩰 Chấm điểm trực tiếp theo nhịp
+# ================================
+class LiveScorer:
+    """
+    Căn chỉnh pose trực tiếp với chuỗi mẫu (đã tính sẵn) bằng DTW trực tuyến và
+    chấm điểm từng nhịp (beat = 60 / bpm giây) bằng StreamingScorer (cùng thang điểm với báo cáo
+    chấm video). Tự hạ imgsz khi độ trễ p95 vượt mục tiêu.
+    """
+
+    def __init__(self, standard_video, bpm=60.0, max_people=MAX_PEOPLE,
+                 target_fps=TARGET_FPS, max_latency_ms=MAX_LATENCY_MS):
+        std_seq = extract_pose_sequence(standard_video, max_people).filled()
+        self.scorer = StreamingScorer(std_seq)
+        self.tracker = PoseTracker()
+        self.slots = {}          # ID track → vị trí hiển thị (nhãn P1, P2, ... + màu ổn định)
+        self.max_people = max_people
+        self.beat_seconds = 60.0 / bpm
+        self.target_fps = target_fps
+        self.max_latency_ms = max_latency_ms
+        self.imgsz_level = 0
+
+        # Nạp + chạy thử model trước khi mở camera → frame đầu tiên không bị trễ
+        warm_up(pose_model_name(), imgsz=self.imgsz)
+
+        self.latencies_ms = []
+        self.beat_scores = []
+        self._beat_errors = []
+        self._beat_start = None
+        self.processed = 0
+
+    @property
+    def imgsz(self):
+        return IMGSZ_STEPS[self.imgsz_level]
+
+    def process(self, frame, captured_at):
+        """Suy luận + chấm điểm một frame. Trả về dict trạng thái (các trường điểm = None nếu không thấy ai)."""
+        pose = infer_batch([frame], self.imgsz)[0]
+        now = time.perf_counter()
+        self.processed += 1
+        self._beat_start = self._beat_start or now
+
+        result = {"pose": pose, "ids": [], "slots": [], "ref_time": None, "running_score": None,
+                  "beat_score": None}
+        if len(pose.keypoints):
+            ids = self.tracker.update(pose.keypoints, pose.boxes)
+            chosen = np.argsort(ids)[:self.max_people]
+            step = self.scorer.update(pose.keypoints[chosen], captured_at)
+            result["ids"] = ids
+            result["slots"] = self._assign_slots(ids)
+            if step is not None:
+                self._beat_errors.append(step["errors"])
+                result.update(ref_time=step["ref_time"], running_score=step["running_score"])
+
+        # Hết một nhịp → chốt điểm nhịp
+        if now - self._beat_start >= self.beat_seconds:
+            if self._beat_errors:
+                score = self.scorer.window_score(self._beat_errors)
+                self.beat_scores.append(score)
+                result["beat_score"] = score
+            self._beat_errors, self._beat_start = [], now
+
+        latency = (time.perf_counter() - captured_at) * 1000
+        self.latencies_ms.append(latency)
+        result["latency_ms"] = latency
+        self._adapt()
+        return result
+
+    def _assign_slots(self, ids):
+        """
+        Vị trí hiển thị của từng người: ID track tăng mãi, còn vị trí lấy số nhỏ nhất còn trống
+        và được trả lại khi track bị xóa → nhãn / màu không nhảy khi người múa mất dấu rồi xuất hiện lại.
+        """
+        alive = set(int(t) for t in self.tracker.ids)
+        self.slots = {t: s for t, s in self.slots.items() if t in alive}
+        for t in ids:
+            t = int(t)
+            if t not in self.slots:
+                used = set(self.slots.values())
+                self.slots[t] = next(s for s in range(len(used) + 1) if s not in used)
+        return [self.slots[int(t)] for t in ids]
+
+    def _adapt(self):
+        """Độ trễ p95 của 30 frame gần nhất vượt mục tiêu → giảm imgsz một bậc."""
+        recent = self.latencies_ms[-30:]
+        if len(recent) == 30 and np.percentile(recent, 95) > self.max_latency_ms:
+            if self.imgsz_level < len(IMGSZ_STEPS) - 1:
+                self.imgsz_level += 1
+                self.latencies_ms.clear()
+
+    def stats(self, elapsed, grabber=None):
+        lat = np.array(self.latencies_ms) if self.latencies_ms else np.zeros(1)
+        fps = self.processed / elapsed if elapsed > 0 else 0.0
+        out = {
+            "fps": round(fps, 1),
+            "latency_p50_ms": round(float(np.percentile(lat, 50)), 1),
+            "latency_p95_ms": round(float(np.percentile(lat, 95)), 1),
+            "imgsz": self.imgsz,
+            "beats": len(self.beat_scores),
+            "mean_beat_score": round(float(np.mean(self.beat_scores)), 1) if self.beat_scores else None,
+        }
+        out["fps_target_met"] = fps >= self.target_fps * 0.95
+        out["latency_target_met"] = out["latency_p95_ms"] <= self.max_latency_ms
+        if grabber is not None:
+            out["captured"] = grabber.captured
+            out["dropped"] = grabber.dropped
+        return out
+
+
+def draw_live_frame(frame, result):
+    """Vẽ khung xương (nhãn / màu theo vị trí hiển thị ổn định) + điểm tạm thời lên bản sao của frame."""
+    vis = frame.copy()
+    slots = result["slots"]
+    if slots:
+        kpts = np.full((max(slots) + 1, 17, 3), np.nan, dtype=np.float32)
+        kpts[slots] = result["pose"].keypoints
+        draw_pose_frame(vis, kpts, [f"P {s + 1}" for s in range(len(kpts))])
+    if result["running_score"] is not None:
+        cv2.putText(vis, f"Score {result['running_score']:.1f}", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2, cv2.LINE_AA)
+    return vis
+
+
+def run_live(standard_video, source=0, bpm=60.0, duration=None, show=False,
+             target_fps=TARGET_FPS, max_latency_ms=MAX_LATENCY_MS, on_update=None):
+    """
+    Vòng lặp luyện tập trực tiếp. Dừng khi hết `duration` giây, nhấn `q` (khi --show)
+    hoặc nguồn phát kết thúc. Trả về thống kê hiệu năng + điểm các nhịp.
+    """
+    scorer = LiveScorer(standard_video, bpm=bpm, target_fps=target_fps, max_latency_ms=max_latency_ms)
+    grabber = FrameGrabber(source)
+    grabber.start()
+    min_interval = 1.0 / target_fps if target_fps else 0.0
+
+    start = last = time.perf_counter()
+    try:
+        while duration is None or time.perf_counter() - start < duration:
+            # Không xử lý nhanh hơn target_fps (chờ trước khi lấy frame để frame luôn mới nhất)
+            wait = min_interval - (time.perf_counter() - last)
+            if wait > 0:
+                time.sleep(wait)
+            last = time.perf_counter()
+
+            try:
+                captured_at, frame = grabber.frames.get(timeout=1.0)
+            except queue.Empty:
+                if not grabber.is_alive():
+                    break
+                continue
+
+            result = scorer.process(frame, captured_at)
+            if on_update:
+                on_update(result)
+            if result["beat_score"] is not None:
+                print(f"🎵 Nhịp {len(scorer.beat_scores)}: {result['beat_score']:.1f} "
+                      f"(trễ {result['latency_ms']:.0f} ms)")
+
+            if show:
+                vis = draw_live_frame(frame, result)
+                try:
+                    cv2.imshow("Folk Dance Live", vis)
+                except cv2.error:
+                    print("⚠️ OpenCV không hỗ trợ cửa sổ (bản headless) → tiếp tục không hiển thị. "
+                          "Cài opencv-python để dùng --show.")
+                    show = False
+                    continue
+                if cv2.waitKey(1) & 0xFF == ord("q"):
+                    break
+    finally:
+        grabber.stop()
+        if show:
+            cv2.destroyAllWindows()
+
+    stats = scorer.stats(time.perf_counter() - start, grabber)
+    stats["beat_scores"] = scorer.beat_scores
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--standard", required=True, help="Video múa mẫu")
+    parser.add_argument("--source", default="0", help="Số camera, URL RTSP hoặc file video")
+    parser.add_argument("--bpm", type=float, default=60.0, help="Nhịp/phút dùng để chia đoạn chấm điểm")
+    parser.add_argument("--duration", type=float, default=None, help="Số giây chạy (mặc định tới khi dừng)")
+    parser.add_argument("--target-fps", type=float, default=TARGET_FPS)
+    parser.add_argument("--max-latency-ms", type=float, default=MAX_LATENCY_MS)
+    parser.add_argument("--show", action="store_true", help="Hiển thị cửa sổ khung xương")
+    args = parser.parse_args()
+
+    stats = run_live(args.standard, args.source, args.bpm, args.duration, args.show,
+                     args.target_fps, args.max_latency_ms)
+    print("📊 Kết quả:")
+    for k, v in stats.items():
+        print(f"  {k}: {v}")
+
+
+if __name__ == "__main__":
+    main()
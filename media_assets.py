@@ -0,0 +1,225 @@
+"""
+Tài nguyên hiển thị dựng sẵn cho app: ảnh thumbnail thu nhỏ và bản video proxy nhẹ.
+
+    python media_assets.py                     # thumbnail trong samples/tutorials + proxy mọi bài mẫu
+    python media_assets.py video1.mp4 --height 360
+
+Ảnh gốc / video gốc không đổi; bản dựng nằm trong ASSET_DIR theo khóa nội dung + tham số:
+    thumbs/<key>.jpg   JPEG progressive rộng THUMB_WIDTH px
+    proxy/<key>.mp4    H.264 cao PROXY_HEIGHT px, bitrate thấp, keyframe mỗi giây, faststart
+                       (trình duyệt phát được ngay khi mới tải phần đầu, tua nhanh)
+App chỉ gửi bản dựng cho trình duyệt; proxy chưa có → phát video gốc và dựng proxy chạy nền.
+"""
+import argparse
+import base64
+import glob
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import threading
+
+# ================================
+# ⚙️ Cấu hình
+# ================================
+ASSET_DIR = os.environ.get("DANCE_ASSET_DIR", ".cache/assets")
+ASSET_VERSION = 1
+THUMB_DIR = "samples/tutorials"
+THUMB_WIDTH = 640            # gallery hiển thị 2 cột → 640 px đủ nét cả màn hình retina thông thường
+THUMB_QUALITY = 80
+PROXY_HEIGHT = int(os.environ.get("DANCE_PROXY_HEIGHT", "480"))
+PROXY_CRF = 30               # chất lượng H.264 (càng lớn càng nhẹ)
+PROXY_MAX_FPS = 30
+PROXY_AUDIO_KBPS = 64
+
+_build_locks = {}
+_build_locks_lock = threading.Lock()
+_pending = set()             # proxy đang được dựng nền (không dựng trùng)
+
+
+def _asset_key(identity, params):
+    payload = {"asset_version": ASSET_VERSION, "source": identity, "params": params}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def _lock_for(path):
+    with _build_locks_lock:
+        return _build_locks.setdefault(path, threading.Lock())
+
+
+def _file_identity(path):
+    """Ảnh nhỏ: path + size + mtime là đủ (không cần đọc nội dung)."""
+    st = os.stat(path)
+    return [os.path.abspath(path), st.st_size, st.st_mtime_ns]
+
+
+# ================================
+# 🖼️ Thumbnail
+# ================================
+def thumbnail_path(image_path, width=THUMB_WIDTH, quality=THUMB_QUALITY):
+    """Đường dẫn thumbnail đã thu nhỏ (dựng nếu chưa có)."""
+    key = _asset_key(_file_identity(image_path), {"width": width, "quality": quality})
+    out = os.path.join(ASSET_DIR, "thumbs", f"{key}.jpg")
+    if os.path.exists(out):
+        return out
+
+    import cv2
+    with _lock_for(out):
+        if os.path.exists(out):
+            return out
+        img = cv2.imread(image_path, cv2.IMREAD_COLOR)
+        if img is None:
+            raise ValueError(f"Không đọc được ảnh {image_path}")
+        h, w = img.shape[:2]
+        if w > width:
+            img = cv2.resize(img, (width, max(1, round(h * width / w))), interpolation=cv2.INTER_AREA)
+        ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality, cv2.IMWRITE_JPEG_PROGRESSIVE, 1,
+                                             cv2.IMWRITE_JPEG_OPTIMIZE, 1])
+        if not ok:
+            raise ValueError(f"Không mã hóa được thumbnail cho {image_path}")
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        tmp = f"{out}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp, "wb") as f:
+            f.write(buf.tobytes())
+        os.replace(tmp, out)
+    return out
+
+
+def thumbnail_data_uri(image_path, width=THUMB_WIDTH):
+    """data: URI của thumbnail (nhỏ hơn nhiều so với nhúng ảnh gốc vào trang)."""
+    with open(thumbnail_path(image_path, width), "rb") as f:
+        return "data:image/jpeg;base64," + base64.b64encode(f.read()).decode()
+
+
+# ================================
+# 🎞️ Video proxy (H.264 nhẹ, faststart)
+# ================================
+def _video_meta(video_path):
+    import cv2
+    cap = cv2.VideoCapture(video_path)
+    fps, height = cap.get(cv2.CAP_PROP_FPS) or 25.0, int(cap.get(4))
+    cap.release()
+    return fps, height
+
+
+def _proxy_target(video_path, height):
+    from pose_utils import file_sha256
+    key = _asset_key(file_sha256(video_path), {"height": height, "crf": PROXY_CRF, "max_fps": PROXY_MAX_FPS,
+                                               "audio_kbps": PROXY_AUDIO_KBPS})
+    return os.path.join(ASSET_DIR, "proxy", f"{key}.mp4")
+
+
+def build_proxy(video_path, height=PROXY_HEIGHT):
+    """
+    Dựng (nếu chưa có) bản proxy của video và trả về đường dẫn; cần ffmpeg.
+    Không phóng to video nhỏ hơn `height`; keyframe mỗi ~1 giây để tua nhanh.
+    """
+    out = _proxy_target(video_path, height)
+    if os.path.exists(out):
+        return out
+    if not shutil.which("ffmpeg"):
+        raise RuntimeError("Cần ffmpeg để dựng video proxy")
+
+    with _lock_for(out):
+        if os.path.exists(out):
+            return out
+        fps, src_height = _video_meta(video_path)
+        fps = min(fps, PROXY_MAX_FPS)
+        target = min(height, src_height or height) // 2 * 2
+        gop = max(1, round(fps))
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        tmp = f"{out}.tmp-{os.getpid()}-{threading.get_ident()}.mp4"
+        cmd = [
+            "ffmpeg", "-y", "-loglevel", "error", "-i", video_path,
+            "-map", "0:v:0", "-map", "0:a:0?",
+            "-vf", f"scale=-2:{target},fps={fps:.3f}",
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", str(PROXY_CRF), "-pix_fmt", "yuv420p",
+            "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0",
+            "-c:a", "aac", "-b:a", f"{PROXY_AUDIO_KBPS}k",
+            "-movflags", "+faststart", tmp,
+        ]
+        try:
+            subprocess.run(cmd, check=True)
+            os.replace(tmp, out)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    return out
+
+
+def proxy_or_original(video_path, height=PROXY_HEIGHT, background=True):
+    """
+    Video nên gửi cho trình duyệt: bản proxy nếu đã dựng, ngược lại video gốc
+    (background=True → dựng proxy trong luồng nền cho lần xem sau, không chặn trang).
+    """
+    try:
+        out = _proxy_target(video_path, height)
+    except OSError:
+        return video_path
+    if os.path.exists(out):
+        return out
+    if background and shutil.which("ffmpeg"):
+        with _build_locks_lock:
+            if out in _pending:
+                return video_path
+            _pending.add(out)
+
+        def work():
+            try:
+                build_proxy(video_path, height)
+            except Exception as e:
+                print(f"⚠️ Không dựng được proxy cho {video_path}: {e}")
+            finally:
+                with _build_locks_lock:
+                    _pending.discard(out)
+
+        threading.Thread(target=work, daemon=True, name="proxy-build").start()
+    return video_path
+
+
+# ================================
+# 🏗️ Dựng sẵn toàn bộ (offline)
+# ================================
+def build_assets(videos=(), thumb_dir=THUMB_DIR, height=PROXY_HEIGHT):
+    """Dựng thumbnail cho mọi ảnh trong thumb_dir và proxy cho các video; trả về số mục đã dựng."""
+    built = 0
+    for image in sorted(glob.glob(os.path.join(thumb_dir, "*.jp*g")) + glob.glob(os.path.join(thumb_dir, "*.png"))):
+        src, dst = os.path.getsize(image), os.path.getsize(thumbnail_path(image))
+        print(f"🖼️ {os.path.basename(image)}: {src / 1024:.0f} KB → {dst / 1024:.0f} KB")
+        built += 1
+    for video in videos:
+        try:
+            out = build_proxy(video, height)
+        except Exception as e:
+            print(f"⚠️ {video}: {e}")
+            continue
+        print(f"🎞️ {os.path.basename(video)}: {os.path.getsize(video) / 2**20:.1f} MB → "
+              f"{os.path.getsize(out) / 2**20:.1f} MB")
+        built += 1
+    return built
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("videos", nargs="*", help="Video cần dựng proxy (mặc định: mọi bài mẫu, tự tải nếu thiếu)")
+    parser.add_argument("--height", type=int, default=PROXY_HEIGHT)
+    parser.add_argument("--thumb-dir", default=THUMB_DIR)
+    args = parser.parse_args()
+
+    videos = args.videos
+    if not videos:
+        from reference_index import reference_sources, download_reference
+        videos = []
+        for name, drive_id, path in reference_sources():
+            try:
+                videos.append(download_reference(drive_id, path))
+            except Exception as e:
+                print(f"⚠️ Không tải được {name}: {e}")
+
+    built = build_assets(videos, args.thumb_dir, args.height)
+    print(f"📦 Đã dựng {built} tài nguyên tại {ASSET_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+import profiling
+
+# ================================
+# 🧠 Danh mục model: nạp lười, an toàn đa luồng
+# ================================
+# torch / ultralytics chỉ được import khi model được dùng lần đầu → khởi động app
+# (và tab Học Múa) không phải trả chi phí nạp thư viện nặng và trọng số.
+MODEL_PATH = os.environ.get("DANCE_MODEL_PATH", "yolov8n-pose.pt")
+MODEL_URL = "https://drive.google.com/uc?id=1U6_MPRphf2ntWjVbKH-yLpjcX2Ds2fzK"
+
+
+def ensure_weights(path=MODEL_PATH, url=MODEL_URL):
+    """Tự tải trọng số nếu chưa có (gdown chỉ được import khi thật sự cần tải)."""
+    if not os.path.exists(path):
+        import gdown
+
+        gdown.download(url, path, quiet=False)
+    return path
+
+
+def _load_yolo_pose():
+    from ultralytics import YOLO
+    from ultralytics.nn.tasks import PoseModel
+    from torch.serialization import add_safe_globals
+
+    # ✅ Cho phép load model dạng ultralytics PoseModel
+    add_safe_globals([PoseModel])
+    # ✅ Load model an toàn trên Streamlit Cloud (CPU)
+    return YOLO(ensure_weights(), task="pose", verbose=False)
+
+
+def _load_fake_pose():
+    from pose_utils_mock import FakePoseModel
+    return FakePoseModel()
+
+
+def _backend_loader(backend):
+    def load():
+        from inference_backends import load_backend
+        return load_backend(backend)
+    return load
+
+
+# Tên model → hàm nạp (không tham số); "pose-<backend>" là model đã xuất (inference_backends.py),
+# "pose-fake" là model giả không suy luận (pose_utils_mock.py) cho benchmark / chạy thử
+MODEL_LOADERS = {
+    "pose": _load_yolo_pose,
+    "pose-fake": _load_fake_pose,
+    "pose-onnx": _backend_loader("onnx"),
+    "pose-onnx-int8": _backend_loader("onnx-int8"),
+    "pose-openvino": _backend_loader("openvino"),
+    "pose-openvino-int8": _backend_loader("openvino-int8"),
+}
+
+_models = {}
+_load_seconds = {}
+_lock = threading.Lock()
+
+
+def register_model(name, loader):
+    """Đăng ký thêm một loại model (vd backend khác) với hàm nạp riêng."""
+    with _lock:
+        MODEL_LOADERS[name] = loader
+        _models.pop(name, None)
+
+
+def get_model(name="pose"):
+    """Model đã nạp (nạp ở lần gọi đầu; nhiều luồng gọi cùng lúc vẫn chỉ nạp một lần)."""
+    model = _models.get(name)
+    if model is not None:
+        return model
+    with _lock:
+        if name not in _models:
+            start = time.perf_counter()
+            _models[name] = MODEL_LOADERS[name]()
+            _load_seconds[name] = time.perf_counter() - start
+            profiling.record("model_load", _load_seconds[name])
+        return _models[name]
+
+
+def is_loaded(name="pose"):
+    return name in _models
+
+
+def warm_up(name="pose", imgsz=640):
+    """
+    Nạp model và chạy thử một ảnh đen để khởi tạo sẵn (tránh trễ ở frame thật đầu tiên).
+    Trả về số giây (nạp, chạy thử).
+    """
+    start = time.perf_counter()
+    model = get_model(name)
+    loaded = time.perf_counter() - start
+    start = time.perf_counter()
+    model([np.zeros((imgsz, imgsz, 3), dtype=np.uint8)], imgsz=imgsz, verbose=False)
+    return loaded, time.perf_counter() - start
+
+
+def unload(name="pose"):
+    """Bỏ model khỏi bộ nhớ (lần dùng sau sẽ nạp lại)."""
+    with _lock:
+        _models.pop(name, None)
+
+
+def model_stats():
+    """Thời gian nạp (giây) của các model đã nạp."""
+    return dict(_load_seconds)
@@ -1,145 +1,950 @@
 import cv2
 import os
+import json
+import shutil
+import hashlib
+import multiprocessing
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-from ultralytics import YOLO
 
-from ultralytics.nn.tasks import PoseModel
-from torch.serialization import add_safe_globals
+import profiling
+from model_registry import MODEL_PATH, get_model, warm_up
+
+# ================================
+# 💾 Bộ nhớ đệm keypoints (theo nội dung video)
+# ================================
+CACHE_DIR = os.environ.get("DANCE_CACHE_DIR", ".cache/keypoints")
+CACHE_MAX_BYTES = int(os.environ.get("DANCE_CACHE_MAX_MB", "2048")) * 1024 * 1024
+CACHE_VERSION = 2
+
+# Số người tối đa lưu trong cache cho mỗi frame (độc lập với max_people khi chấm điểm)
+MAX_DETECTIONS = 32
+# Số người được theo dõi + chấm điểm mặc định (lớp học đông: DANCE_MAX_PEOPLE=30, tối đa MAX_DETECTIONS)
+MAX_PEOPLE = min(int(os.environ.get("DANCE_MAX_PEOPLE", "5")), MAX_DETECTIONS)
+
+# ⚙️ Tham số suy luận mặc định (ghi đè bằng biến môi trường hoặc tham số `settings`)
+#   batch_size – số frame gửi vào model mỗi lần gọi
+#   target_fps – tốc độ phân tích (vd 10 fps cho video 30 fps); None = mọi frame
+#   imgsz      – kích thước ảnh đầu vào của YOLO (keypoints vẫn ở tọa độ gốc)
+#   motion_budget – lấy mẫu thích ứng: chỉ suy luận khi chuyển động cộng dồn (độ chênh lệch
+#                   trung bình của ảnh thu nhỏ, thang 0–255) vượt ngưỡng này; frame bỏ qua được
+#                   nội suy trên chuỗi đã theo dõi. None = suy luận mọi frame theo target_fps
+#   max_gap    – khi lấy mẫu thích ứng: số frame (theo target_fps) tối đa giữa hai lần suy luận
+DEFAULT_INFERENCE_SETTINGS = {
+    "batch_size": int(os.environ.get("DANCE_BATCH_SIZE", "8")),
+    "target_fps": float(os.environ["DANCE_TARGET_FPS"]) if os.environ.get("DANCE_TARGET_FPS") else None,
+    "imgsz": int(os.environ.get("DANCE_IMGSZ", "640")),
+    # torch | onnx | onnx-int8 | openvino | openvino-int8 (xem inference_backends.py)
+    "backend": os.environ.get("DANCE_BACKEND", "torch"),
+    "motion_budget": float(os.environ["DANCE_MOTION_BUDGET"]) if os.environ.get("DANCE_MOTION_BUDGET") else None,
+    "max_gap": int(os.environ.get("DANCE_MAX_GAP", "6")),
+}
+MOTION_WIDTH = 64            # chiều rộng ảnh thu nhỏ dùng để ước lượng chuyển động
+
+_ARRAY_NAMES = ("keypoints", "boxes", "scores", "counts", "frame_indices", "timestamps")
+_file_hash_memo = {}
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Băm SHA-256 nội dung file (ghi nhớ theo path + size + mtime để khỏi đọc lại)."""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if memo_key in _file_hash_memo:
+        return _file_hash_memo[memo_key]
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    _file_hash_memo[memo_key] = digest
+    return digest
+
+
+def remember_file_sha256(path, digest):
+    """Ghi nhớ hash đã tính sẵn (vd lúc nhận upload) để file_sha256 khỏi đọc lại file."""
+    st = os.stat(path)
+    _file_hash_memo[(os.path.abspath(path), st.st_size, st.st_mtime_ns)] = digest
+
+
+def resolve_inference_settings(settings=None):
+    """Gộp tham số truyền vào với DEFAULT_INFERENCE_SETTINGS."""
+    resolved = dict(DEFAULT_INFERENCE_SETTINGS)
+    resolved.update({k: v for k, v in (settings or {}).items() if v is not None})
+    resolved["batch_size"] = max(1, int(resolved["batch_size"]))
+    return resolved
 
-# ✅ Cho phép load model dạng ultralytics PoseModel
-add_safe_globals([PoseModel])
 
-# ✅ Tự tải model nếu chưa có
-MODEL_PATH = "yolov8n-pose.pt"
-if not os.path.exists(MODEL_PATH):
-    gdown.download(
-        "https://drive.google.com/uc?id=1U6_MPRphf2ntWjVbKH-yLpjcX2Ds2fzK",
-        MODEL_PATH,
-        quiet=False
-    )
+def cache_settings(settings):
+    """Các tham số ảnh hưởng tới kết quả suy luận → nằm trong khóa cache."""
+    return {
+        "model": os.path.basename(MODEL_PATH),
+        "version": CACHE_VERSION,
+        "target_fps": settings["target_fps"],
+        "imgsz": settings["imgsz"],
+        "backend": settings["backend"],
+        # Chỉ thêm khi bật lấy mẫu thích ứng → khóa cache cũ vẫn dùng được
+        **({"motion_budget": settings["motion_budget"], "max_gap": settings["max_gap"]}
+           if settings.get("motion_budget") else {}),
+    }
 
-# ✅ Load model an toàn trên Streamlit Cloud (CPU)
-YOLO_MODEL = YOLO(MODEL_PATH, task="pose", verbose=False)
 
+def keypoint_cache_key(video_path, settings=None):
+    """Khóa cache = hash(nội dung video + model + tham số suy luận)."""
+    payload = {
+        "video": file_sha256(video_path),
+        "settings": cache_settings(resolve_inference_settings(settings)),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def load_cached_analysis(key):
+    """Đọc kết quả phân tích từ cache (memory-mapped). Trả về None nếu chưa có."""
+    entry = os.path.join(CACHE_DIR, key)
+    meta_path = os.path.join(entry, "meta.json")
+    if not os.path.exists(meta_path):
+        profiling.count("cache_miss")
+        return None
+    try:
+        with open(meta_path) as f:
+            analysis = json.load(f)
+        for name in _ARRAY_NAMES:
+            analysis[name] = np.load(os.path.join(entry, f"{name}.npy"), mmap_mode="r")
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Cache hỏng, bỏ qua {key[:12]}: {e}")
+        shutil.rmtree(entry, ignore_errors=True)
+        return None
+
+    # Cập nhật thời điểm dùng gần nhất cho LRU
+    os.utime(meta_path, None)
+    profiling.count("cache_hit")
+    return analysis
+
+
+def save_cached_analysis(key, analysis):
+    """Ghi kết quả phân tích vào cache (ghi vào thư mục tạm rồi đổi tên → an toàn)."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    entry = os.path.join(CACHE_DIR, key)
+    tmp = f"{entry}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    meta = {k: v for k, v in analysis.items() if k not in _ARRAY_NAMES}
+    for name in _ARRAY_NAMES:
+        np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(analysis[name]))
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    shutil.rmtree(entry, ignore_errors=True)
+    try:
+        os.replace(tmp, entry)
+    except OSError:
+        # Tiến trình khác vừa ghi cùng khóa → dùng bản của nó
+        shutil.rmtree(tmp, ignore_errors=True)
+    evict_cache()
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def evict_cache(max_bytes=None):
+    """Xóa các mục ít dùng nhất (LRU) cho tới khi tổng dung lượng <= max_bytes."""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    if not os.path.isdir(CACHE_DIR):
+        return
+
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        entry = os.path.join(CACHE_DIR, name)
+        meta_path = os.path.join(entry, "meta.json")
+        if not os.path.exists(meta_path):
+            continue
+        entries.append((os.path.getmtime(meta_path), _dir_size(entry), entry))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
 
 
 # ================================
-# 🧍‍♀️ Trích xuất keypoints nhiều người
+# 🔁 Pipeline một lượt: giải mã 1 lần, suy luận 1 lần
 # ================================
-def extract_multi_person_keypoints(video_path, max_people=5):
+# Kết quả pose của một frame: keypoints (N, 17, 3), boxes (N, 4), scores (N,)
+FramePose = namedtuple("FramePose", ["keypoints", "boxes", "scores"])
+
+# ✅ Danh sách kết nối khớp (17 keypoints theo YOLOv8)
+# Mỗi tuple là cặp chỉ số hai điểm cần nối
+SKELETON_CONNECTIONS = [
+    (5, 7), (7, 9),    # tay phải
+    (6, 8), (8, 10),   # tay trái
+    (5, 6),            # vai nối nhau
+    (11, 12),          # hông nối nhau
+    (5, 11), (6, 12),  # thân
+    (11, 13), (13, 15),  # chân phải
+    (12, 14), (14, 16)   # chân trái
+]
+
+COLORS = [
+    (255, 0, 0), (0, 255, 0), (0, 0, 255),
+    (255, 255, 0), (255, 0, 255), (0, 255, 255)
+]
+
+
+class PoseSink:
     """
-    Trích xuất pose keypoints từ video có nhiều người múa.
-    Trả về danh sách mảng numpy [person_1, person_2, ...]
+    Điểm nhận kết quả của pipeline. Mỗi sink được gọi:
+      start(info) → on_frame(frame_idx, frame, pose) cho từng frame → finish()
+    `frame` là None khi pose đọc từ cache (không giải mã video).
+    `pose` là None ở các frame bị bỏ qua do target_fps (chỉ xảy ra khi có giải mã video).
+    Video khung xương dựng bằng render_utils (FFmpegWriter), không qua sink.
     """
-    cap = cv2.VideoCapture(video_path)
-    people_sequences = [[] for _ in range(max_people)]
 
-    while cap.isOpened():
+    def start(self, info):
+        pass
+
+    def on_frame(self, frame_idx, frame, pose):
+        pass
+
+    def finish(self):
+        return None
+
+
+class KeypointSink(PoseSink):
+    """Gom keypoints/box/độ tin cậy từng frame thành mảng đặc (frames, people, ...) đệm NaN."""
+
+    def start(self, info):
+        self.info = dict(info)
+        self.frames = []
+        self.frame_indices = []
+
+    def on_frame(self, frame_idx, frame, pose):
+        if pose is None:
+            return
+        self.frames.append(pose)
+        self.frame_indices.append(frame_idx)
+
+    def finish(self):
+        n_frames = len(self.frames)
+        counts = np.array([len(p.keypoints) for p in self.frames], dtype=np.int16)
+        n_people = int(counts.max()) if n_frames else 0
+
+        keypoints = np.full((n_frames, n_people, 17, 3), np.nan, dtype=np.float32)
+        boxes = np.full((n_frames, n_people, 4), np.nan, dtype=np.float32)
+        scores = np.full((n_frames, n_people), np.nan, dtype=np.float32)
+        for f, pose in enumerate(self.frames):
+            keypoints[f, :counts[f]] = pose.keypoints
+            boxes[f, :len(pose.boxes)] = pose.boxes
+            scores[f, :len(pose.scores)] = pose.scores
+
+        frame_indices = np.array(self.frame_indices, dtype=np.int32)
+        fps = self.info.get("fps") or 0.0
+        timestamps = (frame_indices / fps if fps > 0 else frame_indices).astype(np.float32)
+
+        analysis = dict(self.info)
+        analysis.update({
+            "keypoints": keypoints, "boxes": boxes, "scores": scores, "counts": counts,
+            "frame_indices": frame_indices, "timestamps": timestamps,
+            "n_frames": n_frames,
+        })
+        return analysis
+
+
+def _empty_pose():
+    return FramePose(np.zeros((0, 17, 3), dtype=np.float32),
+                     np.zeros((0, 4), dtype=np.float32),
+                     np.zeros((0,), dtype=np.float32))
+
+
+def _result_to_pose(result):
+    """Chuyển một kết quả YOLO thành FramePose (keypoints ở tọa độ ảnh gốc)."""
+    if result.keypoints is None:
+        return _empty_pose()
+
+    data = result.keypoints.data.cpu().numpy()  # (N, 17, 3)
+    if data.shape[-1] == 2:
+        data = np.concatenate([data, np.ones(data.shape[:-1] + (1,))], axis=-1)
+    pose = _empty_pose()._replace(keypoints=data[:MAX_DETECTIONS].astype(np.float32))
+    if result.boxes is not None:
+        pose = pose._replace(
+            boxes=result.boxes.xyxy.cpu().numpy()[:MAX_DETECTIONS].astype(np.float32),
+            scores=result.boxes.conf.cpu().numpy()[:MAX_DETECTIONS].astype(np.float32),
+        )
+    return pose
+
+
+def pose_model_name(backend=None):
+    """Tên model trong model_registry ứng với backend ("pose" = PyTorch)."""
+    backend = backend or DEFAULT_INFERENCE_SETTINGS["backend"]
+    return "pose" if backend == "torch" else f"pose-{backend}"
+
+
+def infer_batch(frames, imgsz=640, backend=None):
+    """
+    Chạy YOLO trên một lô frame trong 1 lần gọi model.
+    YOLO tự letterbox về `imgsz` và quy đổi keypoints/box về tọa độ ảnh gốc.
+    backend khác "torch" → chạy model đã xuất (ONNX Runtime / OpenVINO), hậu xử lý NumPy.
+    """
+    if not frames:
+        return []
+    name = pose_model_name(backend)
+    if name != "pose":
+        # Backend tự đo các bước preprocess / inference / postprocess
+        return get_model(name).infer(list(frames), imgsz)
+    model = get_model(name)
+    with profiling.stage("inference", len(frames)):
+        results = model(list(frames), imgsz=imgsz, verbose=False)
+    with profiling.stage("postprocess", len(frames)):
+        poses = [_result_to_pose(r) for r in results]
+    # Phòng trường hợp model trả thiếu kết quả
+    poses += [_empty_pose()] * (len(frames) - len(poses))
+    return poses
+
+
+def frame_stride(fps, target_fps):
+    """Bước nhảy frame để đạt target_fps (1 = phân tích mọi frame)."""
+    if not target_fps or not fps or target_fps >= fps:
+        return 1
+    return max(1, int(round(fps / target_fps)))
+
+
+def _cached_frame_pose(analysis, row):
+    """Lấy FramePose của một dòng (frame đã phân tích) trong kết quả đã lưu."""
+    if row is None or row >= analysis["n_frames"]:
+        return _empty_pose()
+    c = int(analysis["counts"][row])
+    return FramePose(np.asarray(analysis["keypoints"][row, :c]),
+                     np.asarray(analysis["boxes"][row, :c]),
+                     np.asarray(analysis["scores"][row, :c]))
+
+
+class MotionSampler:
+    """
+    Chọn frame cần suy luận theo chuyển động (lấy mẫu thích ứng):
+    chuyển động của một frame = độ chênh lệch tuyệt đối trung bình (thang 0–255) giữa ảnh xám
+    thu nhỏ (MOTION_WIDTH px) của nó và của frame ứng viên trước; cộng dồn từ lần suy luận gần nhất,
+    vượt `budget` hoặc đã bỏ qua `max_gap` frame ứng viên → suy luận. Frame đầu luôn được suy luận.
+    Chi phí ~0.05 ms/frame, nhỏ hơn nhiều so với một lần suy luận YOLO.
+    """
+
+    def __init__(self, budget, max_gap=6, width=MOTION_WIDTH):
+        self.budget = float(budget)
+        self.max_gap = max(1, int(max_gap))
+        self.width = width
+        self._prev = None
+        self._motion = 0.0
+        self._gap = 0
+
+    def _thumbnail(self, frame):
+        h, w = frame.shape[:2]
+        step = max(1, w // (self.width * 2))  # bỏ bớt điểm ảnh trước khi resize → rẻ với video 4K
+        small = frame[::step, ::step]
+        height = max(1, round(small.shape[0] * self.width / small.shape[1]))
+        small = cv2.resize(small, (self.width, height), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+
+    def __call__(self, frame):
+        """True nếu cần suy luận frame này."""
+        thumb = self._thumbnail(frame)
+        if self._prev is not None:
+            self._motion += float(cv2.absdiff(thumb, self._prev).mean())
+        self._prev = thumb
+        if self._gap and self._motion < self.budget and self._gap < self.max_gap:
+            self._gap += 1
+            return False
+        self._motion, self._gap = 0.0, 1
+        return True
+
+
+def iter_inferred_frames(cap, stride=1, settings=None, start=0, end=None):
+    """
+    Đọc frame từ `cap` (từ vị trí `start` tới trước `end`) và chạy YOLO theo lô.
+    Chỉ frame có chỉ số chia hết cho `stride` được suy luận, các frame khác nhận pose None.
+    Khi bật `motion_budget`, trong số đó chỉ frame được MotionSampler chọn (và frame ứng viên
+    cuối cùng, làm mốc nội suy) được suy luận.
+    Sinh ra (frame_idx, frame, pose) đúng thứ tự frame.
+    """
+    settings = resolve_inference_settings(settings)
+    if start:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    sampler = MotionSampler(settings["motion_budget"], settings["max_gap"]) if settings["motion_budget"] else None
+    # Lấy mẫu thích ứng giữ frame bỏ qua lâu hơn → giới hạn số frame chờ để không tốn RAM
+    max_pending = settings["batch_size"] * max(stride, 1) * 2
+
+    pending = []  # [frame_idx, frame, cần suy luận?] chờ đủ lô để suy luận
+    n_sampled = 0
+
+    def flush():
+        sampled = [(i, fr) for i, fr, keep in pending if keep]
+        batch = infer_batch([fr for _, fr in sampled], settings["imgsz"], settings["backend"]) if sampled else []
+        poses = dict(zip((i for i, _ in sampled), batch))
+        out = [(i, fr, poses.get(i)) for i, fr, _ in pending]
+        n_candidates = sum(1 for i, _, _ in pending if i % stride == 0)
+        profiling.count("frames_inferred", len(sampled))
+        profiling.count("frames_skipped", n_candidates - len(sampled))
+        pending.clear()
+        return out
+
+    frame_idx = start
+    while cap.isOpened() and (end is None or frame_idx < end):
+        t0 = time.perf_counter()
         ret, frame = cap.read()
         if not ret:
             break
+        profiling.record("decode", time.perf_counter() - t0, 1)
 
-        results = YOLO_MODEL(frame, verbose=False)
-        if len(results) == 0:
-            continue
+        keep = frame_idx % stride == 0 and (sampler is None or sampler(frame))
+        pending.append([frame_idx, frame, keep])
+        if keep:
+            n_sampled += 1
+        # Đủ một lô frame cần suy luận → chạy model rồi trả kết quả
+        if n_sampled == settings["batch_size"] or len(pending) >= max_pending:
+            yield from flush()
+            n_sampled = 0
+        frame_idx += 1
 
-        keypoints_all = results[0].keypoints
-        if keypoints_all is None:
-            continue
+    if sampler is not None:
+        # Frame ứng viên cuối luôn được suy luận → đoạn cuối được nội suy thay vì giữ nguyên
+        last = next((p for p in reversed(pending) if p[0] % stride == 0), None)
+        if last is not None:
+            last[2] = True
+    if pending:
+        yield from flush()
 
-        poses = keypoints_all.xy.cpu().numpy()  # (N, 17, 2)
-        n_people = min(len(poses), max_people)
 
-        for i in range(n_people):
-            coords = poses[i].flatten()
-            people_sequences[i].append(coords)
+def run_pose_pipeline(video_path, sinks=(), use_cache=True, settings=None):
+    """
+    Điểm vào duy nhất cho phân tích video:
+    - Giải mã video tối đa 1 lần và chạy YOLO tối đa 1 lần (bỏ qua nếu đã có cache).
+    - Suy luận theo lô `batch_size` frame, chỉ trên các frame cách nhau theo `target_fps`.
+    - Phát kết quả từng frame tới các sink (KeypointSink, metric khác...).
+    - Đã có cache → không giải mã video, sink nhận pose từ cache.
+    Trả về dict phân tích (xem analyze_video).
+    """
+    settings = resolve_inference_settings(settings)
+    key = keypoint_cache_key(video_path, settings) if use_cache else None
+    analysis = load_cached_analysis(key) if key else None
+
+    if analysis is not None:
+        info = {k: analysis[k] for k in ("fps", "width", "height", "stride")}
+        for s in sinks:
+            s.start(info)
+        for row, f in enumerate(analysis["frame_indices"]):
+            pose = _cached_frame_pose(analysis, row)
+            for s in sinks:
+                s.on_frame(int(f), None, pose)
+        for s in sinks:
+            s.finish()
+        return analysis
+
+    cap = cv2.VideoCapture(video_path)
+    fps = float(cap.get(cv2.CAP_PROP_FPS) or 0.0)
+    stride = frame_stride(fps, settings["target_fps"])
+    info = {"fps": fps, "width": int(cap.get(3)), "height": int(cap.get(4)), "stride": stride}
+
+    # Chưa có cache → gom keypoints để lưu lại
+    accumulator = KeypointSink()
+    active = list(sinks) + [accumulator]
+    for s in active:
+        s.start(info)
+
+    for frame_idx, frame, pose in iter_inferred_frames(cap, stride, settings):
+        for s in active:
+            s.on_frame(frame_idx, frame, pose)
 
     cap.release()
-    # chỉ trả về những người có dữ liệu
-    return [np.array(seq) for seq in people_sequences if len(seq) > 0]
+    for s in sinks:
+        s.finish()
+
+    analysis = accumulator.finish()
+    if key:
+        save_cached_analysis(key, analysis)
+    return analysis
+
+
+def analyze_video(video_path, use_cache=True, settings=None):
+    """
+    Phân tích pose của video đúng một lần, các lần sau đọc lại từ cache.
+    Trả về dict gồm (F = số frame được phân tích):
+      keypoints (F, P, 17, 3), boxes (F, P, 4), scores (F, P) – đệm NaN
+      counts (F,) – số người phát hiện ở mỗi frame
+      frame_indices (F,), timestamps (F,) – vị trí frame gốc và thời điểm (giây)
+      fps, width, height, stride, n_frames
+    """
+    return run_pose_pipeline(video_path, use_cache=use_cache, settings=settings)
+
+
+def iter_video_poses(video_path, use_cache=True, settings=None):
+    """
+    Sinh kết quả pose theo từng frame được phân tích, ngay trong lúc giải mã video:
+      (frame_idx, timestamp, FramePose, info)
+    info gồm fps, width, height, stride và total_frames (ước lượng) để báo tiến độ: total_frames đếm
+    mọi frame ứng viên (cách nhau `stride`), kể cả frame bị bỏ qua khi lấy mẫu thích ứng → tiến độ của
+    frame_idx là frame_idx // stride + 1.
+    Đã có cache → đọc từ cache, không giải mã. Chưa có → suy luận dần và lưu cache khi xong
+    (chỉ giữ keypoints, không giữ frame ảnh, nên bộ nhớ không phụ thuộc độ dài video).
+    """
+    settings = resolve_inference_settings(settings)
+    key = keypoint_cache_key(video_path, settings) if use_cache else None
+    analysis = load_cached_analysis(key) if key else None
+
+    if analysis is not None:
+        info = {k: analysis[k] for k in ("fps", "width", "height", "stride")}
+        # Frame ứng viên cuối luôn được phân tích → số frame ứng viên suy ra từ frame cuối
+        indices = analysis["frame_indices"]
+        info["total_frames"] = int(indices[-1]) // max(1, int(info["stride"])) + 1 if len(indices) else 0
+        for row, f in enumerate(analysis["frame_indices"]):
+            yield int(f), float(analysis["timestamps"][row]), _cached_frame_pose(analysis, row), info
+        return
+
+    cap = cv2.VideoCapture(video_path)
+    fps = float(cap.get(cv2.CAP_PROP_FPS) or 0.0)
+    stride = frame_stride(fps, settings["target_fps"])
+    info = {"fps": fps, "width": int(cap.get(3)), "height": int(cap.get(4)), "stride": stride}
+
+    accumulator = KeypointSink() if key else None
+    if accumulator:
+        accumulator.start(info)
+    info = dict(info, total_frames=-(-int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0) // stride))
+    try:
+        for frame_idx, _, pose in iter_inferred_frames(cap, stride, settings):
+            if pose is None:
+                continue
+            if accumulator:
+                accumulator.on_frame(frame_idx, None, pose)
+            yield frame_idx, (frame_idx / fps if fps > 0 else float(frame_idx)), pose, info
+    finally:
+        cap.release()
+
+    # Chỉ lưu cache khi đã đọc hết video (generator không bị dừng giữa chừng)
+    if accumulator:
+        save_cached_analysis(key, accumulator.finish())
 
 
 # ================================
-# 🧮 Trung bình khung xương nhóm
+# ⚡ Phân tích song song nhiều video (ProcessPoolExecutor)
 # ================================
-def average_group_pose(people_sequences):
-    """Tính trung bình khung xương của nhóm."""
-    if not people_sequences:
-        return np.zeros((1, 34))  # 17 điểm * 2 tọa độ
-    min_len = min(len(seq) for seq in people_sequences)
-    trimmed = [seq[:min_len] for seq in people_sequences]
-    return np.mean(trimmed, axis=0)
+# Số tiến trình và số luồng torch mỗi tiến trình (0 = tự chọn)
+DEFAULT_WORKERS = int(os.environ.get("DANCE_WORKERS", "0"))
+DEFAULT_TORCH_THREADS = int(os.environ.get("DANCE_TORCH_THREADS", "0"))
+
+
+def init_worker(torch_threads, preload=False, backend=None):
+    """
+    Khởi tạo tiến trình con: giới hạn số luồng suy luận của backend (torch / ONNX Runtime / OpenVINO);
+    preload → nạp + chạy thử model ngay. Chỉ import torch khi backend là torch.
+    """
+    cv2.setNumThreads(1)
+    backend = backend or DEFAULT_INFERENCE_SETTINGS["backend"]
+    if torch_threads and backend == "torch":
+        import torch
+        torch.set_num_threads(torch_threads)
+    elif torch_threads and backend != "fake":
+        from inference_backends import set_num_threads
+        set_num_threads(torch_threads)
+    if preload:
+        warm_up(pose_model_name(backend))
+
+
+def _pipeline_worker(video_path, sinks, settings):
+    """Chạy pipeline trong tiến trình con; kết quả nằm trong cache nên chỉ trả về khóa."""
+    run_pose_pipeline(video_path, sinks, settings=settings)
+    return keypoint_cache_key(video_path, settings)
+
+
+def run_pose_pipelines_parallel(jobs, workers=None, torch_threads=None, settings=None):
+    """
+    Chạy nhiều pipeline độc lập song song, mỗi job là (video_path, [sinks]).
+    - Mỗi tiến trình con tự nạp model đúng 1 lần, khi suy luận lần đầu (spawn, không fork trạng thái torch).
+    - workers / torch_threads mặc định chia đều số lõi CPU cho các job.
+    - Video đã có trong cache và không có sink nào → không cần gửi sang tiến trình con.
+    Trả về danh sách dict phân tích (memory-mapped từ cache) theo thứ tự jobs.
+    """
+    settings = resolve_inference_settings(settings)
+    jobs = [(path, list(sinks)) for path, sinks in jobs]
+    keys = [keypoint_cache_key(path, settings) for path, _ in jobs]
+    todo = [i for i, (path, sinks) in enumerate(jobs) if sinks or load_cached_analysis(keys[i]) is None]
+
+    n_cpu = os.cpu_count() or 1
+    workers = workers or DEFAULT_WORKERS or min(len(todo), n_cpu)
+    torch_threads = torch_threads or DEFAULT_TORCH_THREADS or max(1, n_cpu // max(workers, 1))
+
+    if len(todo) <= 1 or workers <= 1:
+        for i in todo:
+            run_pose_pipeline(jobs[i][0], jobs[i][1], settings=settings)
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                 initializer=init_worker, initargs=(torch_threads, False, settings["backend"])) as pool:
+            futures = [pool.submit(_pipeline_worker, jobs[i][0], jobs[i][1], settings) for i in todo]
+            for f in futures:
+                f.result()
+
+    return [load_cached_analysis(k) for k in keys]
+
+
+def analyze_videos_parallel(video_paths, workers=None, torch_threads=None, settings=None):
+    """Phân tích song song nhiều video (vd video mẫu + video người dùng)."""
+    return run_pose_pipelines_parallel([(p, []) for p in video_paths], workers, torch_threads, settings)
 
 
 # ================================
-# 🎥 Hiển thị skeleton + điểm từng người
+# 🧩 Giải mã song song một video dài theo đoạn frame
 # ================================
-def overlay_skeleton_with_scores(video_path, output_path="temp_overlay.mp4", scores=None):
+def video_frame_count(video_path):
+    """Số frame theo container (có thể lệch nhẹ so với số frame giải mã được)."""
+    cap = cv2.VideoCapture(video_path)
+    n = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    cap.release()
+    return n
+
+
+def chunk_frame_ranges(n_frames, n_chunks, stride=1):
     """
-    Hiển thị khung xương (pose skeleton) và điểm từng người trên video.
-    Hỗ trợ multi-person từ YOLOv8-Pose.
+    Chia [0, n_frames) thành n_chunks đoạn (start, end), biên đoạn là bội số của stride
+    để tập frame được phân tích giống hệt khi chạy tuần tự. Đoạn cuối có end = None
+    (đọc tới hết video, phòng khi số frame trong container không chính xác).
     """
-    cap = cv2.VideoCapture(video_path)
-    width, height = int(cap.get(3)), int(cap.get(4))
-    fps = int(cap.get(cv2.CAP_PROP_FPS))
-    out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
-
-    COLORS = [
-        (255, 0, 0), (0, 255, 0), (0, 0, 255),
-        (255, 255, 0), (255, 0, 255), (0, 255, 255)
-    ]
-
-    # ✅ Danh sách kết nối khớp (17 keypoints theo YOLOv8)
-    # Mỗi tuple là cặp chỉ số hai điểm cần nối
-    SKELETON_CONNECTIONS = [
-        (5, 7), (7, 9),    # tay phải
-        (6, 8), (8, 10),   # tay trái
-        (5, 6),            # vai nối nhau
-        (11, 12),          # hông nối nhau
-        (5, 11), (6, 12),  # thân
-        (11, 13), (13, 15),  # chân phải
-        (12, 14), (14, 16)   # chân trái
-    ]
-
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
+    n_chunks = max(1, min(n_chunks, n_frames // max(stride, 1) or 1))
+    bounds = [int(round(k * n_frames / n_chunks / stride)) * stride for k in range(n_chunks)]
+    ranges = [(bounds[k], bounds[k + 1]) for k in range(n_chunks - 1)]
+    ranges.append((bounds[-1], None))
+    return [(a, b) for a, b in ranges if b is None or b > a]
 
-        results = YOLO_MODEL(frame, verbose=False)
-        frame_vis = frame.copy()
 
-        if len(results) > 0 and results[0].keypoints is not None:
-            poses = results[0].keypoints.xy.cpu().numpy()  # (N, 17, 2)
-            for i, pts in enumerate(poses):
-                pts = pts.astype(int)
-                color = COLORS[i % len(COLORS)]
+def _chunk_worker(video_path, start, end, info, settings):
+    """Seek tới `start` (CAP_PROP_POS_FRAMES), phân tích tới `end`, trả về mảng keypoints của đoạn."""
+    cap = cv2.VideoCapture(video_path)
+    sink = KeypointSink()
+    sink.start(info)
+    for frame_idx, _, pose in iter_inferred_frames(cap, info["stride"], settings, start, end):
+        sink.on_frame(frame_idx, None, pose)
+    cap.release()
+    return sink.finish()
 
-                # Vẽ đường nối giữa các khớp (connections)
-                for a, b in SKELETON_CONNECTIONS:
-                    if a < len(pts) and b < len(pts):
-                        xa, ya = pts[a]
-                        xb, yb = pts[b]
-                        cv2.line(frame_vis, (xa, ya), (xb, yb), color, 2)
 
-                # Vẽ điểm khớp
-                for (x, y) in pts:
-                    cv2.circle(frame_vis, (x, y), 3, color, -1)
+def stitch_chunk_analyses(chunks, info):
+    """Nối kết quả các đoạn theo thứ tự frame, đệm NaN cho chiều số người."""
+    n_people = max((c["keypoints"].shape[1] for c in chunks), default=0)
 
-                # Tính trung tâm để hiển thị nhãn
-                x_mean, y_mean = np.mean(pts, axis=0).astype(int)
+    def pad(arr):
+        extra = n_people - arr.shape[1]
+        if extra == 0:
+            return arr
+        widths = [(0, 0), (0, extra)] + [(0, 0)] * (arr.ndim - 2)
+        return np.pad(arr, widths, constant_values=np.nan)
 
-                if scores and i < len(scores):
-                    label = f"P {i+1}: {scores[i]:.1f}"
-                else:
-                    label = f"P {i+1}"
+    analysis = dict(info)
+    for name in ("keypoints", "boxes", "scores"):
+        analysis[name] = np.concatenate([pad(c[name]) for c in chunks], axis=0)
+    for name in ("counts", "frame_indices", "timestamps"):
+        analysis[name] = np.concatenate([c[name] for c in chunks], axis=0)
+    analysis["n_frames"] = int(sum(c["n_frames"] for c in chunks))
+    return analysis
 
-                cv2.putText(frame_vis, label, (x_mean - 40, y_mean - 20),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2, cv2.LINE_AA)
 
-        out.write(frame_vis)
+def analyze_video_chunked(video_path, workers=None, torch_threads=None, use_cache=True,
+                          settings=None, n_chunks=None):
+    """
+    Phân tích một video dài bằng cách chia thành các đoạn frame và xử lý song song.
+    Kết quả giống hệt phân tích tuần tự (cùng khóa cache): mỗi frame được suy luận độc lập,
+    còn định danh người múa chỉ được gán sau khi nối các đoạn, trên toàn bộ chuỗi,
+    nên không có trạng thái nào bị cắt ngang ở biên đoạn.
+    Lấy mẫu thích ứng (motion_budget) phụ thuộc chuyển động cộng dồn từ đầu video → không chia
+    đoạn được mà vẫn giống hệt tuần tự, nên khi bật sẽ phân tích tuần tự.
+    """
+    settings = resolve_inference_settings(settings)
+    if settings["motion_budget"]:
+        return run_pose_pipeline(video_path, use_cache=use_cache, settings=settings)
+    key = keypoint_cache_key(video_path, settings) if use_cache else None
+    cached = load_cached_analysis(key) if key else None
+    if cached is not None:
+        return cached
 
+    cap = cv2.VideoCapture(video_path)
+    fps = float(cap.get(cv2.CAP_PROP_FPS) or 0.0)
+    info = {"fps": fps, "width": int(cap.get(3)), "height": int(cap.get(4)),
+            "stride": frame_stride(fps, settings["target_fps"])}
     cap.release()
-    out.release()
-    return output_path
 
+    n_cpu = os.cpu_count() or 1
+    workers = workers or DEFAULT_WORKERS or n_cpu
+    torch_threads = torch_threads or DEFAULT_TORCH_THREADS or max(1, n_cpu // workers)
+    ranges = chunk_frame_ranges(video_frame_count(video_path), n_chunks or workers, info["stride"])
+
+    if len(ranges) <= 1 or workers <= 1:
+        chunks = [_chunk_worker(video_path, a, b, info, settings) for a, b in ranges]
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                 initializer=init_worker, initargs=(torch_threads, False, settings["backend"])) as pool:
+            futures = [pool.submit(_chunk_worker, video_path, a, b, info, settings) for a, b in ranges]
+            chunks = [f.result() for f in futures]
+
+    analysis = stitch_chunk_analyses(chunks, info)
+    if key:
+        save_cached_analysis(key, analysis)
+    return analysis
+
+
+# ================================
+# 📦 PoseSequence: tensor pose theo frame dùng chung cho mọi module
+# ================================
+# Chỉ số khớp COCO/YOLOv8 dùng cho chuẩn hóa
+L_SHOULDER, R_SHOULDER, L_HIP, R_HIP = 5, 6, 11, 12
+# Ngưỡng tin cậy của một khớp – dùng chung cho theo dõi, chấm điểm và vẽ khung xương
+KPT_CONF_THRESHOLD = 0.3
+
+
+class PoseSequence:
+    """
+    Chuỗi pose nhiều người dạng mảng liền khối:
+      data (F, P, 17, 3) float32 – x, y, độ tin cậy (NaN khi vắng mặt)
+      valid (F, P) bool – người p có mặt ở frame f
+      timestamps (F,) float32 – thời điểm (giây) của từng frame
+      meta dict – fps, width, height, track_ids...
+    Cắt theo frame/người (`seq[a:b]`, `seq[:, p]`) trả về view, không sao chép dữ liệu.
+    """
+
+    def __init__(self, data, valid=None, timestamps=None, meta=None):
+        self.data = data if isinstance(data, np.memmap) else np.asarray(data, dtype=np.float32)
+        if self.data.ndim == 3:  # (F, 17, 3) → một người
+            self.data = self.data[:, None]
+        self.valid = (np.asarray(valid, dtype=bool) if valid is not None
+                      else ~np.isnan(self.data[..., 0, 0]))
+        self.timestamps = (np.asarray(timestamps, dtype=np.float32) if timestamps is not None
+                           else np.arange(len(self.data), dtype=np.float32))
+        self.meta = dict(meta or {})
+
+    # ---------- thông tin cơ bản ----------
+    def __len__(self):
+        return self.data.shape[0]
+
+    @property
+    def n_frames(self):
+        return self.data.shape[0]
+
+    @property
+    def n_people(self):
+        return self.data.shape[1]
+
+    @property
+    def xy(self):
+        return self.data[..., :2]
+
+    @property
+    def conf(self):
+        return self.data[..., 2]
+
+    def __repr__(self):
+        return f"PoseSequence(frames={self.n_frames}, people={self.n_people})"
+
+    # ---------- cắt lát không sao chép ----------
+    def __getitem__(self, key):
+        frames, people = (key if isinstance(key, tuple) else (key, slice(None)))
+        if isinstance(frames, (int, np.integer)):
+            frames = slice(frames, frames + 1)
+        if isinstance(people, (int, np.integer)):
+            people = slice(people, people + 1)
+        meta = dict(self.meta)
+        if len(meta.get("frame_indices", ())) == self.n_frames:
+            meta["frame_indices"] = list(np.asarray(meta["frame_indices"])[frames])
+        if "track_ids" in meta:
+            meta["track_ids"] = list(np.asarray(meta["track_ids"])[people])
+        return PoseSequence(self.data[frames, people], self.valid[frames, people],
+                            self.timestamps[frames], meta)
+
+    # ---------- lưu / đọc (memory-mapped) ----------
+    def save(self, path):
+        """Lưu vào thư mục `path` (data.npy, valid.npy, timestamps.npy, meta.json)."""
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "data.npy"), np.ascontiguousarray(self.data))
+        np.save(os.path.join(path, "valid.npy"), self.valid)
+        np.save(os.path.join(path, "timestamps.npy"), self.timestamps)
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(self.meta, f, default=lambda o: o.tolist() if hasattr(o, "tolist") else str(o))
+        return path
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Đọc PoseSequence đã lưu; mmap=True → dữ liệu chỉ nạp khi được truy cập."""
+        mode = "r" if mmap else None
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        return cls(np.load(os.path.join(path, "data.npy"), mmap_mode=mode),
+                   np.load(os.path.join(path, "valid.npy")),
+                   np.load(os.path.join(path, "timestamps.npy")), meta)
+
+    # ---------- biến đổi vector hóa ----------
+    def filled(self):
+        """Nội suy các frame vắng mặt của từng người; sau đó mọi frame đều hợp lệ."""
+        from tracking_utils import fill_gaps  # tracking_utils dùng hằng số của module này
+
+        data = np.empty(self.data.shape, dtype=np.float32)
+        for p in range(self.n_people):
+            data[:, p] = fill_gaps(self.data[:, p], self.valid[:, p])
+        valid = np.broadcast_to(self.valid.any(axis=0), self.valid.shape)
+        return PoseSequence(data, valid, self.timestamps, self.meta)
+
+    def interpolated(self, frame_indices):
+        """
+        Nội suy tuyến tính sang lưới frame `frame_indices` (vd mọi frame ứng viên khi lấy mẫu
+        thích ứng đã bỏ qua frame ít chuyển động). Cần meta["frame_indices"] của chuỗi hiện tại
+        (được giữ lại trong meta["source_frame_indices"]); người p hợp lệ ở frame mới khi hợp lệ
+        ở cả hai frame đã phân tích kề bên.
+        """
+        src = np.asarray(self.meta["frame_indices"], dtype=np.float64)
+        dst = np.asarray(frame_indices, dtype=np.float64)
+        hi = np.clip(np.searchsorted(src, dst), 0, len(src) - 1)
+        lo = np.where(src[hi] <= dst, hi, np.maximum(hi - 1, 0))
+        span = src[hi] - src[lo]
+        w = np.where(span > 0, (dst - src[lo]) / np.where(span > 0, span, 1), 0.0).astype(np.float32)
+
+        before, after = self.data[lo], self.data[hi]
+        wb = w[:, None, None, None]
+        data = np.where(wb > 0, before + wb * (after - before), before).astype(np.float32)
+        valid = self.valid[lo] & (self.valid[hi] | (w == 0)[:, None])
+        timestamps = np.interp(dst, src, np.asarray(self.timestamps, dtype=np.float64))
+        meta = dict(self.meta, frame_indices=dst.astype(int).tolist(), source_frame_indices=src.astype(int).tolist())
+        return PoseSequence(data, valid, timestamps, meta)
+
+    def normalized(self, center=True, scale=True, rotate=False):
+        """
+        Chuẩn hóa pose của mọi frame/người cùng lúc:
+        - center: gốc tọa độ tại trung điểm hông
+        - scale: chia cho chiều dài thân (trung điểm vai → trung điểm hông)
+        - rotate: xoay để trục thân hướng thẳng lên
+        Độ tin cậy được giữ nguyên.
+        """
+        xy = self.data[..., :2].astype(np.float32)
+        hip = (xy[..., L_HIP, :] + xy[..., R_HIP, :]) / 2
+        shoulder = (xy[..., L_SHOULDER, :] + xy[..., R_SHOULDER, :]) / 2
+        torso = shoulder - hip
+
+        if center:
+            xy = xy - hip[..., None, :]
+        if scale:
+            length = np.linalg.norm(torso, axis=-1)
+            xy = xy / np.where(length > 1e-6, length, np.nan)[..., None, None]
+        if rotate:
+            # Góc cần xoay để torso trùng hướng (0, -1) (trục y ảnh hướng xuống)
+            angle = -np.pi / 2 - np.arctan2(torso[..., 1], torso[..., 0])
+            c, s = np.cos(angle), np.sin(angle)
+            rot = np.stack([np.stack([c, -s], -1), np.stack([s, c], -1)], -2)  # (F, P, 2, 2)
+            xy = np.einsum("fpij,fpkj->fpki", rot, xy)
+
+        data = np.concatenate([xy, self.data[..., 2:3]], axis=-1).astype(np.float32)
+        return PoseSequence(data, self.valid, self.timestamps, self.meta)
+
+    def group_mean(self):
+        """Pose trung bình của các người có mặt ở từng frame (F, 17, 3)."""
+        weights = self.valid[..., None, None]
+        total = np.sum(np.where(weights, np.nan_to_num(self.data), 0), axis=1)
+        count = np.maximum(self.valid.sum(axis=1), 1)[:, None, None]
+        return total / count
+
+    def flat_xy(self, person):
+        """Chuỗi (F, 34) tọa độ x, y của một người (định dạng cũ của pipeline)."""
+        return self.data[:, person, :, :2].reshape(self.n_frames, -1)
+
+
+# ================================
+# 🧍‍♀️ Trích xuất keypoints nhiều người
+# ================================
+def extract_pose_sequence(video_path, max_people=MAX_PEOPLE, use_cache=True, settings=None):
+    """
+    PoseSequence của các người múa đã được theo dõi qua các frame (ID ổn định),
+    đệm NaN ở frame vắng mặt. meta gồm fps, width, height, frame_indices, track_ids, sampling.
+    Khi lấy mẫu thích ứng (`motion_budget`), frame bị bỏ qua được nội suy sau khi theo dõi
+    → chuỗi luôn phủ đủ lưới target_fps.
+    """
+    from tracking_utils import track_analysis
+
+    settings = resolve_inference_settings(settings)
+    analysis = analyze_video(video_path, use_cache=use_cache, settings=settings)
+    with profiling.stage("tracking", int(analysis["n_frames"])):
+        tracked = track_analysis(analysis, max_people=max_people)
+    meta = {k: analysis[k] for k in ("fps", "width", "height", "stride")}
+    meta["track_ids"] = [int(t) for t in tracked["track_ids"]]
+    meta["frame_indices"] = np.asarray(analysis["frame_indices"]).tolist()
+    meta["sampling"] = sampling_stats(analysis)
+    seq = PoseSequence(tracked["keypoints"], tracked["valid"], analysis["timestamps"], meta)
+    if settings["motion_budget"] and analysis["n_frames"] > 1:
+        with profiling.stage("interpolation", meta["sampling"]["candidates"]):
+            seq = seq.interpolated(sampling_grid(analysis))
+    return seq
+
+
+def sampling_grid(analysis):
+    """Mọi frame ứng viên (theo target_fps) giữa frame phân tích đầu và cuối."""
+    indices = analysis["frame_indices"]
+    if not len(indices):
+        return np.zeros(0, dtype=int)
+    return np.arange(int(indices[0]), int(indices[-1]) + 1, max(int(analysis["stride"]), 1))
+
+
+def sampling_stats(analysis):
+    """Số frame ứng viên / đã suy luận và tỉ lệ bị bỏ qua nhờ lấy mẫu thích ứng."""
+    candidates = len(sampling_grid(analysis))
+    inferred = int(analysis["n_frames"])
+    return {
+        "candidates": candidates,
+        "inferred": inferred,
+        "skipped_fraction": round(1 - inferred / candidates, 4) if candidates else 0.0,
+    }
+
+
+def extract_multi_person_keypoints(video_path, max_people=MAX_PEOPLE, use_cache=True, settings=None):
+    """
+    Trích xuất pose keypoints từ video có nhiều người múa.
+    Trả về danh sách mảng numpy [person_1, person_2, ...], mỗi người là một track
+    ổn định, cùng độ dài (số frame), frame vắng mặt được nội suy.
+    """
+    seq = extract_pose_sequence(video_path, max_people, use_cache, settings).filled()
+    # chỉ trả về những người có dữ liệu
+    return [seq.flat_xy(p) for p in range(seq.n_people)]
+
+
+# ================================
+# 🧮 Trung bình khung xương nhóm
+# ================================
+def average_group_pose(people_sequences):
+    """Tính trung bình khung xương của nhóm (nhận PoseSequence hoặc danh sách (F, 34))."""
+    if isinstance(people_sequences, PoseSequence):
+        if people_sequences.n_people == 0:
+            return np.zeros((1, 34))
+        with profiling.stage("group_pose", people_sequences.n_frames):
+            return people_sequences.group_mean()[..., :2].reshape(people_sequences.n_frames, -1)
+    if not people_sequences:
+        return np.zeros((1, 34))  # 17 điểm * 2 tọa độ
+    min_len = min(len(seq) for seq in people_sequences)
+    trimmed = [seq[:min_len] for seq in people_sequences]
+    return np.mean(trimmed, axis=0)
+
+
+# ================================
+# 🎥 Hiển thị skeleton + điểm từng người
+# ================================
+def overlay_skeleton_with_scores(video_path, output_path="temp_overlay.mp4", scores=None, settings=None,
+                                 scale=1.0, out_fps=None, max_people=MAX_PEOPLE, progress=None):
+    """
+    Hiển thị khung xương (pose skeleton) và điểm từng người trên video.
+    Dùng keypoints đã theo dõi trong cache (không chạy lại YOLO) và dựng bằng render_utils
+    (vẽ theo lô, H.264 qua ffmpeg nếu có). progress: xem render_utils.render_overlay.
+    """
+    from render_utils import render_overlay
+
+    pose_seq = extract_pose_sequence(video_path, max_people, settings=settings)
+    return render_overlay(video_path, pose_seq, output_path, scores, scale, out_fps, progress)
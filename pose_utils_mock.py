@@ -1,6 +1,10 @@
+import os
+import time
 import numpy as np
 import tempfile
 
+import profiling
+
 def extract_keypoints_from_video(video_path):
     # Trả dữ liệu giả để mô phỏng pose (33 điểm, 3 tọa độ)
     frames = []
@@ -13,3 +17,64 @@ def overlay_skeleton(video_path, output_path):
     tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
     tmp.write(b"")  # placeholder rỗng
     return video_path
+
+
+# ================================
+# 🤖 Model pose giả (chạy pipeline không cần suy luận)
+# ================================
+# Dùng qua backend "fake": DANCE_BACKEND=fake (app, job, chấm hàng loạt) hoặc
+# infer_batch(frames, backend="fake"). Keypoints tất định theo nội dung frame → cùng video
+# luôn cho cùng kết quả, đủ để đo giải mã / theo dõi / chấm điểm / dựng video mà không cần YOLO.
+FAKE_PEOPLE = int(os.environ.get("DANCE_FAKE_PEOPLE", "3"))
+FAKE_LATENCY_MS = float(os.environ.get("DANCE_FAKE_LATENCY_MS", "0"))   # giả lập thời gian suy luận mỗi frame
+
+# Tư thế đứng chuẩn (đơn vị: chiều dài thân, gốc tại trung điểm hông, y hướng xuống)
+_STANDING = np.array([
+    [0.0, -1.5], [-0.1, -1.6], [0.1, -1.6], [-0.2, -1.55], [0.2, -1.55],   # mũi, mắt, tai
+    [-0.4, -1.0], [0.4, -1.0], [-0.55, -0.5], [0.55, -0.5], [-0.6, 0.0], [0.6, 0.0],   # vai, khuỷu, cổ tay
+    [-0.25, 0.0], [0.25, 0.0], [-0.25, 0.8], [0.25, 0.8], [-0.25, 1.6], [0.25, 1.6],  # hông, gối, cổ chân
+], dtype=np.float32)
+
+
+class FakePoseModel:
+    """
+    Cùng giao diện với backend suy luận (infer(frames, imgsz) → list FramePose).
+    Mỗi frame sinh `n_people` người đứng cách đều theo chiều ngang; tay/chân vung theo một
+    "pha" tính từ checksum thưa của ảnh (rẻ, tất định). latency_ms > 0 → ngủ để giả lập model thật.
+    """
+
+    name = "fake"
+
+    def __init__(self, n_people=FAKE_PEOPLE, latency_ms=FAKE_LATENCY_MS):
+        self.n_people = n_people
+        self.latency_ms = latency_ms
+
+    def pose_for(self, frame):
+        from pose_utils import FramePose
+
+        h, w = frame.shape[:2]
+        n = self.n_people
+        phase = float(np.sum(frame[::32, ::32], dtype=np.int64) % 997) / 997 * 2 * np.pi
+        offsets = phase + np.arange(n, dtype=np.float32)[:, None] * 0.7                    # (N, 1)
+
+        body = np.repeat(_STANDING[None], n, axis=0)                                        # (N, 17, 2)
+        body[:, 9, 1] += 0.6 * np.sin(offsets[:, 0])          # cổ tay vung lên xuống
+        body[:, 10, 1] += 0.6 * np.cos(offsets[:, 0])
+        body[:, 7, 1] += 0.3 * np.sin(offsets[:, 0])
+        body[:, 15, 0] += 0.15 * np.sin(offsets[:, 0])        # bước chân
+
+        unit = h / 5.0
+        centers = np.stack([w * (np.arange(n) + 1) / (n + 1), np.full(n, h / 2)], axis=-1)  # (N, 2)
+        xy = body * unit + centers[:, None, :]
+        keypoints = np.concatenate([xy, np.full((n, 17, 1), 0.9, np.float32)], axis=-1).astype(np.float32)
+        boxes = np.concatenate([xy.min(axis=1), xy.max(axis=1)], axis=-1).astype(np.float32)
+        return FramePose(keypoints, boxes, np.full(n, 0.9, np.float32))
+
+    def infer(self, frames, imgsz=640):
+        with profiling.stage("inference", len(frames)):
+            if self.latency_ms:
+                time.sleep(self.latency_ms * len(frames) / 1000)
+            return [self.pose_for(f) for f in frames]
+
+    def __call__(self, frames, imgsz=640, verbose=False):
+        return self.infer(list(frames), imgsz)
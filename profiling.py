@@ -0,0 +1,184 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+import numpy as np
+
+# ================================
+# ⏱️ Đo thời gian từng bước của pipeline
+# ================================
+# Các module gọi record()/stage()/timed() tại từng bước (decode, inference, postprocess,
+# tracking, group_pose, alignment, scoring, overlay_*, feedback...). Chi phí mỗi lần ghi ~1 µs
+# nên luôn bật; tắt bằng DANCE_PROFILE=0. Mỗi tiến trình có bộ đếm riêng → job / chấm hàng loạt
+# gửi snapshot() về tiến trình chính (merge() để cộng dồn).
+ENABLED = os.environ.get("DANCE_PROFILE", "1") != "0"
+MAX_SAMPLES = 4096           # số mẫu độ trễ gần nhất giữ lại cho mỗi bước (tính phân vị)
+
+
+def peak_rss_mb():
+    """Bộ nhớ thường trú lớn nhất (MB) của tiến trình từ lúc khởi động; None nếu không đo được."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux trả KB, macOS trả byte
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class Profiler:
+    """
+    Bộ đếm thời gian theo bước (an toàn đa luồng):
+      record(stage, seconds, frames) – một lần chạy của bước, xử lý `frames` frame
+      count(name, n)                 – bộ đếm sự kiện (vd cache hit/miss)
+    Mỗi bước giữ: số lần gọi, tổng giây, tổng frame, mẫu độ trễ từng lần gọi và
+    bộ nhớ đỉnh của tiến trình đo được khi bước kết thúc.
+    """
+
+    def __init__(self, enabled=ENABLED, max_samples=MAX_SAMPLES):
+        self.enabled = enabled
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+            self._counters = {}
+            self._started = time.time()
+
+    def _stage(self, name):
+        s = self._stages.get(name)
+        if s is None:
+            s = self._stages[name] = {"calls": 0, "seconds": 0.0, "frames": 0, "peak_rss_mb": None,
+                                      "samples": deque(maxlen=self.max_samples)}
+        return s
+
+    def record(self, stage, seconds, frames=0):
+        if not self.enabled:
+            return
+        rss = peak_rss_mb()
+        with self._lock:
+            s = self._stage(stage)
+            s["calls"] += 1
+            s["seconds"] += seconds
+            s["frames"] += frames
+            s["samples"].append(seconds)
+            if rss is not None:
+                s["peak_rss_mb"] = max(s["peak_rss_mb"] or 0.0, rss)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    @contextmanager
+    def stage(self, name, frames=0):
+        """with stage("scoring"): ... – đo một khối lệnh."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, frames)
+
+    def timed(self, name):
+        """Decorator đo mỗi lần gọi hàm như một lần chạy của bước `name`."""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def snapshot(self, samples=False):
+        """
+        Tóm tắt (ghi được ra JSON). Với mỗi bước:
+          calls, seconds, frames, fps (frame / giây của riêng bước đó),
+          mean_ms / p50_ms / p95_ms / p99_ms / max_ms (độ trễ mỗi lần gọi), peak_rss_mb.
+        samples=True → kèm mẫu độ trễ thô (để merge giữa các tiến trình).
+        """
+        with self._lock:
+            stages = {name: dict(s, samples=np.array(s["samples"])) for name, s in self._stages.items()}
+            counters = dict(self._counters)
+        out = {}
+        for name, s in stages.items():
+            lat = s["samples"] * 1000
+            row = {
+                "calls": s["calls"],
+                "seconds": round(s["seconds"], 4),
+                "frames": s["frames"],
+                "fps": round(s["frames"] / s["seconds"], 1) if s["frames"] and s["seconds"] > 0 else None,
+                "mean_ms": round(s["seconds"] * 1000 / s["calls"], 3) if s["calls"] else None,
+            }
+            for q in (50, 95, 99):
+                row[f"p{q}_ms"] = round(float(np.percentile(lat, q)), 3) if len(lat) else None
+            row["max_ms"] = round(float(lat.max()), 3) if len(lat) else None
+            row["peak_rss_mb"] = round(s["peak_rss_mb"], 1) if s["peak_rss_mb"] is not None else None
+            if samples:
+                row["samples"] = s["samples"].tolist()
+            out[name] = row
+        rss = peak_rss_mb()
+        return {
+            "started": self._started,
+            "elapsed": round(time.time() - self._started, 3),
+            "stages": out,
+            "counters": counters,
+            "peak_rss_mb": round(rss, 1) if rss is not None else None,
+        }
+
+    def merge(self, snapshot):
+        """Cộng dồn snapshot của tiến trình khác (cần snapshot(samples=True) để giữ phân vị)."""
+        with self._lock:
+            for name, row in snapshot.get("stages", {}).items():
+                s = self._stage(name)
+                s["calls"] += row["calls"]
+                s["seconds"] += row["seconds"]
+                s["frames"] += row["frames"]
+                s["samples"].extend(row.get("samples") or [])
+                if row.get("peak_rss_mb") is not None:
+                    s["peak_rss_mb"] = max(s["peak_rss_mb"] or 0.0, row["peak_rss_mb"])
+            for name, n in snapshot.get("counters", {}).items():
+                self._counters[name] = self._counters.get(name, 0) + n
+
+    def export_json(self, path, samples=False):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(samples), f, ensure_ascii=False, indent=1)
+        return path
+
+
+# Bộ đếm dùng chung của tiến trình
+PROFILER = Profiler()
+record = PROFILER.record
+count = PROFILER.count
+stage = PROFILER.stage
+timed = PROFILER.timed
+snapshot = PROFILER.snapshot
+reset = PROFILER.reset
+merge = PROFILER.merge
+export_json = PROFILER.export_json
+
+
+def format_table(snap):
+    """Bảng văn bản các bước (sắp theo tổng thời gian giảm dần)."""
+    lines = [f"{'stage':<16}{'calls':>7}{'frames':>8}{'total s':>9}{'fps':>11}"
+             f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'RSS MB':>8}"]
+    rows = sorted(snap["stages"].items(), key=lambda kv: -kv[1]["seconds"])
+    for name, r in rows:
+        def fmt(v, spec):
+            return format(v, spec) if v is not None else "-"
+        lines.append(f"{name:<16}{r['calls']:>7}{r['frames']:>8}{r['seconds']:>9.3f}{fmt(r['fps'], '>11.1f'):>11}"
+                     f"{fmt(r['p50_ms'], '>9.2f'):>9}{fmt(r['p95_ms'], '>9.2f'):>9}{fmt(r['p99_ms'], '>9.2f'):>9}"
+                     f"{fmt(r['peak_rss_mb'], '>8.0f'):>8}")
+    if snap.get("counters"):
+        lines.append("counters: " + ", ".join(f"{k}={v}" for k, v in sorted(snap["counters"].items())))
+    return "\n".join(lines)
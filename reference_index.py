@@ -0,0 +1,324 @@
+"""
+Chỉ mục bài múa mẫu dựng sẵn (offline): mỗi video mẫu chỉ phân tích một lần.
+
+    python reference_index.py                 # tải (nếu thiếu) + dựng chỉ mục cho mọi bài múa mẫu
+    python reference_index.py mau1.mp4 mau2.mp4 --rebuild
+
+Mỗi bài mẫu được lưu trong INDEX_DIR/<tên file video>/ (video hướng dẫn: samples/tutorials/videos/<drive_id>.mp4):
+    sequence/        PoseSequence đã theo dõi + nội suy (data/valid/timestamps/meta)
+    normalized.npy   pose đã chuẩn hóa (tâm hông, chia chiều dài thân)  (F, P, 17, 3)
+    align_l<k>.npy   đặc trưng căn chỉnh (pose nhóm chuẩn hóa ~ALIGN_FPS) và các mức thô dần cho FastDTW
+    segments.npy     frame bắt đầu của từng đoạn SEGMENT_SECONDS giây
+    beats.npy        frame ranh giới nhịp (điểm chuyển động chậm nhất cục bộ)
+    search.npy       đặc trưng tìm kiếm thư viện (pose nhóm chuẩn hóa ~5 fps) + search_times.npy
+    stats.json       thống kê tóm tắt (kể cả thống kê từng khớp) + tham số dựng
+App đọc chỉ mục ở chế độ memory-map → phía mẫu của mỗi lần so sánh không tốn gì.
+"""
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+from scipy.ndimage import uniform_filter1d
+
+from pose_utils import (PoseSequence, extract_pose_sequence, file_sha256, KPT_CONF_THRESHOLD,
+                        resolve_inference_settings, cache_settings, CACHE_VERSION)
+from scoring_utils import JOINT_ANGLES, SEGMENT_SECONDS, normalized_group_pose, alignment_levels, joint_angles
+
+# ================================
+# ⚙️ Cấu hình chỉ mục
+# ================================
+INDEX_DIR = os.environ.get("DANCE_INDEX_DIR", "samples/reference_index")
+INDEX_VERSION = 2
+MAX_PEOPLE = 5
+MIN_BEAT_SECONDS = 0.25      # hai ranh giới nhịp cách nhau ít nhất bấy nhiêu giây
+
+# 🎥 Video mẫu trên Google Drive (dùng chung cho app và lệnh dựng chỉ mục)
+STANDARD_VIDEO_IDS = {
+    "Múa Xòe Tây Bắc": "1Zaj8tGnSgV1Ivtiuk-GImwYGIIu4lUdp",
+    "Múa Trống Cơm": "1K4hWlnZk9D_W2T3hQgMhZYcItpzdK8qW"
+}
+
+
+TUTORIAL_VIDEO_DIR = "samples/tutorials/videos"
+
+
+def standard_video_path(name):
+    """Đường dẫn cục bộ của video mẫu theo tên bài múa."""
+    return f"samples/standard/{name.replace(' ', '_')}.mp4"
+
+
+def tutorial_video_path(drive_id):
+    """Đường dẫn cục bộ của video hướng dẫn – theo drive_id vì tên có thể trùng tên bài mẫu."""
+    return os.path.join(TUTORIAL_VIDEO_DIR, f"{drive_id}.mp4")
+
+
+def download_reference(drive_id, save_path):
+    """Tải video mẫu từ Google Drive (bỏ qua nếu đã có)."""
+    if os.path.exists(save_path):
+        return save_path
+    import gdown
+
+    os.makedirs(os.path.dirname(save_path) or ".", exist_ok=True)
+    gdown.download(f"https://drive.google.com/uc?id={drive_id}", save_path, quiet=False)
+    return save_path
+
+
+def reference_sources():
+    """
+    (tên, drive_id, đường dẫn cục bộ) của mọi bài mẫu trong app và thư viện hướng dẫn.
+    Video hướng dẫn trùng drive_id với bài mẫu chỉ xuất hiện một lần (dùng file bài mẫu).
+    """
+    sources = {drive_id: (name, standard_video_path(name)) for name, drive_id in STANDARD_VIDEO_IDS.items()}
+    try:
+        from tutorial_gallery import tutorials
+        for t in tutorials:
+            sources.setdefault(t["drive_id"], (t["name"], tutorial_video_path(t["drive_id"])))
+    except ImportError:
+        pass
+    return [(name, drive_id, path) for drive_id, (name, path) in sources.items()]
+
+
+def index_settings(settings=None, max_people=MAX_PEOPLE):
+    """Tham số ảnh hưởng tới nội dung chỉ mục – khác tham số hiện tại → không dùng chỉ mục."""
+    return {
+        "index_version": INDEX_VERSION,
+        "cache_version": CACHE_VERSION,
+        "inference": cache_settings(resolve_inference_settings(settings)),
+        "max_people": max_people,
+    }
+
+
+# ================================
+# 🥁 Ranh giới đoạn / nhịp, thống kê từng khớp
+# ================================
+def segment_starts(timestamps, segment_seconds=SEGMENT_SECONDS):
+    """Frame đầu tiên của mỗi đoạn `segment_seconds` giây."""
+    bins = np.floor(np.asarray(timestamps) / segment_seconds).astype(np.int64)
+    return np.flatnonzero(np.diff(bins, prepend=-1)).astype(np.int64)
+
+
+def beat_boundaries(group, fps, min_beat_seconds=MIN_BEAT_SECONDS):
+    """
+    Ranh giới nhịp ước lượng từ năng lượng chuyển động của pose nhóm chuẩn hóa:
+    tốc độ (đã làm mượt ~0.2 giây) đạt cực tiểu cục bộ ≈ điểm dừng giữa hai động tác.
+    """
+    from scipy.signal import find_peaks
+
+    group = np.asarray(group, dtype=np.float32).reshape(len(group), -1)
+    if len(group) < 3:
+        return np.zeros(0, dtype=np.int64)
+    speed = np.linalg.norm(np.diff(group, axis=0), axis=1)
+    speed = uniform_filter1d(speed, size=max(1, int(round(0.2 * fps))))
+    peaks, _ = find_peaks(-speed, distance=max(1, int(round(min_beat_seconds * fps))))
+    return (peaks + 1).astype(np.int64)
+
+
+def joint_stats(seq, group):
+    """
+    Thống kê từng khớp của bài mẫu: tọa độ trung bình / độ lệch chuẩn của pose nhóm chuẩn hóa,
+    tỉ lệ frame khớp được nhìn thấy (độ tin cậy ≥ KPT_CONF_THRESHOLD) và góc khớp JOINT_ANGLES.
+    """
+    if not len(group):
+        return {}
+    xy = np.asarray(group[..., :2], dtype=np.float64)
+    seen = seq.valid[..., None] & (seq.data[..., 2] >= KPT_CONF_THRESHOLD)
+    angles = joint_angles(xy)
+
+    def rounded(x, nd=4):
+        return np.round(np.nan_to_num(x), nd).tolist()
+
+    return {
+        "joint_mean": rounded(np.nanmean(xy, axis=0)),
+        "joint_std": rounded(np.nanstd(xy, axis=0)),
+        "joint_visibility": rounded(seen.mean(axis=(0, 1)) if seq.n_people else np.zeros(17), 3),
+        "angle_mean": dict(zip(JOINT_ANGLES, rounded(np.nanmean(angles, axis=0), 2))),
+        "angle_std": dict(zip(JOINT_ANGLES, rounded(np.nanstd(angles, axis=0), 2))),
+    }
+
+
+# ================================
+# 🏗️ Dựng chỉ mục
+# ================================
+def _entry_name(video_path):
+    return os.path.splitext(os.path.basename(video_path))[0]
+
+
+def build_reference(video_path, name=None, max_people=MAX_PEOPLE, segment_seconds=SEGMENT_SECONDS,
+                    settings=None):
+    """
+    Phân tích một video mẫu và ghi mục chỉ mục (ghi vào thư mục tạm rồi đổi tên → an toàn).
+    Thư mục mục lấy theo tên file (duy nhất); `name` chỉ là tên hiển thị trong stats.json.
+    """
+    name = name or _entry_name(video_path)
+    seq = extract_pose_sequence(video_path, max_people, settings=settings).filled()
+    fps = float(seq.meta.get("fps") or 25.0) / max(1, int(seq.meta.get("stride") or 1))
+
+    entry = os.path.join(INDEX_DIR, _entry_name(video_path))
+    tmp = f"{entry}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    seq.save(os.path.join(tmp, "sequence"))
+    normalized = seq.normalized().data
+    np.save(os.path.join(tmp, "normalized.npy"), normalized)
+    # Cùng đặc trưng mà scoring_utils.align_sequences dựng cho phía mẫu → so sánh chỉ còn phía người dùng
+    group = normalized_group_pose(seq, normalized)
+    levels = alignment_levels(group, seq.timestamps)
+    for k, level in enumerate(levels):
+        np.save(os.path.join(tmp, f"align_l{k}.npy"), level)
+    segments = segment_starts(seq.timestamps, segment_seconds)
+    beats = beat_boundaries(group[..., :2], fps)
+    np.save(os.path.join(tmp, "segments.npy"), segments)
+    np.save(os.path.join(tmp, "beats.npy"), beats)
+    from library_search import search_features, SEARCH_FPS  # tránh import vòng (library_search dùng load_index)
+    search, search_times = search_features(seq, normalized)
+    np.save(os.path.join(tmp, "search.npy"), search)
+    np.save(os.path.join(tmp, "search_times.npy"), search_times)
+
+    stats = {
+        "name": name,
+        "video": os.path.abspath(video_path),
+        "sha256": file_sha256(video_path),
+        "settings": index_settings(settings, max_people),
+        "n_frames": int(seq.n_frames),
+        "n_people": int(seq.n_people),
+        "fps": fps,
+        "duration": float(seq.timestamps[-1]) if seq.n_frames else 0.0,
+        "search_fps": SEARCH_FPS,
+        "n_levels": len(levels),
+        "segment_seconds": segment_seconds,
+        "n_segments": int(len(segments)),
+        "n_beats": int(len(beats)),
+        **joint_stats(seq, group),
+    }
+    with open(os.path.join(tmp, "stats.json"), "w") as f:
+        json.dump(stats, f)
+
+    shutil.rmtree(entry, ignore_errors=True)
+    os.replace(tmp, entry)
+    return entry
+
+
+def build_index(video_paths, rebuild=False, names=None, **kwargs):
+    """
+    Dựng chỉ mục cho danh sách video mẫu, cập nhật manifest.json. Bỏ qua mục còn hợp lệ.
+    names: dict đường dẫn → tên hiển thị (mặc định tên file).
+    """
+    names = names or {}
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    manifest = _read_manifest()
+    built = []
+    for path in video_paths:
+        sha = file_sha256(path)
+        stats = _load_stats(manifest[sha]) if sha in manifest else None
+        wanted = index_settings(kwargs.get("settings"), kwargs.get("max_people", MAX_PEOPLE))
+        if not rebuild and stats is not None and stats["settings"] == wanted:
+            print(f"✅ {path}: đã có trong chỉ mục ({manifest[sha]})")
+            continue
+        print(f"🏗️ Đang dựng chỉ mục cho {path}...")
+        entry = build_reference(path, name=names.get(path), **kwargs)
+        manifest[sha] = os.path.basename(entry)
+        built.append(entry)
+
+    with open(os.path.join(INDEX_DIR, "manifest.json"), "w") as f:
+        json.dump({"version": INDEX_VERSION, "entries": manifest}, f, ensure_ascii=False, indent=1)
+    _loaded.clear()
+    return built
+
+
+# ================================
+# 📖 Đọc chỉ mục (memory-mapped, nạp một lần mỗi tiến trình)
+# ================================
+class ReferenceEntry:
+    """Một bài mẫu trong chỉ mục: sequence (PoseSequence), normalized, levels, segments, beats, search, stats."""
+
+    def __init__(self, path, stats):
+        self.path = path
+        self.stats = stats
+        self.sequence = PoseSequence.load(os.path.join(path, "sequence"), mmap=True)
+        self.normalized = np.load(os.path.join(path, "normalized.npy"), mmap_mode="r")
+        # levels[0]: đặc trưng căn chỉnh của cả bài, levels[1:]: mức thô cho FastDTW (xem scoring_utils.alignment_levels)
+        self.levels = [np.load(os.path.join(path, f"align_l{k}.npy"), mmap_mode="r")
+                       for k in range(stats["n_levels"])]
+        self.segments = np.load(os.path.join(path, "segments.npy"))
+        self.beats = np.load(os.path.join(path, "beats.npy"))
+        # Mục dựng trước khi có tìm kiếm thư viện không có search.npy → library_search tự tính lại
+        has_search = os.path.exists(os.path.join(path, "search.npy"))
+        self.search = np.load(os.path.join(path, "search.npy")) if has_search else None
+        self.search_times = np.load(os.path.join(path, "search_times.npy")) if has_search else None
+
+    def __repr__(self):
+        return f"ReferenceEntry({self.stats['name']!r}, frames={self.stats['n_frames']})"
+
+
+_loaded = {}
+
+
+def _read_manifest():
+    try:
+        with open(os.path.join(INDEX_DIR, "manifest.json")) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data.get("entries", {}) if data.get("version") == INDEX_VERSION else {}
+
+
+def _load_stats(entry_name):
+    try:
+        with open(os.path.join(INDEX_DIR, entry_name, "stats.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_index():
+    """Nạp mọi mục của chỉ mục (memory-mapped). Trả về dict sha256 → ReferenceEntry."""
+    if not _loaded:
+        for sha, entry_name in _read_manifest().items():
+            stats = _load_stats(entry_name)
+            if stats is None:
+                continue
+            try:
+                _loaded[sha] = ReferenceEntry(os.path.join(INDEX_DIR, entry_name), stats)
+            except (OSError, ValueError, KeyError):
+                continue
+    return _loaded
+
+
+def find_reference(video_path, max_people=MAX_PEOPLE, settings=None):
+    """Mục chỉ mục của video mẫu (theo nội dung) nếu khớp tham số hiện tại, ngược lại None."""
+    if not video_path or not os.path.exists(video_path):
+        return None
+    index = load_index()
+    if not index:
+        return None
+    entry = index.get(file_sha256(video_path))
+    if entry is None or entry.stats["settings"] != index_settings(settings, max_people):
+        return None
+    return entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("videos", nargs="*", help="Video mẫu (mặc định: mọi bài mẫu của app, tự tải nếu thiếu)")
+    parser.add_argument("--rebuild", action="store_true", help="Dựng lại cả các mục đã có")
+    parser.add_argument("--max-people", type=int, default=MAX_PEOPLE)
+    parser.add_argument("--segment-seconds", type=float, default=SEGMENT_SECONDS)
+    args = parser.parse_args()
+
+    videos, names = args.videos, {}
+    if not videos:
+        for name, drive_id, path in reference_sources():
+            try:
+                videos.append(download_reference(drive_id, path))
+                names[path] = name
+            except Exception as e:
+                print(f"⚠️ Không tải được {name}: {e}")
+
+    built = build_index(videos, rebuild=args.rebuild, names=names, max_people=args.max_people,
+                        segment_seconds=args.segment_seconds)
+    print(f"📚 Đã dựng {len(built)} mục, chỉ mục tại {INDEX_DIR}")
+
+
+if __name__ == "__main__":
+    main()
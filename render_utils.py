@@ -0,0 +1,266 @@
+import shutil
+import subprocess
+import time
+
+import cv2
+import numpy as np
+
+import profiling
+from pose_utils import SKELETON_CONNECTIONS, COLORS, KPT_CONF_THRESHOLD
+
+_LIMBS = np.array(SKELETON_CONNECTIONS, dtype=np.int64)  # (L, 2)
+
+
+# ================================
+# 🎞️ Ghi video: ffmpeg H.264 (faststart) hoặc cv2.VideoWriter dự phòng
+# ================================
+class FFmpegWriter:
+    """
+    Đẩy frame BGR thô qua stdin vào tiến trình ffmpeg cục bộ → H.264 yuv420p + faststart,
+    keyframe mỗi giây: phát được trực tiếp trên trình duyệt và nhỏ hơn nhiều so với mp4v.
+    """
+
+    def __init__(self, output_path, fps, size, crf=26, preset="veryfast"):
+        w, h = size
+        cmd = [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{w}x{h}", "-r", f"{fps:.3f}", "-i", "-",
+            "-c:v", "libx264", "-preset", preset, "-crf", str(crf),
+            # keyframe mỗi ~1 giây → trình duyệt tua nhanh, phát ngay từ phần đầu file
+            "-g", str(max(1, round(fps))), "-pix_fmt", "yuv420p", "-movflags", "+faststart", output_path,
+        ]
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+    def write(self, frame):
+        self.proc.stdin.write(np.ascontiguousarray(frame).tobytes())
+
+    def release(self):
+        self.proc.stdin.close()
+        if self.proc.wait() != 0:
+            raise RuntimeError("ffmpeg không mã hóa được video overlay")
+
+
+def open_video_writer(output_path, fps, size):
+    """Ưu tiên ffmpeg (H.264); không có ffmpeg → cv2.VideoWriter mp4v."""
+    if shutil.which("ffmpeg"):
+        return FFmpegWriter(output_path, fps, size)
+    return cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+
+
+def _even(x):
+    """yuv420p cần kích thước chẵn."""
+    return max(2, int(x) // 2 * 2)
+
+
+# ================================
+# 🦴 Vẽ khung xương theo lô
+# ================================
+def draw_pose_frame(frame, keypoints, labels=None, thickness=2):
+    """
+    Vẽ mọi người trong một frame: mỗi người 1 lệnh cv2.polylines cho toàn bộ xương
+    và 1 lệnh cho toàn bộ khớp (đoạn thẳng suy biến → chấm tròn). Vẽ trực tiếp lên `frame`.
+    keypoints (P, 17, 3) đã ở tọa độ frame; labels – danh sách nhãn (hoặc None) theo người.
+    """
+    kpts = np.asarray(keypoints, dtype=np.float32)
+    if kpts.size == 0:
+        return frame
+    ok = ~np.isnan(kpts[..., 0]) & (np.nan_to_num(kpts[..., 2]) >= KPT_CONF_THRESHOLD)  # (P, 17)
+    pts = np.nan_to_num(kpts[..., :2]).astype(np.int32)
+
+    limb_ok = ok[:, _LIMBS[:, 0]] & ok[:, _LIMBS[:, 1]]      # (P, L)
+    limb_pts = pts[:, _LIMBS]                                 # (P, L, 2, 2)
+
+    for p in range(len(kpts)):
+        if not ok[p].any():
+            continue
+        color = COLORS[p % len(COLORS)]
+        if limb_ok[p].any():
+            cv2.polylines(frame, list(limb_pts[p][limb_ok[p]]), False, color, thickness, cv2.LINE_AA)
+        joints = pts[p][ok[p]][:, None, :]
+        cv2.polylines(frame, list(joints), False, color, thickness * 3, cv2.LINE_AA)
+
+        if labels is not None and p < len(labels) and labels[p]:
+            x_mean, y_mean = pts[p][ok[p]].mean(axis=0).astype(int)
+            cv2.putText(frame, labels[p], (x_mean - 40, y_mean - 20),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2, cv2.LINE_AA)
+    return frame
+
+
+def _person_labels(n_people, scores=None):
+    labels = []
+    for p in range(n_people):
+        if scores is not None and p < len(scores) and scores[p] is not None and np.isfinite(scores[p]):
+            labels.append(f"P {p+1}: {scores[p]:.1f}")
+        else:
+            labels.append(f"P {p+1}")
+    return labels
+
+
+# ================================
+# 🎬 Dựng video overlay từ PoseSequence (không chạy lại model)
+# ================================
+def _iter_overlay_frames(video_path, pose_seq, scores=None, scale=1.0, out_fps=None, span=None):
+    """
+    Sinh (thời điểm, frame đã vẽ) ở độ phân giải `scale` và tốc độ `out_fps`.
+    Frame không có pose đã phân tích → giữ pose gần nhất.
+    span: (start_s, end_s) – chỉ dựng đoạn này của video (thời điểm tính từ start_s).
+    """
+    cap = cv2.VideoCapture(video_path)
+    src_fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    start = int(round(span[0] * src_fps)) if span else 0
+    end = int(np.ceil(span[1] * src_fps)) if span else None
+    if start:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    step = max(1, int(round(src_fps / out_fps))) if out_fps else 1
+    w, h = _even(cap.get(3) * scale), _even(cap.get(4) * scale)
+    sx, sy = w / max(cap.get(3), 1), h / max(cap.get(4), 1)
+
+    frame_indices = np.asarray(pose_seq.meta.get("frame_indices", np.arange(pose_seq.n_frames)))
+    labels = _person_labels(pose_seq.n_people, scores)
+    factor = np.array([sx, sy, 1.0], dtype=np.float32)
+
+    frame_idx = start
+    try:
+        while cap.isOpened() and (end is None or frame_idx < end):
+            # Frame không cần xuất → chỉ grab (bỏ qua bước chuyển màu/ sao chép ảnh)
+            t0 = time.perf_counter()
+            if not cap.grab():
+                break
+            if (frame_idx - start) % step == 0:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                if (w, h) != (frame.shape[1], frame.shape[0]):
+                    frame = cv2.resize(frame, (w, h), interpolation=cv2.INTER_AREA)
+                t1 = time.perf_counter()
+                profiling.record("overlay_decode", t1 - t0, 1)
+                row = np.searchsorted(frame_indices, frame_idx, side="right") - 1
+                if 0 <= row < pose_seq.n_frames:
+                    kpts = np.asarray(pose_seq.data[row]) * factor
+                    kpts[~pose_seq.valid[row]] = np.nan
+                    draw_pose_frame(frame, kpts, labels)
+                profiling.record("overlay_draw", time.perf_counter() - t1, 1)
+                yield (frame_idx - start) / src_fps, frame
+            frame_idx += 1
+    finally:
+        cap.release()
+
+
+def _video_info(video_path, scale, out_fps):
+    cap = cv2.VideoCapture(video_path)
+    src_fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    size = (_even(cap.get(3) * scale), _even(cap.get(4) * scale))
+    cap.release()
+    step = max(1, int(round(src_fps / out_fps))) if out_fps else 1
+    return src_fps / step, size
+
+
+def output_frame_count(video_path, out_fps=None):
+    """Số frame (ước lượng) của video dựng với `out_fps` – để báo tiến độ."""
+    cap = cv2.VideoCapture(video_path)
+    src_fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    n_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    cap.release()
+    step = max(1, int(round(src_fps / out_fps))) if out_fps else 1
+    return -(-n_frames // step)
+
+
+def side_by_side_frame_count(left_video, right_video, out_fps=15, left_span=None):
+    """Số frame (ước lượng) của video song song: theo video dài hơn (video trái chỉ tính đoạn left_span)."""
+    left = output_frame_count(left_video, out_fps)
+    if left_span:
+        left = min(left, int(np.ceil((left_span[1] - left_span[0]) * out_fps)))
+    return max(left, output_frame_count(right_video, out_fps))
+
+
+def fit_scale(video_path, max_height=None):
+    """Hệ số thu nhỏ để chiều cao video không vượt max_height (1.0 nếu không giới hạn)."""
+    if not max_height:
+        return 1.0
+    cap = cv2.VideoCapture(video_path)
+    h = cap.get(4) or max_height
+    cap.release()
+    return min(1.0, max_height / h)
+
+
+def render_overlay(video_path, pose_seq, output_path="temp_overlay.mp4", scores=None,
+                   scale=1.0, out_fps=None, progress=None):
+    """
+    Dựng video khung xương từ PoseSequence đã có (keypoints trong cache) ra H.264.
+    scale < 1 và out_fps thấp hơn nguồn → video nhẹ hơn, dựng nhanh hơn.
+    progress(done, total): gọi sau mỗi frame đã ghi; ném ngoại lệ để dừng giữa chừng (vd hủy job).
+    """
+    fps, size = _video_info(video_path, scale, out_fps)
+    total = output_frame_count(video_path, out_fps)
+    writer = open_video_writer(output_path, fps, size)
+    try:
+        for done, (_, frame) in enumerate(_iter_overlay_frames(video_path, pose_seq, scores, scale, out_fps), 1):
+            with profiling.stage("overlay_encode", 1):
+                writer.write(frame)
+            if progress is not None:
+                progress(done, max(total, done))
+    finally:
+        with profiling.stage("overlay_encode"):
+            writer.release()
+    return output_path
+
+
+def render_side_by_side(left_video, left_seq, right_video, right_seq, output_path="temp_side_by_side.mp4",
+                        left_scores=None, right_scores=None, height=360, out_fps=15, left_span=None,
+                        progress=None):
+    """
+    Dựng hai video (mẫu | người dùng) cạnh nhau theo cùng trục thời gian, cùng chiều cao `height`.
+    Video ngắn hơn hết trước → giữ frame cuối của nó.
+    left_span: (start_s, end_s) – chỉ dựng đoạn này của video trái (vd đoạn mẫu khớp với clip).
+    progress: như render_overlay, total = side_by_side_frame_count(...).
+    """
+    def scale_for(path):
+        cap = cv2.VideoCapture(path)
+        h = cap.get(4) or height
+        cap.release()
+        return height / h
+
+    s_left, s_right = scale_for(left_video), scale_for(right_video)
+    fps, size_l = _video_info(left_video, s_left, out_fps)
+    _, size_r = _video_info(right_video, s_right, out_fps)
+    h = min(size_l[1], size_r[1])
+    size = (size_l[0] + size_r[0], h)
+
+    cursors = [_FrameCursor(_iter_overlay_frames(left_video, left_seq, left_scores, s_left, out_fps, left_span),
+                            (h, size_l[0], 3)),
+               _FrameCursor(_iter_overlay_frames(right_video, right_seq, right_scores, s_right, out_fps),
+                            (h, size_r[0], 3))]
+
+    total = side_by_side_frame_count(left_video, right_video, out_fps, left_span)
+    writer = open_video_writer(output_path, fps, size)
+    try:
+        k = 0
+        while not all(c.done for c in cursors):
+            t = k / fps
+            frame = np.hstack([c.at(t)[:h] for c in cursors])
+            with profiling.stage("overlay_encode", 1):
+                writer.write(frame)
+            k += 1
+            if progress is not None:
+                progress(k, max(total, k))
+    finally:
+        with profiling.stage("overlay_encode"):
+            writer.release()
+    return output_path
+
+
+class _FrameCursor:
+    """Đọc một luồng (thời điểm, frame) theo trục thời gian chung; hết luồng → giữ frame cuối."""
+
+    def __init__(self, frames, shape):
+        self.frames = frames
+        self.current = np.zeros(shape, np.uint8)
+        self.pending = next(self.frames, None)
+        self.done = self.pending is None
+
+    def at(self, t):
+        while self.pending is not None and self.pending[0] <= t + 1e-6:
+            self.current = self.pending[1]
+            self.pending = next(self.frames, None)
+        self.done = self.pending is None
+        return self.current
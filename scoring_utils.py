@@ -0,0 +1,499 @@
+import numpy as np
+
+import profiling
+from pose_utils import PoseSequence, SKELETON_CONNECTIONS, KPT_CONF_THRESHOLD
+from tracking_utils import fill_gaps
+from dtw_utils import dtw_auto, align_indices, coarse_levels, OnlineDTW
+
+# ================================
+# ⚙️ Tham số chấm điểm
+# ================================
+# Góc khớp: (điểm đầu, đỉnh góc, điểm cuối) – cùng quy ước trái/phải với SKELETON_CONNECTIONS
+JOINT_ANGLES = {
+    "Khuỷu tay phải": (5, 7, 9),
+    "Khuỷu tay trái": (6, 8, 10),
+    "Vai phải": (11, 5, 7),
+    "Vai trái": (12, 6, 8),
+    "Hông phải": (5, 11, 13),
+    "Hông trái": (6, 12, 14),
+    "Gối phải": (11, 13, 15),
+    "Gối trái": (12, 14, 16),
+}
+LIMB_NAMES = [
+    "Cánh tay phải", "Cẳng tay phải", "Cánh tay trái", "Cẳng tay trái", "Vai", "Hông",
+    "Thân phải", "Thân trái", "Đùi phải", "Cẳng chân phải", "Đùi trái", "Cẳng chân trái",
+]
+
+ANGLE_TOLERANCE = 60.0       # sai số góc khớp trung bình (độ) ứng với 0 điểm
+LIMB_TOLERANCE = 60.0        # sai lệch hướng chi (độ) ứng với 0 điểm
+VELOCITY_TOLERANCE = 3.0     # chênh lệch vận tốc (chiều dài thân / giây) ứng với 0 điểm
+COMPONENT_WEIGHTS = {"angles": 0.4, "limbs": 0.4, "velocity": 0.2}
+SEGMENT_SECONDS = 2.0
+ALIGN_FPS = 10.0             # DTW căn chỉnh chạy trên chuỗi đã giảm về ~10 fps rồi nội suy lại
+SYNC_MAX_LAG_SECONDS = 1.0   # độ lệch pha tối đa được tìm giữa hai người
+SYNC_DISPERSION_TOLERANCE = 0.4   # độ phân tán vượt mẫu (chiều dài thân) ứng với mức phạt tối đa
+SYNC_MAX_PENALTY = 0.2       # hệ số đồng đều nhóm thấp nhất = 1 - SYNC_MAX_PENALTY
+ALIGN_MAX_FRAMES = 400       # ... và tối đa ~400 frame mỗi chuỗi (video dài → giảm mạnh hơn)
+
+_ANGLE_IDX = np.array(list(JOINT_ANGLES.values()), dtype=np.int64)   # (J, 3)
+_LIMB_IDX = np.array(SKELETON_CONNECTIONS, dtype=np.int64)            # (L, 2)
+
+
+# ================================
+# 📐 Đặc trưng pose chuẩn hóa (vector hóa trên toàn chuỗi)
+# ================================
+def normalized_group_pose(seq, normalized_data=None):
+    """
+    Pose trung bình nhóm (F, 17, 3) sau khi chuẩn hóa từng người (tâm hông, chia chiều dài thân)
+    → không phụ thuộc vị trí, kích thước người trong khung hình và vị trí camera.
+    normalized_data: tensor đã chuẩn hóa sẵn (vd từ chỉ mục bài mẫu) → bỏ qua bước chuẩn hóa.
+    """
+    with profiling.stage("group_pose", seq.n_frames):
+        data = seq.normalized().data if normalized_data is None else np.asarray(normalized_data)
+        ok = seq.valid & np.isfinite(data[..., :2]).all(axis=(-1, -2))
+        group = PoseSequence(data, ok, seq.timestamps).group_mean()
+        return fill_gaps(group, ok.any(axis=1))
+
+
+def joint_angles(pose):
+    """Góc (độ) tại các khớp JOINT_ANGLES cho mọi frame (và mọi người): (..., 17, ≥2) → (..., J)."""
+    a, b, c = (pose[..., _ANGLE_IDX[:, k], :2] for k in range(3))
+    v1, v2 = a - b, c - b
+    cross = v1[..., 0] * v2[..., 1] - v1[..., 1] * v2[..., 0]
+    dot = np.sum(v1 * v2, axis=-1)
+    return np.degrees(np.arctan2(np.abs(cross), dot))
+
+
+def limb_directions(pose):
+    """Vector đơn vị hướng của từng chi: (..., 17, ≥2) → (..., L, 2)."""
+    v = pose[..., _LIMB_IDX[:, 1], :2] - pose[..., _LIMB_IDX[:, 0], :2]
+    return v / np.maximum(np.linalg.norm(v, axis=-1, keepdims=True), 1e-6)
+
+
+def joint_velocity(pose, times):
+    """Vận tốc khớp theo thời gian thực (chiều dài thân / giây): (F, ..., 17, ≥2) → (F, ..., 17, 2)."""
+    if len(pose) < 2:
+        return np.zeros(pose.shape[:-1] + (2,), dtype=np.float32)
+    # Sai phân trung tâm theo frame chia cho bước thời gian tương ứng (giữ float32 cho mảng nhiều người)
+    dt = np.gradient(np.asarray(times, dtype=np.float64)).astype(np.float32)
+    dt = np.maximum(dt, 1e-6).reshape((-1,) + (1,) * (pose.ndim - 1))
+    return np.gradient(np.asarray(pose[..., :2], dtype=np.float32), axis=0) / dt
+
+
+def _decimation(times, target_fps, max_frames=ALIGN_MAX_FRAMES):
+    if len(times) < 2:
+        return 1
+    fps = 1.0 / max(float(np.median(np.diff(times))), 1e-6)
+    return max(1, int(round(fps / target_fps)), -(-len(times) // max_frames))
+
+
+def _block_mean(x, factor):
+    """Trung bình từng khối `factor` frame (khối cuối thiếu được đệm bằng frame cuối)."""
+    if factor == 1:
+        return x
+    pad = (-len(x)) % factor
+    x = np.concatenate([x, np.repeat(x[-1:], pad, axis=0)])
+    return x.reshape(-1, factor, x.shape[1]).mean(axis=1)
+
+
+def alignment_levels(pose, times, align_fps=ALIGN_FPS):
+    """
+    Chuỗi đặc trưng căn chỉnh [trung bình khối ~align_fps, /2, /4, ...] của một pose nhóm chuẩn hóa
+    – mức đầu là chuỗi DTW giải trên, các mức sau là mức thô cho FastDTW (tính sẵn cho bài mẫu).
+    """
+    features = _block_mean(pose[..., :2].reshape(len(pose), -1), _decimation(times, align_fps))
+    return [features] + coarse_levels(features)
+
+
+@profiling.timed("alignment")
+def align_sequences(std_pose, usr_pose, std_times, usr_times, align_fps=ALIGN_FPS, std_levels=None):
+    """
+    Đường căn chỉnh (i, j) với mỗi frame mẫu i một frame người dùng j (không giảm).
+    DTW được giải trên trung bình khối ~align_fps (ít ô hơn nhiều) rồi nội suy về độ phân giải gốc.
+    std_levels: alignment_levels của chuỗi mẫu đã tính sẵn (vd từ chỉ mục) → khỏi tính lại.
+    """
+    fs, fu = _decimation(std_times, align_fps), _decimation(usr_times, align_fps)
+    if std_levels is None:
+        std_levels = alignment_levels(std_pose, std_times, align_fps)
+    A = np.asarray(std_levels[0])
+    B = _block_mean(usr_pose[..., :2].reshape(len(usr_pose), -1), fu)
+    coarse_j = align_indices(dtw_auto(A, B, levels_a=std_levels[1:]).path, len(A)).astype(np.float64)
+
+    # Tâm khối k ở độ phân giải gốc: (k + 0.5) * f - 0.5
+    i = np.arange(len(std_pose))
+    cj = np.interp((i + 0.5) / fs - 0.5, np.arange(len(A)), coarse_j)
+    j = np.clip(np.round((cj + 0.5) * fu - 0.5), 0, len(usr_pose) - 1).astype(np.int64)
+    return np.stack([i, np.maximum.accumulate(j)], axis=1)
+
+
+def _error_to_score(error, tolerance):
+    return 100.0 * np.clip(1.0 - np.asarray(error, dtype=np.float64) / tolerance, 0.0, 1.0)
+
+
+def _masked_mean(values, mask, axis=None):
+    total = np.sum(np.where(mask, values, 0.0), axis=axis)
+    count = np.sum(mask, axis=axis)
+    return np.where(count > 0, total / np.maximum(count, 1), np.nan)
+
+
+# ================================
+# 🧮 Chấm điểm chi tiết theo khớp / chi / đoạn
+# ================================
+@profiling.timed("scoring")
+def score_sequences(std_pose, usr_pose, std_times, usr_times, segment_seconds=SEGMENT_SECONDS,
+                    path=None):
+    """
+    So sánh hai chuỗi pose nhóm đã chuẩn hóa (F, 17, 3) trong một lượt vector hóa dọc đường DTW:
+      - sai số góc từng khớp, sai lệch hướng từng chi
+      - chênh lệch vận tốc khớp và lệch thời gian (sớm/muộn) so với mẫu
+      - điểm từng đoạn `segment_seconds` giây của video mẫu
+    Trả về báo cáo dạng dict (ghi được ra JSON).
+    """
+    std_pose = np.asarray(std_pose, dtype=np.float32)
+    usr_pose = np.asarray(usr_pose, dtype=np.float32)
+    std_times = np.asarray(std_times, dtype=np.float64)
+    usr_times = np.asarray(usr_times, dtype=np.float64)
+    if path is None:
+        path = align_sequences(std_pose, usr_pose, std_times, usr_times)
+    i, j = path[:, 0], path[:, 1]
+
+    # Khớp/chi chỉ được tính khi đủ tin cậy ở cả hai phía
+    conf_ok = (std_pose[i, :, 2] >= KPT_CONF_THRESHOLD) & (usr_pose[j, :, 2] >= KPT_CONF_THRESHOLD)  # (L, 17)
+    angle_ok = conf_ok[:, _ANGLE_IDX].all(axis=-1)                                                    # (L, J)
+    limb_ok = conf_ok[:, _LIMB_IDX].all(axis=-1)                                                      # (L, C)
+
+    angle_err = np.abs(joint_angles(std_pose)[i] - joint_angles(usr_pose)[j])
+    dots = np.sum(limb_directions(std_pose)[i] * limb_directions(usr_pose)[j], axis=-1)
+    limb_err = np.degrees(np.arccos(np.clip(dots, -1.0, 1.0)))
+
+    # Vận tốc khớp theo thời gian thực (đơn vị: chiều dài thân / giây)
+    vel_err = np.linalg.norm(joint_velocity(std_pose, std_times)[i] - joint_velocity(usr_pose, usr_times)[j],
+                             axis=-1)
+    vel_err = _masked_mean(vel_err, conf_ok, axis=1)                                                  # (L,)
+
+    # Lệch thời gian: dương = người dùng muộn hơn mẫu (đã trừ độ lệch chung khi bắt đầu quay khác nhau)
+    offset = usr_times[j] - std_times[i]
+    global_offset = float(np.median(offset))
+    std_span = std_times[i[-1]] - std_times[i[0]]
+    tempo = float((usr_times[j[-1]] - usr_times[j[0]]) / std_span) if std_span > 0 else 1.0
+
+    # Tổng hợp theo khớp / chi
+    joint_error = _masked_mean(angle_err, angle_ok, axis=0)
+    limb_error = _masked_mean(limb_err, limb_ok, axis=0)
+    step_angle = _masked_mean(angle_err, angle_ok, axis=1)
+    step_limb = _masked_mean(limb_err, limb_ok, axis=1)
+
+    components = {
+        "angles": float(np.nan_to_num(_error_to_score(np.nanmean(step_angle), ANGLE_TOLERANCE))),
+        "limbs": float(np.nan_to_num(_error_to_score(np.nanmean(step_limb), LIMB_TOLERANCE))),
+        "velocity": float(np.nan_to_num(_error_to_score(np.nanmean(vel_err), VELOCITY_TOLERANCE))),
+    }
+    score = sum(COMPONENT_WEIGHTS[k] * v for k, v in components.items())
+
+    # Theo đoạn thời gian của video mẫu: gộp các bước trên đường DTW bằng bincount
+    seg = np.floor(std_times[i] / segment_seconds).astype(np.int64)
+    seg -= seg.min()
+    n_seg = int(seg.max()) + 1
+
+    def per_segment(values):
+        ok = np.isfinite(values)
+        sums = np.bincount(seg[ok], weights=values[ok], minlength=n_seg)
+        counts = np.bincount(seg[ok], minlength=n_seg)
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+    seg_angle, seg_limb, seg_vel = per_segment(step_angle), per_segment(step_limb), per_segment(vel_err)
+    seg_offset = per_segment(offset - global_offset)
+    seg_score = (COMPONENT_WEIGHTS["angles"] * np.nan_to_num(_error_to_score(seg_angle, ANGLE_TOLERANCE))
+                 + COMPONENT_WEIGHTS["limbs"] * np.nan_to_num(_error_to_score(seg_limb, LIMB_TOLERANCE))
+                 + COMPONENT_WEIGHTS["velocity"] * np.nan_to_num(_error_to_score(seg_vel, VELOCITY_TOLERANCE)))
+    start = float(np.floor(std_times[i].min() / segment_seconds) * segment_seconds)
+
+    def rounded(x, nd=1):
+        return None if not np.isfinite(x) else round(float(x), nd)
+
+    return {
+        "score": round(float(score), 1),
+        "components": {k: round(v, 1) for k, v in components.items()},
+        "joints": {name: {"error_deg": rounded(e), "score": rounded(_error_to_score(e, ANGLE_TOLERANCE))}
+                   for name, e in zip(JOINT_ANGLES, joint_error)},
+        "limbs": {name: {"error_deg": rounded(e), "score": rounded(_error_to_score(e, LIMB_TOLERANCE))}
+                  for name, e in zip(LIMB_NAMES, limb_error)},
+        "segments": [
+            {
+                "start": round(start + k * segment_seconds, 2),
+                "end": round(start + (k + 1) * segment_seconds, 2),
+                "score": round(float(seg_score[k]), 1),
+                "angle_error_deg": rounded(seg_angle[k]),
+                "limb_error_deg": rounded(seg_limb[k]),
+                "velocity_error": rounded(seg_vel[k], 3),
+                "timing_offset_s": rounded(seg_offset[k], 3),
+            }
+            for k in range(n_seg)
+        ],
+        "timing": {"offset_s": round(global_offset, 3), "tempo_ratio": round(tempo, 3)},
+        "path_length": int(len(path)),
+    }
+
+
+# ================================
+# 👥 Điểm từng người (vector hóa theo trục người)
+# ================================
+@profiling.timed("scoring_dancers")
+def score_dancers(std_pose, usr_people, std_times, usr_times, path, presence=None):
+    """
+    Điểm của từng người dùng so với pose nhóm của mẫu, dọc cùng đường căn chỉnh của nhóm.
+      std_pose:   (F_std, 17, 3) pose nhóm mẫu đã chuẩn hóa
+      usr_people: (F_usr, P, 17, 3) pose từng người đã chuẩn hóa
+      presence:   (F_usr, P) người thật sự được phát hiện (trước nội suy) → độ phủ
+    Mọi phép tính chạy trên mảng (bước × người × khớp) → lớp 30 người tốn gần như nhóm 5 người.
+    Trả về list dict theo thứ tự người trong chuỗi (P1, P2, ...).
+    """
+    usr_people = np.asarray(usr_people, dtype=np.float32)
+    std_times = np.asarray(std_times, dtype=np.float64)
+    usr_times = np.asarray(usr_times, dtype=np.float64)
+    n_people = usr_people.shape[1]
+    if presence is None:
+        presence = np.isfinite(usr_people[..., :2]).all(axis=(-1, -2))
+    i, j = path[:, 0], path[:, 1]
+
+    usr_j = usr_people[j]                                                                  # (L, P, 17, 3)
+    finite = np.isfinite(usr_j[..., :2]).all(axis=-1)
+    conf_ok = ((std_pose[i, None, :, 2] >= KPT_CONF_THRESHOLD) & (usr_j[..., 2] >= KPT_CONF_THRESHOLD)
+               & finite & presence[j][..., None])                                          # (L, P, 17)
+    angle_ok = conf_ok[..., _ANGLE_IDX].all(axis=-1)                                       # (L, P, J)
+    limb_ok = conf_ok[..., _LIMB_IDX].all(axis=-1)                                         # (L, P, C)
+
+    angle_err = np.abs(joint_angles(std_pose)[i, None] - joint_angles(usr_j))
+    dots = np.sum(limb_directions(std_pose)[i, None] * limb_directions(usr_j), axis=-1)
+    limb_err = np.degrees(np.arccos(np.clip(dots, -1.0, 1.0)))
+    vel_err = np.linalg.norm(joint_velocity(std_pose, std_times)[i, None]
+                             - joint_velocity(usr_people, usr_times)[j], axis=-1)
+    vel_ok = conf_ok & np.isfinite(vel_err)
+
+    errors = {
+        "angles": _masked_mean(angle_err, angle_ok, axis=(0, 2)),
+        "limbs": _masked_mean(limb_err, limb_ok, axis=(0, 2)),
+        "velocity": _masked_mean(vel_err, vel_ok, axis=(0, 2)),
+    }
+    tolerances = {"angles": ANGLE_TOLERANCE, "limbs": LIMB_TOLERANCE, "velocity": VELOCITY_TOLERANCE}
+    components = {k: _error_to_score(e, tolerances[k]) for k, e in errors.items()}              # (P,) mỗi mục
+    scored = np.isfinite(errors["angles"]) | np.isfinite(errors["limbs"])
+    score = sum(COMPONENT_WEIGHTS[k] * np.nan_to_num(v) for k, v in components.items())
+    coverage = presence.mean(axis=0) if len(presence) else np.zeros(n_people)
+
+    return [
+        {
+            "person": p + 1,
+            "score": round(float(score[p]), 1) if scored[p] else None,
+            "components": {k: (round(float(v[p]), 1) if np.isfinite(v[p]) else None)
+                           for k, v in components.items()},
+            "coverage": round(float(coverage[p]), 3),
+        }
+        for p in range(n_people)
+    ]
+
+
+# ================================
+# 🤝 Độ đồng bộ giữa các người trong nhóm
+# ================================
+def group_dispersion(people, presence=None):
+    """
+    Độ phân tán pose từng frame (F,): khoảng cách trung bình (chiều dài thân) từ từng khớp của
+    mỗi người tới pose trung bình nhóm. 0 = cả nhóm cùng một tư thế.
+    """
+    xy = np.asarray(people, dtype=np.float32)[..., :2]
+    ok = np.isfinite(xy).all(axis=-1) & (np.asarray(people)[..., 2] >= KPT_CONF_THRESHOLD)   # (F, P, 17)
+    if presence is not None:
+        ok &= presence[..., None]
+    xy = np.where(ok[..., None], xy, 0.0)
+    mean = xy.sum(axis=1) / np.maximum(ok.sum(axis=1), 1)[..., None]                           # (F, 17, 2)
+    dist = np.linalg.norm(xy - mean[:, None], axis=-1)                                          # (F, P, 17)
+    return _masked_mean(dist, ok, axis=(1, 2))
+
+
+def phase_lags(people, times, max_lag_seconds=SYNC_MAX_LAG_SECONDS, presence=None):
+    """
+    Độ lệch pha giữa mọi cặp người bằng tương quan chéo của tín hiệu tốc độ chuyển động.
+    Trả về (lag_s, corr) dạng (P, P): lag_s[p, q] > 0 → người p làm động tác muộn hơn người q.
+    Mỗi độ trễ là một phép nhân ma trận (P × F)·(F × P) cho mọi cặp cùng lúc.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    n_frames, n_people = np.asarray(people).shape[:2]
+    if n_frames < 3:
+        return np.zeros((n_people, n_people)), np.full((n_people, n_people), np.nan)
+
+    speed = np.linalg.norm(joint_velocity(np.asarray(people, dtype=np.float32), times), axis=-1)  # (F, P, 17)
+    ok = np.isfinite(speed)
+    if presence is not None:
+        ok &= presence[..., None]
+    signal = np.nan_to_num(_masked_mean(speed, ok, axis=2))                                     # (F, P)
+    signal = signal - signal.mean(axis=0)
+    norm = np.linalg.norm(signal, axis=0)
+    signal = signal / np.where(norm > 1e-9, norm, np.inf)
+
+    fps = 1.0 / max(float(np.median(np.diff(times))), 1e-6)
+    max_lag = min(int(round(max_lag_seconds * fps)), n_frames - 1)
+    lags = np.arange(-max_lag, max_lag + 1)
+    corr = np.empty((len(lags), n_people, n_people))
+    for n, k in enumerate(lags):
+        # corr[p, q] = Σ_t s_p(t + k) · s_q(t)
+        corr[n] = signal[k:].T @ signal[:n_frames - k] if k >= 0 else signal[:k].T @ signal[-k:]
+
+    best = np.argmax(corr, axis=0)
+    peak = np.take_along_axis(corr, best[None], axis=0)[0]
+    active = norm > 1e-9
+    peak[~(active[:, None] & active[None, :])] = np.nan
+    return lags[best] / fps, peak
+
+
+@profiling.timed("synchrony")
+def group_synchrony(people, times, presence=None, max_lag_seconds=SYNC_MAX_LAG_SECONDS):
+    """Tóm tắt độ đồng bộ nhóm: độ phân tán pose và lệch pha từng cặp / từng người."""
+    n_people = np.asarray(people).shape[1]
+    dispersion = group_dispersion(people, presence)
+    lag, corr = phase_lags(people, times, max_lag_seconds, presence)
+
+    pairs = np.triu(np.isfinite(corr), k=1)
+    others = np.isfinite(corr) & ~np.eye(n_people, dtype=bool)
+
+    def rounded(x, nd=3):
+        return None if not np.isfinite(x) else round(float(x), nd)
+
+    return {
+        "dispersion": rounded(np.nanmean(dispersion)) if np.isfinite(dispersion).any() else None,
+        "dispersion_p90": rounded(np.nanpercentile(dispersion, 90)) if np.isfinite(dispersion).any() else None,
+        "mean_abs_lag_s": rounded(np.abs(lag[pairs]).mean()) if pairs.any() else None,
+        "mean_correlation": rounded(corr[pairs].mean()) if pairs.any() else None,
+        "person_lag_s": [rounded(_masked_mean(lag[p], others[p])) for p in range(n_people)],
+        "pair_lag_s": [[rounded(v) if np.isfinite(c) else None for v, c in zip(row, crow)]
+                       for row, crow in zip(lag, corr)],
+        "pair_correlation": [[rounded(c) for c in row] for row in corr],
+    }
+
+
+def sync_factor(usr_dispersion, std_dispersion):
+    """Hệ số đồng đều nhóm (1 − SYNC_MAX_PENALTY … 1): phạt khi nhóm phân tán hơn nhóm mẫu."""
+    if usr_dispersion is None:
+        return 1.0
+    excess = max(0.0, usr_dispersion - (std_dispersion or 0.0)) / SYNC_DISPERSION_TOLERANCE
+    return 1.0 - SYNC_MAX_PENALTY * min(1.0, excess)
+
+
+def score_pose_sequences(std_seq, usr_seq, segment_seconds=SEGMENT_SECONDS, std_normalized=None,
+                         presence=None, std_levels=None):
+    """
+    Báo cáo chấm điểm giữa hai PoseSequence (đã theo dõi + nội suy), gồm cả
+    điểm từng người ("dancers") và độ đồng bộ nhóm người dùng ("synchrony").
+    presence: (F, P) người dùng thật sự được phát hiện (valid trước khi nội suy).
+    std_levels: alignment_levels của toàn bộ std_seq (vd ReferenceEntry.levels).
+    """
+    std_norm = std_seq.normalized().data if std_normalized is None else np.asarray(std_normalized)
+    usr_norm = usr_seq.normalized().data
+    std_pose = normalized_group_pose(std_seq, std_norm)
+    usr_pose = normalized_group_pose(usr_seq, usr_norm)
+    path = align_sequences(std_pose, usr_pose, std_seq.timestamps, usr_seq.timestamps, std_levels=std_levels)
+
+    report = score_sequences(std_pose, usr_pose, std_seq.timestamps, usr_seq.timestamps, segment_seconds, path)
+    report["dancers"] = score_dancers(std_pose, usr_norm, std_seq.timestamps, usr_seq.timestamps, path,
+                                      presence if presence is not None else usr_seq.valid)
+    report["synchrony"] = group_synchrony(usr_norm, usr_seq.timestamps, presence)
+    std_dispersion = group_dispersion(std_norm, std_seq.valid)
+    report["synchrony"]["reference_dispersion"] = (round(float(np.nanmean(std_dispersion)), 3)
+                                                   if np.isfinite(std_dispersion).any() else None)
+    return report
+
+
+# ================================
+# 📡 Chấm điểm trực tuyến (cùng đặc trưng + thang điểm với score_pose_sequences)
+# ================================
+def errors_to_score(angle_err, limb_err, vel_err):
+    """Điểm 0–100 từ sai số góc / hướng chi / vận tốc trung bình (cùng ngưỡng + trọng số score_sequences)."""
+    components = {
+        "angles": _error_to_score(angle_err, ANGLE_TOLERANCE),
+        "limbs": _error_to_score(limb_err, LIMB_TOLERANCE),
+        "velocity": _error_to_score(vel_err, VELOCITY_TOLERANCE),
+    }
+    return round(float(sum(COMPONENT_WEIGHTS[k] * np.nan_to_num(v) for k, v in components.items())), 1)
+
+
+def frame_group_pose(keypoints):
+    """Pose nhóm (17, 3) của một frame: chuẩn hóa từng người rồi lấy trung bình (như normalized_group_pose)."""
+    seq = PoseSequence(np.asarray(keypoints, dtype=np.float32)[None])
+    data = seq.normalized().data
+    ok = seq.valid & np.isfinite(data[..., :2]).all(axis=(-1, -2))
+    if not ok.any():
+        return None
+    return PoseSequence(data, ok).group_mean()[0]
+
+
+class StreamingScorer:
+    """
+    Chấm điểm dần từng frame người dùng so với chuỗi mẫu cố định (stream_compare_dance, luyện tập trực tiếp):
+    - đặc trưng: pose nhóm sau khi chuẩn hóa từng người (frame_group_pose / normalized_group_pose)
+    - căn chỉnh: OnlineDTW khoảng cách Euclid trên tọa độ chuẩn hóa (bộ nhớ O(độ dài mẫu))
+    - điểm: sai số góc khớp, hướng chi, vận tốc tại frame mẫu tương ứng → errors_to_score
+    → điểm tạm thời cùng thang với điểm tư thế ("pose_score") của báo cáo cuối.
+    """
+
+    def __init__(self, std_seq, std_normalized=None):
+        self.std_pose = normalized_group_pose(std_seq, std_normalized).astype(np.float32)
+        self.std_times = np.asarray(std_seq.timestamps, dtype=np.float64)
+        self.std_angles = joint_angles(self.std_pose)
+        self.std_limbs = limb_directions(self.std_pose)
+        # Vận tốc sai phân lùi (frame i − 1 → i) ở cả hai phía: phía người dùng chưa có frame sau
+        dt = np.maximum(np.diff(self.std_times), 1e-6)[:, None, None]
+        self.std_velocity = np.concatenate([np.full((1, 17, 2), np.nan, dtype=np.float32),
+                                            np.diff(self.std_pose[..., :2], axis=0) / dt]).astype(np.float32)
+        self.aligner = OnlineDTW(self.std_pose[..., :2].reshape(len(self.std_pose), -1), metric="euclidean")
+        self._prev = None                    # (pose, t) của frame trước → vận tốc người dùng
+        self._sums = np.zeros(3)
+        self._counts = np.zeros(3)
+
+    def update(self, keypoints, t):
+        """
+        Thêm một frame (keypoints (P, 17, 3) của các người được chấm, thời điểm t giây).
+        Trả về None nếu không chuẩn hóa được ai, ngược lại dict:
+          ref_index, ref_time – frame mẫu tương ứng
+          errors – (góc, chi, vận tốc) của frame này (NaN nếu không đủ tin cậy)
+          running_score – điểm tới thời điểm hiện tại
+        """
+        pose = frame_group_pose(keypoints)
+        if pose is None:
+            return None
+        i, _, _ = self.aligner.update(pose[:, :2].ravel())
+
+        conf_ok = (self.std_pose[i, :, 2] >= KPT_CONF_THRESHOLD) & (pose[:, 2] >= KPT_CONF_THRESHOLD)
+        angle_ok = conf_ok[_ANGLE_IDX].all(axis=-1)
+        limb_ok = conf_ok[_LIMB_IDX].all(axis=-1)
+        angle_err = np.abs(self.std_angles[i] - joint_angles(pose))
+        dots = np.sum(self.std_limbs[i] * limb_directions(pose), axis=-1)
+        limb_err = np.degrees(np.arccos(np.clip(dots, -1.0, 1.0)))
+        vel_err = np.nan
+        if self._prev is not None and t > self._prev[1]:
+            velocity = (pose[:, :2] - self._prev[0][:, :2]) / (t - self._prev[1])
+            vel_err = _masked_mean(np.linalg.norm(self.std_velocity[i] - velocity, axis=-1),
+                                   conf_ok & np.isfinite(self.std_velocity[i, :, 0]))
+        self._prev = (pose, t)
+
+        errors = np.array([_masked_mean(angle_err, angle_ok), _masked_mean(limb_err, limb_ok), vel_err],
+                          dtype=np.float64)
+        ok = np.isfinite(errors)
+        self._sums[ok] += errors[ok]
+        self._counts[ok] += 1
+        return {
+            "ref_index": i,
+            "ref_time": float(self.std_times[i]),
+            "errors": errors,
+            "running_score": self.score(),
+        }
+
+    def score(self):
+        """Điểm trung bình tới hiện tại (như score_sequences: sai số trung bình → điểm)."""
+        means = np.where(self._counts > 0, self._sums / np.maximum(self._counts, 1), np.nan)
+        return errors_to_score(*means)
+
+    @staticmethod
+    def window_score(errors):
+        """Điểm của một nhóm frame (đoạn / nhịp) từ danh sách `errors` trả về bởi update()."""
+        errors = np.asarray(errors, dtype=np.float64).reshape(-1, 3)
+        return errors_to_score(*_masked_mean(np.nan_to_num(errors), np.isfinite(errors), axis=0))
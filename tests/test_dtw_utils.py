@@ -0,0 +1,102 @@
+"""
+DTW vector hóa (dtw_utils) so với quy hoạch động ngây thơ trên ma trận (n+1)×(m+1).
+
+    python -m pytest tests/test_dtw_utils.py
+
+Bao cả hai cách tích lũy: _accumulate_columns (cửa sổ đơn điệu: đầy đủ, Sakoe-Chiba, Itakura)
+và _accumulate (cửa sổ không đơn điệu), cùng _WindowCost lưu chi phí chỉ trong cửa sổ.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import dtw_utils  # noqa: E402
+from dtw_utils import dtw, full_window, sakoe_chiba_window, itakura_window  # noqa: E402
+
+SIZES = [(1, 1), (1, 7), (7, 1), (13, 29), (40, 25), (60, 60)]
+
+
+def naive_dtw(A, B, lo, hi):
+    """Ma trận chi phí tích lũy đầy đủ (n+1)×(m+1), ô ngoài cửa sổ = inf; truy vết chéo → lên → trái."""
+    n, m = len(A), len(B)
+    cost = np.full((n + 1, m + 1), np.inf)
+    cost[0, 0] = 0.0
+    for i in range(n):
+        for j in range(lo[i], hi[i] + 1):
+            step = np.linalg.norm(A[i] - B[j])
+            cost[i + 1, j + 1] = step + min(cost[i, j], cost[i, j + 1], cost[i + 1, j])
+
+    distance = cost[n, m]
+    if not np.isfinite(distance):
+        return distance, np.zeros((0, 2), dtype=np.int64), cost
+    i, j = n, m
+    path = [(i - 1, j - 1)]
+    while i > 1 or j > 1:
+        steps = ((cost[i - 1, j - 1], i - 1, j - 1), (cost[i - 1, j], i - 1, j), (cost[i, j - 1], i, j - 1))
+        _, i, j = min(steps, key=lambda s: s[0])
+        path.append((i - 1, j - 1))
+    path.reverse()
+    return distance, np.array(path, dtype=np.int64), cost
+
+
+def _sequences(n, m, seed):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(n, 6)), rng.normal(size=(m, 6))
+
+
+def _check(result, A, B, lo, hi):
+    distance, path, _ = naive_dtw(A, B, lo, hi)
+    np.testing.assert_allclose(result.distance, distance, rtol=1e-5)
+    np.testing.assert_array_equal(result.path, path)
+
+
+@pytest.mark.parametrize("n, m", SIZES)
+def test_full_window(n, m):
+    A, B = _sequences(n, m, seed=n * 100 + m)
+    _check(dtw(A, B), A, B, *full_window(n, m))
+
+
+@pytest.mark.parametrize("n, m", SIZES)
+@pytest.mark.parametrize("band", [0, 2, 8])
+def test_sakoe_chiba(n, m, band):
+    A, B = _sequences(n, m, seed=n * 100 + m + band)
+    _check(dtw(A, B, band=band), A, B, *sakoe_chiba_window(n, m, band))
+
+
+@pytest.mark.parametrize("n, m", SIZES)
+@pytest.mark.parametrize("slope", [1.5, 2.0, 3.0])
+def test_itakura(n, m, slope):
+    A, B = _sequences(n, m, seed=n * 100 + m)
+    _check(dtw(A, B, itakura=slope), A, B, *itakura_window(n, m, slope))
+
+
+@pytest.mark.parametrize("n, m", [(13, 29), (40, 25), (60, 60)])
+@pytest.mark.parametrize("seed", range(3))
+def test_non_monotone_window(n, m, seed):
+    A, B = _sequences(n, m, seed)
+    rng = np.random.default_rng(seed)
+    lo, hi = sakoe_chiba_window(n, m, 2)
+    # Nới dải ở các hàng chẵn (thêm một lượng ngẫu nhiên) → cửa sổ không đơn điệu nhưng vẫn chứa dải
+    widen = rng.integers(0, 4, n) + 5 * (np.arange(n) % 2 == 0)
+    lo = np.clip(lo - widen, 0, m - 1)
+    hi = np.clip(hi + widen, 0, m - 1)
+    assert np.any(np.diff(lo) < 0) or np.any(np.diff(hi) < 0)
+    _check(dtw(A, B, window=(lo, hi)), A, B, lo, hi)
+
+
+@pytest.mark.parametrize("accumulate", [dtw_utils._accumulate, dtw_utils._accumulate_columns])
+@pytest.mark.parametrize("window", ["full", "band", "itakura"])
+def test_window_cost_matches_naive_matrix(accumulate, window):
+    n, m = 31, 23
+    A, B = _sequences(n, m, seed=7)
+    lo, hi = {"full": full_window(n, m), "band": sakoe_chiba_window(n, m, 3),
+              "itakura": itakura_window(n, m, 2.0)}[window]
+    cost = accumulate(A, B, lo, hi)
+    _, _, expected = naive_dtw(A, B, lo, hi)
+
+    got = np.array([[cost.get(i, j) for j in range(-1, m)] for i in range(-1, n)])
+    # Biên của _WindowCost chỉ có ô xuất phát (-1, -1); hàng/cột biên còn lại = inf như ma trận ngây thơ
+    np.testing.assert_allclose(got, expected, rtol=1e-5)
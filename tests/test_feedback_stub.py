@@ -0,0 +1,92 @@
+"""
+Phản hồi AI qua server giả lập (feedback_stub_server): cache, quá hạn → rule-based tạm thời, lỗi API.
+
+    python -m pytest tests/test_feedback_stub.py
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("dotenv")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ai_feedback_utils as ai  # noqa: E402
+from feedback_stub_server import start_stub_server  # noqa: E402
+
+
+def _poses(seed, n=60):
+    """Chuỗi pose (F, 34) ngẫu nhiên nhưng tất định."""
+    return np.random.default_rng(seed).uniform(100, 400, size=(n, 34)).astype(np.float32)
+
+
+@pytest.fixture
+def stub(monkeypatch, tmp_path):
+    """Trỏ client OpenAI tới server giả lập; trả về hàm start(delay, fail) → server."""
+    servers = []
+
+    def start(delay=0.0, fail=False):
+        server = start_stub_server(delay=delay, fail=fail)
+        servers.append(server)
+        monkeypatch.setenv("OPENAI_BASE_URL", f"{server.url}/v1")
+        monkeypatch.setattr(ai, "OPENAI_KEY", "stub")
+        monkeypatch.setattr(ai, "OPENAI_BASE_URL", f"{server.url}/v1")
+        monkeypatch.setattr(ai, "GEMINI_KEY", None)
+        monkeypatch.setattr(ai, "FEEDBACK_CACHE_DIR", str(tmp_path))
+        monkeypatch.setattr(ai, "_clients", {})
+        monkeypatch.setattr(ai, "_inflight", {})
+        return server
+
+    yield start
+    for server in servers:
+        server.release.set()
+        server.shutdown()
+
+
+def _rule_based(std, usr, score):
+    return ai._generate_rule_based_feedback(ai.feedback_metrics(std, usr, score))
+
+
+def test_cache_hit_sends_one_request(stub):
+    server = stub()
+    std, usr = _poses(0), _poses(1)
+
+    first = ai.generate_feedback(std, usr, 72.5, timeout=10, with_status=True)
+    second = ai.generate_feedback(std, usr, 72.5, timeout=10, with_status=True)
+
+    assert first == second
+    feedback, final = first
+    assert final and feedback[0].startswith("• (stub)")
+    assert len(server.requests) == 1
+
+
+def test_timeout_falls_back_then_caches_ai_answer(stub):
+    server = stub(delay=30)
+    std, usr = _poses(2), _poses(3)
+
+    feedback, final = ai.generate_feedback(std, usr, 55.0, timeout=0.2, with_status=True)
+    assert not final
+    assert feedback == _rule_based(std, usr, 55.0)
+
+    # Lời gọi vẫn chạy nền: cùng tóm tắt → cùng Future, trả lời xong thì được lưu cache
+    pending = ai.submit_remote_feedback("openai", ai.feedback_metrics(std, usr, 55.0))
+    server.release.set()
+    assert pending.result(timeout=10)
+
+    feedback, final = ai.generate_feedback(std, usr, 55.0, timeout=0.2, with_status=True)
+    assert final and feedback[0].startswith("• (stub)")
+    assert len(server.requests) == 1
+
+
+def test_api_error_falls_back_to_rule_based(stub):
+    server = stub(fail=True)
+    std, usr = _poses(4), _poses(5)
+
+    feedback, final = ai.generate_feedback(std, usr, 40.0, timeout=10, with_status=True)
+
+    assert final
+    assert feedback == _rule_based(std, usr, 40.0)
+    assert server.requests
+    assert not os.listdir(ai.FEEDBACK_CACHE_DIR)
@@ -0,0 +1,193 @@
+import numpy as np
+
+from pose_utils import KPT_CONF_THRESHOLD
+
+# ================================
+# ⚙️ Tham số theo dõi người múa
+# ================================
+IOU_WEIGHT = 0.5        # trọng số IoU trong chi phí ghép (phần còn lại: khoảng cách keypoints)
+MAX_MATCH_COST = 0.75   # chi phí lớn hơn ngưỡng này → không ghép, tạo track mới
+MAX_AGE = 30            # số frame được phép mất dấu trước khi xóa track
+VELOCITY_SMOOTHING = 0.6
+
+
+def boxes_from_keypoints(keypoints):
+    """Box (x1, y1, x2, y2) bao các keypoints đủ tin cậy, dùng khi YOLO không trả box."""
+    kpts = np.asarray(keypoints, dtype=np.float32)
+    if len(kpts) == 0:
+        return np.zeros((0, 4), dtype=np.float32)
+    valid = kpts[..., 2] >= KPT_CONF_THRESHOLD
+    xy = np.where(valid[..., None], kpts[..., :2], np.nan)
+    boxes = np.concatenate([np.nanmin(xy, axis=1), np.nanmax(xy, axis=1)], axis=1)
+    return np.nan_to_num(boxes).astype(np.float32)
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """IoU giữa mọi cặp box (A, 4) × (B, 4)."""
+    a = np.asarray(boxes_a, dtype=np.float32)[:, None, :]
+    b = np.asarray(boxes_b, dtype=np.float32)[None, :, :]
+    iw = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    ih = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = iw * ih
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-6)
+
+
+def keypoint_distance_matrix(kpts_a, kpts_b, boxes_a):
+    """
+    Khoảng cách keypoints trung bình giữa mọi cặp người, chuẩn hóa theo đường chéo box
+    của A và cắt về [0, 1]. Chỉ tính trên các khớp tin cậy ở cả hai phía.
+    """
+    a = np.asarray(kpts_a, dtype=np.float32)[:, None]
+    b = np.asarray(kpts_b, dtype=np.float32)[None, :]
+    valid = (a[..., 2] >= KPT_CONF_THRESHOLD) & (b[..., 2] >= KPT_CONF_THRESHOLD)
+    dist = np.linalg.norm(a[..., :2] - b[..., :2], axis=-1)
+    mean = np.sum(dist * valid, axis=-1) / np.maximum(valid.sum(axis=-1), 1)
+
+    boxes_a = np.asarray(boxes_a, dtype=np.float32)
+    diag = np.hypot(boxes_a[:, 2] - boxes_a[:, 0], boxes_a[:, 3] - boxes_a[:, 1])[:, None]
+    out = np.clip(mean / np.maximum(diag, 1.0), 0, 1)
+    # Không có khớp chung nào → coi như khác người
+    return np.where(valid.any(axis=-1), out, 1.0)
+
+
+# ================================
+# 🧭 Bộ theo dõi nhiều người (Hungarian + mô hình chuyển động)
+# ================================
+class PoseTracker:
+    """
+    Gán ID ổn định cho từng người múa qua các frame:
+    - Dự đoán vị trí mỗi track bằng vận tốc không đổi (đã làm mượt).
+    - Chi phí ghép = IOU_WEIGHT * (1 - IoU) + (1 - IOU_WEIGHT) * khoảng cách keypoints.
+    - Ghép tối ưu bằng thuật toán Hungarian; cặp vượt MAX_MATCH_COST bị loại.
+    ID được cấp tăng dần theo thứ tự xuất hiện lần đầu.
+    """
+
+    def __init__(self, max_age=MAX_AGE, max_cost=MAX_MATCH_COST, iou_weight=IOU_WEIGHT):
+        self.max_age = max_age
+        self.max_cost = max_cost
+        self.iou_weight = iou_weight
+        self.next_id = 0
+        self.ids = np.zeros((0,), dtype=np.int64)
+        self.boxes = np.zeros((0, 4), dtype=np.float32)
+        self.keypoints = np.zeros((0, 17, 3), dtype=np.float32)
+        self.velocity = np.zeros((0, 2), dtype=np.float32)
+        self.age = np.zeros((0,), dtype=np.int64)
+
+    def _predicted(self):
+        shift = self.velocity * (self.age[:, None] + 1)
+        boxes = self.boxes + np.concatenate([shift, shift], axis=1)
+        kpts = self.keypoints.copy()
+        kpts[..., :2] += shift[:, None, :]
+        return boxes, kpts
+
+    def update(self, keypoints, boxes=None):
+        """Nhận keypoints (N, 17, 3) và box (N, 4) của một frame, trả về ID track (N,)."""
+        keypoints = np.asarray(keypoints, dtype=np.float32).reshape(-1, 17, 3)
+        n = len(keypoints)
+        if boxes is None or len(boxes) != n or np.isnan(boxes).any():
+            boxes = boxes_from_keypoints(keypoints)
+        boxes = np.asarray(boxes, dtype=np.float32)
+
+        det_ids = np.full(n, -1, dtype=np.int64)
+        matched_tracks = np.zeros(len(self.ids), dtype=bool)
+
+        if n and len(self.ids):
+            # Import muộn: scipy.optimize nặng (~0.2 giây), chỉ cần khi thật sự theo dõi
+            from scipy.optimize import linear_sum_assignment
+
+            pred_boxes, pred_kpts = self._predicted()
+            cost = (self.iou_weight * (1 - iou_matrix(pred_boxes, boxes))
+                    + (1 - self.iou_weight) * keypoint_distance_matrix(pred_kpts, keypoints, pred_boxes))
+            rows, cols = linear_sum_assignment(cost)
+            ok = cost[rows, cols] <= self.max_cost
+            rows, cols = rows[ok], cols[ok]
+
+            # Cập nhật vận tốc (tâm box) rồi trạng thái của các track được ghép
+            old_c = (self.boxes[rows, :2] + self.boxes[rows, 2:]) / 2
+            new_c = (boxes[cols, :2] + boxes[cols, 2:]) / 2
+            step = (new_c - old_c) / (self.age[rows, None] + 1)
+            self.velocity[rows] = VELOCITY_SMOOTHING * self.velocity[rows] + (1 - VELOCITY_SMOOTHING) * step
+            self.boxes[rows] = boxes[cols]
+            self.keypoints[rows] = keypoints[cols]
+            self.age[rows] = 0
+            matched_tracks[rows] = True
+            det_ids[cols] = self.ids[rows]
+
+        # Track không được ghép: tăng tuổi, xóa nếu mất dấu quá lâu
+        self.age[~matched_tracks] += 1
+        keep = self.age <= self.max_age
+        self.ids, self.boxes, self.keypoints = self.ids[keep], self.boxes[keep], self.keypoints[keep]
+        self.velocity, self.age = self.velocity[keep], self.age[keep]
+
+        # Người mới xuất hiện → tạo track mới
+        new = np.flatnonzero(det_ids < 0)
+        if len(new):
+            new_ids = np.arange(self.next_id, self.next_id + len(new))
+            self.next_id += len(new)
+            det_ids[new] = new_ids
+            self.ids = np.concatenate([self.ids, new_ids])
+            self.boxes = np.concatenate([self.boxes, boxes[new]])
+            self.keypoints = np.concatenate([self.keypoints, keypoints[new]])
+            self.velocity = np.concatenate([self.velocity, np.zeros((len(new), 2), dtype=np.float32)])
+            self.age = np.concatenate([self.age, np.zeros(len(new), dtype=np.int64)])
+        return det_ids
+
+
+def track_analysis(analysis, max_people=None, min_coverage=0.2):
+    """
+    Chạy PoseTracker trên toàn bộ kết quả phân tích (xem pose_utils.analyze_video).
+    Giữ tối đa `max_people` track dài nhất (phủ >= min_coverage số frame, nếu có),
+    sắp theo ID (thứ tự xuất hiện). Trả về dict:
+      keypoints (F, P, 17, 3) – đệm NaN ở frame vắng mặt
+      boxes (F, P, 4), valid (F, P), track_ids (P,)
+    """
+    keypoints, boxes, counts = analysis["keypoints"], analysis["boxes"], analysis["counts"]
+    n_frames = len(counts)
+    tracker = PoseTracker()
+
+    rows = []  # (frame, track_id, detection index)
+    for f in range(n_frames):
+        c = int(counts[f])
+        if c == 0:
+            tracker.update(np.zeros((0, 17, 3)))
+            continue
+        ids = tracker.update(np.asarray(keypoints[f, :c]), np.asarray(boxes[f, :c]))
+        rows.extend((f, tid, k) for k, tid in enumerate(ids))
+
+    rows = np.array(rows, dtype=np.int64).reshape(-1, 3)
+    all_ids, lengths = np.unique(rows[:, 1], return_counts=True)
+    order = np.argsort(-lengths, kind="stable")
+    long_enough = lengths[order] >= min_coverage * n_frames
+    chosen = all_ids[order][long_enough] if long_enough.any() else all_ids[order][:1]
+    chosen = np.sort(chosen[:max_people] if max_people else chosen)
+
+    slot = {tid: p for p, tid in enumerate(chosen)}
+    out_kpts = np.full((n_frames, len(chosen), 17, 3), np.nan, dtype=np.float32)
+    out_boxes = np.full((n_frames, len(chosen), 4), np.nan, dtype=np.float32)
+    for f, tid, k in rows:
+        p = slot.get(tid)
+        if p is not None:
+            out_kpts[f, p] = keypoints[f, k]
+            out_boxes[f, p] = boxes[f, k]
+
+    return {
+        "keypoints": out_kpts,
+        "boxes": out_boxes,
+        "valid": ~np.isnan(out_kpts[..., 0, 0]),
+        "track_ids": chosen,
+    }
+
+
+def fill_gaps(sequence, valid):
+    """Nội suy tuyến tính các frame vắng mặt (F, ...) theo trục thời gian; hai đầu giữ giá trị gần nhất."""
+    seq = np.array(sequence, dtype=np.float32)
+    valid = np.asarray(valid, dtype=bool)
+    if valid.all() or not valid.any():
+        return seq
+    t = np.arange(len(seq))
+    flat = seq.reshape(len(seq), -1)
+    for c in range(flat.shape[1]):
+        flat[~valid, c] = np.interp(t[~valid], t[valid], flat[valid, c])
+    return flat.reshape(seq.shape)
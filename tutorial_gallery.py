@@ -1,6 +1,7 @@
 import streamlit as st
 import os
-import base64
+
+from media_assets import thumbnail_data_uri
 
 # =============================
 # 📚 DỮ LIỆU CÁC BÀI MÚA
@@ -35,15 +36,19 @@ tutorials = [
 # =============================
 # 🖼️ Hàm load ảnh thumb an toàn
 # =============================
+@st.cache_data(show_spinner=False)
+def _thumbnail_uri(path, mtime_ns):
+    """Thumbnail thu nhỏ (media_assets) dạng data URI, ghi nhớ giữa các lần rerun / phiên."""
+    return thumbnail_data_uri(path)
+
+
 def load_thumbnail(path):
     if os.path.exists(path):
-        with open(path, "rb") as f:
-            data = f.read()
-        ext = path.split(".")[-1]
-        b64 = base64.b64encode(data).decode()
-        return f"data:image/{ext};base64,{b64}"
-    else:
-        return "https://placehold.co/400x300?text=No+Image"
+        try:
+            return _thumbnail_uri(path, os.stat(path).st_mtime_ns)
+        except ValueError as e:
+            print(f"⚠️ {e}")
+    return "https://placehold.co/400x300?text=No+Image"
 
 # =============================
 # 🎨 GIAO DIỆN HIỂN THỊ
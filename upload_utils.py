@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import subprocess
+
+import cv2
+
+from pose_utils import remember_file_sha256
+
+# ================================
+# ⚙️ Cấu hình nhận video tải lên
+# ================================
+UPLOAD_DIR = os.environ.get("DANCE_UPLOAD_DIR", "samples/user_uploads")
+UPLOAD_MAX_BYTES = int(os.environ.get("DANCE_UPLOAD_MAX_MB", "4096")) * 1024 * 1024   # hạn mức cả thư mục
+MAX_FILE_BYTES = int(os.environ.get("DANCE_MAX_FILE_MB", "1024")) * 1024 * 1024       # giới hạn một file
+MAX_DURATION_SECONDS = float(os.environ.get("DANCE_MAX_VIDEO_SECONDS", "600"))
+MAX_PIXELS = 3840 * 2160
+CHUNK_SIZE = 8 * 1024 * 1024       # chép từng khối 8 MB → RAM không phụ thuộc kích thước file
+ALLOWED_EXTENSIONS = (".mp4", ".mov", ".m4v", ".avi", ".mkv", ".webm")
+
+
+class UploadRejected(ValueError):
+    """Video tải lên không hợp lệ (quá dài, quá lớn, không đọc được...)."""
+
+
+# ================================
+# 🔎 Đọc thông tin container (trước mọi bước suy luận)
+# ================================
+def _probe_ffprobe(path):
+    cmd = ["ffprobe", "-v", "error", "-select_streams", "v:0",
+           "-show_entries", "stream=codec_name,width,height,avg_frame_rate,nb_frames:format=duration",
+           "-of", "json", path]
+    out = subprocess.run(cmd, capture_output=True, timeout=30)
+    if out.returncode != 0:
+        return None
+    info = json.loads(out.stdout or b"{}")
+    streams = info.get("streams") or []
+    if not streams:
+        return None
+    stream = streams[0]
+    num, _, den = str(stream.get("avg_frame_rate", "0/1")).partition("/")
+    fps = float(num) / float(den or 1) if float(den or 1) else 0.0
+    duration = float((info.get("format") or {}).get("duration") or 0.0)
+    frames = int(stream.get("nb_frames") or round(duration * fps))
+    return {
+        "codec": stream.get("codec_name"),
+        "width": int(stream.get("width") or 0),
+        "height": int(stream.get("height") or 0),
+        "fps": fps,
+        "frames": frames,
+        "duration": duration,
+    }
+
+
+def _probe_cv2(path):
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            return None
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        fourcc = int(cap.get(cv2.CAP_PROP_FOURCC) or 0)
+        return {
+            "codec": "".join(chr((fourcc >> 8 * i) & 0xFF) for i in range(4)).strip("\x00 ") or None,
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 0),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 0),
+            "fps": fps,
+            "frames": frames,
+            "duration": frames / fps if fps else 0.0,
+        }
+    finally:
+        cap.release()
+
+
+def probe_video(path):
+    """Thông tin video (codec, width, height, fps, frames, duration) – ffprobe nếu có, không thì OpenCV."""
+    info = _probe_ffprobe(path) if shutil.which("ffprobe") else None
+    return info or _probe_cv2(path)
+
+
+def validate_video(info, max_seconds=MAX_DURATION_SECONDS):
+    """Từ chối video không đọc được, quá dài hoặc độ phân giải bất thường."""
+    if not info or info["width"] <= 0 or info["height"] <= 0 or info["fps"] <= 0:
+        raise UploadRejected("Không đọc được video (định dạng hoặc codec không được hỗ trợ).")
+    if info["duration"] <= 0:
+        raise UploadRejected("Video rỗng hoặc không xác định được thời lượng.")
+    if max_seconds and info["duration"] > max_seconds:
+        raise UploadRejected(f"Video dài {info['duration']:.0f} giây, vượt giới hạn {max_seconds:.0f} giây.")
+    if info["width"] * info["height"] > MAX_PIXELS:
+        raise UploadRejected(f"Độ phân giải {info['width']}x{info['height']} vượt giới hạn 4K.")
+    return info
+
+
+# ================================
+# 📥 Nhận file: chép theo khối + băm, lưu theo nội dung (không trùng lặp)
+# ================================
+def _meta_path(video_path):
+    return os.path.splitext(video_path)[0] + ".json"
+
+
+def ingest_upload(fileobj, filename, max_seconds=MAX_DURATION_SECONDS):
+    """
+    Chép luồng `fileobj` (có .read) vào UPLOAD_DIR theo từng khối CHUNK_SIZE, vừa chép vừa băm.
+    File lưu tại UPLOAD_DIR/<sha256><đuôi>; cùng nội dung → dùng lại file cũ.
+    Trả về (đường dẫn, thông tin video). Video không hợp lệ → UploadRejected.
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in ALLOWED_EXTENSIONS:
+        raise UploadRejected(f"Định dạng {ext or '(không có)'} không được hỗ trợ.")
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    tmp = os.path.join(UPLOAD_DIR, f".upload-{os.getpid()}-{time.time_ns()}{ext}")
+    h = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp, "wb") as f:
+            for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b""):
+                size += len(chunk)
+                if size > MAX_FILE_BYTES:
+                    raise UploadRejected(f"File vượt giới hạn {MAX_FILE_BYTES // (1024 * 1024)} MB.")
+                h.update(chunk)
+                f.write(chunk)
+
+        digest = h.hexdigest()
+        dest = os.path.join(UPLOAD_DIR, digest + ext)
+        if os.path.exists(dest) and os.path.exists(_meta_path(dest)):
+            # Đã có → chỉ cập nhật thời điểm dùng (LRU)
+            os.remove(tmp)
+            os.utime(_meta_path(dest))
+            with open(_meta_path(dest)) as f:
+                info = validate_video(json.load(f)["video"], max_seconds)
+        else:
+            info = validate_video(probe_video(tmp), max_seconds)
+            os.replace(tmp, dest)
+            with open(_meta_path(dest), "w") as f:
+                json.dump({"sha256": digest, "name": filename, "size": size, "video": info}, f)
+            evict_uploads(keep=dest)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    remember_file_sha256(dest, digest)
+    return dest, info
+
+
+def evict_uploads(max_bytes=None, keep=None):
+    """Xóa video ít dùng nhất (LRU theo file .json đi kèm) cho tới khi tổng dung lượng <= max_bytes."""
+    max_bytes = UPLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    if not os.path.isdir(UPLOAD_DIR):
+        return
+
+    entries = []
+    for name in os.listdir(UPLOAD_DIR):
+        path = os.path.join(UPLOAD_DIR, name)
+        if name.startswith(".") or not os.path.isfile(path) or name.endswith(".json"):
+            continue
+        meta = _meta_path(path)
+        used = os.path.getmtime(meta) if os.path.exists(meta) else os.path.getmtime(path)
+        entries.append((used, os.path.getsize(path), path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if keep and os.path.abspath(path) == os.path.abspath(keep):
+            continue
+        for p in (path, _meta_path(path)):
+            if os.path.exists(p):
+                os.remove(p)
+        total -= size